@@ -1,11 +1,15 @@
 from django.contrib import admin
 from core.models.user import UserAccount, Pricing, Wallet
 from core.models.transaction import Currency, Transaction
+from core.models.ledger import LedgerEntry
 from core.models.play import Play, PlaySlip
 from core.models.wager import SportsWager, SportsWagerChallenge
-from core.models.games import SportsGame, Sport, Competition, Team, Market
+from core.models.games import SportsGame, ArchivedSportsGame, Sport, Competition, Team, Market
 from core.models.subscription import Subscription
 from core.models.misc import Waitlist, Feedback, TermsOfUse, PrivacyPolicy
+from core.models.webhook import WebhookEvent
+from core.models.notification import NotificationJob, NotificationTarget
+from core.models.avatar import AvatarJob
 
 class UserAccountAdmin(admin.ModelAdmin):
     list_display = ['username', 'email', 'first_name', 'last_name', 'display_name', 'country', 'phone_number']
@@ -41,15 +45,10 @@ class SubscriptionAdmin(admin.ModelAdmin):
     list_filter = ['type', 'is_active']
 
 class PlayAdmin(admin.ModelAdmin):
-    list_display = ['match', 'prediction', 'status']
+    list_display = ['game', 'prediction', 'status']
     list_filter = ['status']
 
 
-class MatchAdmin(admin.ModelAdmin):
-    list_display = ['sports', 'home_team', 'away_team', 'match_day',]
-    list_filter = ['sports', 'match_day']
-
-
 class PlaySlipAdmin(admin.ModelAdmin):
     list_display = ['issuer', 'title', 'date_added', 'is_premium']
     list_filter = ['is_premium']
@@ -61,6 +60,29 @@ class PricingAdmin(admin.ModelAdmin):
 class WalletAdmin(admin.ModelAdmin):
     list_display = ['balance', 'withheld', 'bank_code', 'bank_account_number']
     list_filter = ['bank_code']
+    readonly_fields = ['balance', 'withheld']
+
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['posting', 'wallet', 'account', 'amount', 'balance_after', 'reference', 'time']
+    list_filter = ['account', 'time']
+
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['provider', 'event', 'reference', 'received_time', 'processed_time', 'attempts']
+    list_filter = ['provider', 'event', 'received_time', 'processed_time']
+    search_fields = ['reference']
+
+class NotificationJobAdmin(admin.ModelAdmin):
+    list_display = ['slip', 'recipient_count', 'created_time', 'finished_time']
+    list_filter = ['created_time', 'finished_time']
+
+class NotificationTargetAdmin(admin.ModelAdmin):
+    list_display = ['useraccount', 'channel', 'date_added']
+    list_filter = ['channel']
+
+class AvatarJobAdmin(admin.ModelAdmin):
+    list_display = ['useraccount', 'content_hash', 'created_time', 'finished_time', 'attempts']
+    list_filter = ['created_time', 'finished_time']
+    search_fields = ['content_hash']
 
 class SportsWagerAdmin(admin.ModelAdmin):
     list_display = ['backer', 'layer', 'market', 'backer_option', 'layer_option', 'winner', 'game', 'placed_time', 'is_public', 'status']
@@ -74,6 +96,10 @@ class SportsGameAdmin(admin.ModelAdmin):
     list_display = ['type', 'competition', 'home', 'away', 'match_day', 'result']
     list_filter = ['type', 'competition', 'match_day']
 
+class ArchivedSportsGameAdmin(admin.ModelAdmin):
+    list_display = ['type', 'competition', 'home', 'away', 'match_day', 'result', 'archived_time']
+    list_filter = ['type', 'match_day']
+
 class SportsAdmin(admin.ModelAdmin):
     list_display = ['name']
 
@@ -104,6 +130,7 @@ admin.site.register(PlaySlip, PlaySlipAdmin)
 admin.site.register(SportsWager, SportsWagerAdmin)
 admin.site.register(SportsWagerChallenge, SportsWagerChallengeAdmin)
 admin.site.register(SportsGame, SportsGameAdmin)
+admin.site.register(ArchivedSportsGame, ArchivedSportsGameAdmin)
 admin.site.register(Sport, SportsAdmin)
 admin.site.register(Team, TeamAdmin)
 admin.site.register(Market, MarketAdmin)
@@ -113,6 +140,11 @@ admin.site.register(Wallet, WalletAdmin)
 admin.site.register(Subscription, SubscriptionAdmin)
 admin.site.register(Currency, CurrencyAdmin)
 admin.site.register(Transaction, TransactionAdmin)
+admin.site.register(LedgerEntry, LedgerEntryAdmin)
+admin.site.register(WebhookEvent, WebhookEventAdmin)
+admin.site.register(NotificationJob, NotificationJobAdmin)
+admin.site.register(NotificationTarget, NotificationTargetAdmin)
+admin.site.register(AvatarJob, AvatarJobAdmin)
 admin.site.register(TermsOfUse, TermsOfUseAdmin)
 admin.site.register(PrivacyPolicy, PrivacyPolicyAdmin)
 admin.site.register(Feedback, FeedbackAdmin)
@@ -0,0 +1,50 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+from core.shared.realtime import game_group, user_group
+
+
+class UserUpdatesConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes a signed-in user's wager, challenge and slip events as they
+    happen. Every socket joins its user's group; clients add games with
+    {"action": "subscribe", "game": <id>} to follow matches on them.
+    """
+
+    async def connect(self):
+        self.subscriptions = []
+        useraccount_id = self.scope.get('useraccount_id')
+        if useraccount_id is None:
+            await self.close(code=4401)
+            return
+        await self.join(user_group(useraccount_id))
+        await self.accept()
+
+    async def disconnect(self, code):
+        for group in self.subscriptions:
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def join(self, group):
+        if group not in self.subscriptions:
+            self.subscriptions.append(group)
+            await self.channel_layer.group_add(group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        action = content.get('action') if isinstance(content, dict) else None
+        game = content.get('game') if action else None
+        if action not in ('subscribe', 'unsubscribe') or not isinstance(game, int):
+            await self.send_json({'type': 'error', 'data': {'detail': 'Expected a subscribe or unsubscribe action with a game id'}})
+            return
+        group = game_group(game)
+        if action == 'unsubscribe':
+            if group in self.subscriptions:
+                self.subscriptions.remove(group)
+                await self.channel_layer.group_discard(group, self.channel_name)
+        elif group not in self.subscriptions and len(self.subscriptions) > settings.WEBSOCKET_MAX_GAME_SUBSCRIPTIONS:
+            await self.send_json({'type': 'error', 'data': {'detail': 'Too many game subscriptions'}})
+            return
+        else:
+            await self.join(group)
+        await self.send_json({'type': f'{action}d', 'data': {'game': game}})
+
+    async def event_push(self, message):
+        await self.send_json({'type': message['event'], 'data': message['data']})
@@ -22,6 +22,13 @@ class BadRequestError(APIException):
 class PermissionDeniedError(APIException):
     status_code = 401
 
+class ConflictError(APIException):
+    status_code = 409
+
+class ProviderUnavailableError(APIException):
+    status_code = 503
+    default_detail = "Payment provider unavailable, please try again later"
+
 class RateLimited(ForbiddenError):
     status_code = 403
     default_detail = "Too many requests from user"
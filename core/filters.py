@@ -7,6 +7,7 @@ from core.models.wager import SportsWager
 from core.models.games import SportsGame
 from core.models.user import UserAccount
 from core.models.subscription import Subscription
+from core.models.transaction import Transaction
 
 
 class SportsWagerFilterSet(FilterSet):
@@ -85,3 +86,12 @@ class SubscriptionFilterSet(FilterSet):
     class Meta:
         model = Subscription
         fields = ['issuer', 'subscriber', 'type', 'is_active']
+
+
+class TransactionFilterSet(FilterSet):
+    time__gte = DateTimeFilter(field_name='time', lookup_expr='gte')
+    time__lt = DateTimeFilter(field_name='time', lookup_expr='lt')
+
+    class Meta:
+        model = Transaction
+        fields = ['time__gte', 'time__lt', 'type', 'status']
@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+from django.contrib.auth.models import User
+from django.db import transaction
+from core.models.user import UserAccount, Wallet, Pricing
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back, so benchmarks leave no data behind."""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback()
+    except Rollback:
+        pass
+
+
+def create_account(username, currency, **wallet):
+    """Create a throwaway user account; `wallet` sets extra Wallet fields such as `withheld`."""
+    return UserAccount.objects.create(
+        user=User.objects.create(username=username, email=f"{username}@bench.local"),
+        wallet=Wallet.objects.create(currency=currency, **wallet),
+        pricing=Pricing.objects.create(),
+        image="https://gravatar.com/avatar/bench",
+    )
@@ -0,0 +1,17 @@
+from django.conf import settings
+from core.management.worker import WorkerCommand
+from core.shared.fixtures import archive_games
+
+
+class Command(WorkerCommand):
+    help = "Move past games that nothing was wagered or played on out of the live catalogue into the archive."
+    batch_size = 1000
+    message = "Archived {} game(s)"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--days", type=int, help="Archive games whose match day is this many days past")
+
+    def run_once(self, options):
+        days = settings.GAME_ARCHIVE_DAYS if options["days"] is None else options["days"]
+        return archive_games(days, batch_size=options["batch_size"])
@@ -0,0 +1,69 @@
+import time
+from statistics import median
+from django.core.management.base import BaseCommand
+from django.db import connection
+from core.models.transaction import Currency
+from core.models.play import PlaySlip
+from core.models.subscription import Subscription
+from core.shared.helper import get_subscriber_feed
+from core.management.benchmark import create_account, rolled_back
+
+
+class Command(BaseCommand):
+    help = "Time the subscriber play feed against a growing number of subscriptions. All data is rolled back."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1,10,100,1000,5000")
+        parser.add_argument("--slips", type=int, default=2, help="Slips issued per capper")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--limit", type=int, default=20, help="Feed page size")
+        parser.add_argument("--explain", action="store_true", help="Print the query plan for the largest size")
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options["sizes"].split(","))
+        with rolled_back():
+            self.run(sizes, options)
+
+    def run(self, sizes, options):
+        currency = Currency.objects.get_or_create(code="NGN", country="NG")[0]
+        subscriber = create_account("bench_subscriber", currency)
+
+        cappers = []
+        for index in range(sizes[-1]):
+            cappers.append(create_account(f"bench_capper_{index}", currency))
+        PlaySlip.objects.bulk_create([
+            PlaySlip(issuer=capper, title=f"slip-{n}", is_premium=bool(n % 2))
+            for capper in cappers for n in range(options["slips"])
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE core_playslip; ANALYZE core_subscription")
+
+        subscribed = 0
+        for size in sizes:
+            Subscription.objects.bulk_create([
+                Subscription(
+                    issuer=capper,
+                    subscriber=subscriber,
+                    type=Subscription.FREE if index % 2 else Subscription.PREMIUM,
+                )
+                for index, capper in enumerate(cappers[subscribed:size], start=subscribed)
+            ])
+            subscribed = size
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE core_subscription")
+            # Slips were added before the subscriptions; backdate them so they are visible.
+            Subscription.objects.filter(subscriber=subscriber).update(subscription_date="2000-01-01T00:00:00Z")
+
+            queryset = get_subscriber_feed(subscriber.id)[:options["limit"]]
+            timings = []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            sql = str(queryset.query)
+            self.stdout.write(
+                f"subscriptions={size:>6} median={median(timings):8.2f}ms "
+                f"max={max(timings):8.2f}ms sql_length={len(sql)}"
+            )
+        if options["explain"]:
+            self.stdout.write(queryset.explain(analyze=True))
@@ -0,0 +1,96 @@
+import random
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models.transaction import Currency, Transaction
+from core.models.games import Sport, SportsGame
+from core.models.wager import SportsWager, WagerFill
+from core.shared.orderbook import OrderBook, MatchingEngine
+from core.management.benchmark import create_account, rolled_back
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay synthetic wager orders through the order book and report matching throughput. "
+        "With --persist, also run that many orders through the matching engine against the "
+        "database; all data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=100000)
+        parser.add_argument("--books", type=int, default=50, help="Distinct (game, market) books")
+        parser.add_argument("--persist", type=int, default=0, help="Orders to run through the database-backed engine")
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.replay(options["orders"], options["books"])
+        if options["persist"]:
+            with rolled_back():
+                self.persist(options["persist"])
+
+    def synthetic_orders(self, count, books):
+        for index in range(count):
+            yield index, self.random.randrange(books), self.random.random() < 0.5, self.random.randint(1, 100) * 100
+
+    def replay(self, count, books):
+        orders = list(self.synthetic_orders(count, books))
+        order_books = [OrderBook() for _ in range(books)]
+        fills = 0
+        start = time.perf_counter()
+        for order_id, book, option, amount in orders:
+            fills += len(order_books[book].match(order_id, option, amount, order_id))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"in-memory: {count} orders, {fills} fills in {elapsed:.2f}s "
+            f"({count / elapsed:,.0f} orders/s, {fills / elapsed:,.0f} matches/s), "
+            f"{sum(len(book) for book in order_books)} orders resting"
+        )
+
+    def persist(self, count):
+        currency = Currency.objects.get_or_create(code="NGN", country="NG")[0]
+        traders = [
+            create_account(f"bench_trader_{index}", currency, withheld=count * 100 * 100) for index in range(20)
+        ]
+        game = SportsGame.objects.create(
+            type=Sport.objects.get_or_create(name="Soccer")[0],
+            competition="Bench League",
+            home="Home",
+            away="Away",
+            match_day=timezone.now() + timedelta(days=1),
+        )
+        now = timezone.now()
+        wagers = []
+        for order_id, book, option, amount in self.synthetic_orders(count, 5):
+            backer = traders[order_id % len(traders)]
+            wagers.append(SportsWager(
+                backer=backer,
+                game=game,
+                market=f"Market {book}",
+                backer_option=option,
+                stake=amount / 100,
+                unmatched_amount=amount,
+                transaction=Transaction.objects.create(
+                    type=Transaction.WAGER, amount=amount / 100, status=Transaction.PENDING,
+                    user=backer, currency=currency,
+                ),
+            ))
+        SportsWager.objects.bulk_create(wagers)
+        # placed_time is auto_now_add; spread it so the queue order is deterministic.
+        for offset, wager in enumerate(wagers):
+            SportsWager.objects.filter(id=wager.id).update(placed_time=now + timedelta(microseconds=offset))
+
+        engine = MatchingEngine()
+        start = time.perf_counter()
+        fills = 0
+        while True:
+            batch = engine.run_pending(batch_size=500)
+            fills += batch
+            if not engine.pending_orders().exists():
+                break
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"persisted: {count} orders, {WagerFill.objects.count()} fills in {elapsed:.2f}s "
+            f"({count / elapsed:,.0f} orders/s, {fills / elapsed:,.0f} matches/s)"
+        )
@@ -0,0 +1,70 @@
+import time
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from core.models.transaction import Currency, Transaction
+from core.models.games import Sport, SportsGame
+from core.models.wager import SportsWager
+from core.models.subscription import Subscription
+from core.serializers import SportsWagerSerializer, UserAccountSerializer
+from core.management.benchmark import create_account, rolled_back
+
+
+class FullSportsWagerSerializer(SportsWagerSerializer):
+    """The previous shape, nesting the full profile for every user."""
+    backer = UserAccountSerializer()
+    layer = UserAccountSerializer()
+    winner = UserAccountSerializer()
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('game__type').prefetch_related(
+            'backer__user', 'backer__pricing', 'backer__wallet__currency',
+            'layer__user', 'layer__pricing', 'layer__wallet__currency',
+        )
+
+
+class Command(BaseCommand):
+    help = "Compare /wager/list payload size and serialization time for full vs card nesting. All data is rolled back."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=5000)
+        parser.add_argument("--wagers", type=int, default=50)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run(options)
+
+    def run(self, options):
+        currency = Currency.objects.get_or_create(code="NGN", country="NG")[0]
+        capper = create_account("bench_capper", currency)
+        layer = create_account("bench_layer", currency)
+        followers = [create_account(f"bench_follower_{index}", currency) for index in range(options["subscribers"])]
+        Subscription.objects.bulk_create([
+            Subscription(type=Subscription.FREE, issuer=capper, subscriber=follower) for follower in followers
+        ])
+        game = SportsGame.objects.create(
+            type=Sport.objects.get_or_create(name="Soccer")[0],
+            competition="Bench League",
+            home="Home",
+            away="Away",
+            match_day="2030-01-01T00:00:00Z",
+        )
+        for _ in range(options["wagers"]):
+            SportsWager.objects.create(
+                backer=capper,
+                layer=layer,
+                game=game,
+                market="Home win",
+                backer_option=True,
+                stake=100,
+                transaction=Transaction.objects.create(
+                    type=Transaction.WAGER, amount=100, status=Transaction.PENDING, user=capper, currency=currency,
+                ),
+            )
+
+        for serializer_class in (FullSportsWagerSerializer, SportsWagerSerializer):
+            queryset = serializer_class.setup_eager_loading(SportsWager.objects.filter(backer=capper))
+            start = time.perf_counter()
+            payload = JSONRenderer().render(serializer_class(queryset, many=True).data)
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stdout.write(f"{serializer_class.__name__:<28} bytes={len(payload):>10} time={elapsed:8.2f}ms")
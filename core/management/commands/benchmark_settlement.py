@@ -0,0 +1,68 @@
+import random
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models.transaction import Currency, Transaction
+from core.models.games import Sport, SportsGame
+from core.models.wager import SportsWager
+from core.shared.settlement import settle_games
+from core.management.benchmark import create_account, rolled_back
+
+
+class Command(BaseCommand):
+    help = "Settle synthetic matched wagers across finished games and report throughput. All data is rolled back."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--wagers", type=int, default=20000)
+        parser.add_argument("--games", type=int, default=100)
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        with rolled_back():
+            self.run(options["wagers"], options["games"], options["users"])
+
+    def run(self, count, game_count, user_count):
+        currency = Currency.objects.get_or_create(code="NGN", country="NG")[0]
+        sport = Sport.objects.get_or_create(name="Soccer")[0]
+        users = [create_account(f"bench_settler_{index}", currency) for index in range(user_count)]
+        games = SportsGame.objects.bulk_create([
+            SportsGame(
+                type=sport,
+                competition="Bench League",
+                home=f"Home {index}",
+                away=f"Away {index}",
+                match_day=timezone.now() - timedelta(hours=2),
+                result=f"{self.random.randint(0, 3)}-{self.random.randint(0, 3)}",
+            )
+            for index in range(game_count)
+        ])
+        wagers = []
+        for index in range(count):
+            backer, layer = self.random.sample(users, 2)
+            wagers.append(SportsWager(
+                backer=backer,
+                layer=layer,
+                game=games[index % game_count],
+                market=self.random.choice(["Home win", "Draw", "Away win"]),
+                backer_option=self.random.random() < 0.5,
+                layer_option=False,
+                stake=self.random.randint(1, 100),
+                matched=True,
+                transaction=Transaction(
+                    type=Transaction.WAGER, amount=0, status=Transaction.SUCCEED,
+                    user=backer, currency=currency,
+                ),
+            ))
+        for wager, created in zip(wagers, Transaction.objects.bulk_create([wager.transaction for wager in wagers])):
+            wager.transaction = created
+        SportsWager.objects.bulk_create(wagers, batch_size=1000)
+
+        start = time.perf_counter()
+        settled = settle_games([game.id for game in games])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"settled {settled} games, {count} wagers in {elapsed:.2f}s ({count / elapsed:,.0f} wagers/s)"
+        )
@@ -0,0 +1,61 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from core.models.transaction import Currency
+from core.models.play import PlaySlip, Play
+from core.models.games import Sport, SportsGame
+from core.serializers import PlaySlipSerializer, PlaySerializer, prefetch_useraccounts
+from core.management.benchmark import create_account, rolled_back
+
+
+class ValidatingPlaySlipSerializer(PlaySlipSerializer):
+    """The previous read path: re-validate stored plays with one query per slip."""
+
+    def get_plays(self, instance):
+        serializer = PlaySerializer(data=instance.play_set.all(), many=True)
+        serializer.is_valid()
+        return serializer.data
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.prefetch_related(*prefetch_useraccounts('issuer'))
+
+
+class Command(BaseCommand):
+    help = "Compare slip-feed serialization throughput before and after prefetching plays. All data is rolled back."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--slips", type=int, default=200)
+        parser.add_argument("--plays", type=int, default=5, help="Plays per slip")
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run(options)
+
+    def run(self, options):
+        currency = Currency.objects.get_or_create(code="NGN", country="NG")[0]
+        issuer = create_account("bench_issuer", currency)
+        slips = PlaySlip.objects.bulk_create([
+            PlaySlip(issuer=issuer, title=f"slip-{index}") for index in range(options["slips"])
+        ])
+        sport = Sport.objects.create(name="Soccer")
+        games = SportsGame.objects.bulk_create([
+            SportsGame(type=sport, competition="Bench League", home=f"Home {index}",
+                       away=f"Away {index}", match_day="2030-01-01T00:00:00Z")
+            for index in range(options["plays"])
+        ])
+        Play.objects.bulk_create([
+            Play(slip=slip, game=game, prediction="Draw") for slip in slips for game in games
+        ])
+
+        for serializer_class in (ValidatingPlaySlipSerializer, PlaySlipSerializer):
+            queryset = serializer_class.setup_eager_loading(PlaySlip.objects.filter(issuer=issuer))
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                serializer_class(queryset, many=True).data
+                elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{serializer_class.__name__:<30} queries={len(queries):>5} "
+                f"time={elapsed * 1000:8.2f}ms slips/s={options['slips'] / elapsed:10.1f}"
+            )
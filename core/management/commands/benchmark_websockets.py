@@ -0,0 +1,157 @@
+import asyncio
+import base64
+import os
+import resource
+import struct
+import time
+from statistics import median
+from urllib.parse import urlsplit
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+from core.models.user import UserAccount
+from core.shared import realtime
+
+TEXT, CLOSE, PING, PONG = 0x1, 0x8, 0x9, 0xA
+
+
+def encode_frame(opcode, payload=b""):
+    """A masked client frame, as RFC 6455 requires of clients."""
+    mask = os.urandom(4)
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, 0x80 | length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 0x80 | 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 0x80 | 127, length)
+    return header + mask + bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+
+
+async def read_frame(reader):
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length, = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        length, = struct.unpack("!Q", await reader.readexactly(8))
+    return first & 0x0F, await reader.readexactly(length)
+
+
+def server_rss(pid):
+    """Resident memory of `pid` in KiB, read from procfs."""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+
+class Command(BaseCommand):
+    help = (
+        "Hold many idle WebSocket connections against a running ASGI server, then "
+        "push one event to all of them and time its delivery."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="ws://127.0.0.1:8001/ws/updates")
+        parser.add_argument("--origin", default="https://predishun.com")
+        parser.add_argument("--username", required=True, help="Account every socket signs in as")
+        parser.add_argument("--connections", type=int, default=10000)
+        parser.add_argument("--concurrency", type=int, default=500, help="Handshakes in flight at once")
+        parser.add_argument("--hold", type=int, default=60, help="Seconds to keep the sockets idle")
+        parser.add_argument("--server-pid", type=int, help="Report the memory of this server process")
+
+    def handle(self, *args, **options):
+        try:
+            self.useraccount = UserAccount.objects.select_related("user").get(user__username=options["username"])
+        except UserAccount.DoesNotExist:
+            raise CommandError(f"No account named {options['username']}")
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < options["connections"] + 100:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        url = urlsplit(options["url"])
+        self.token = str(AccessToken.for_user(self.useraccount.user))
+        self.received = {}
+        pid = options["server_pid"]
+        rss_before = server_rss(pid) if pid else None
+
+        handshakes = asyncio.Semaphore(options["concurrency"])
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *[self.open(url, options["origin"], handshakes) for _ in range(options["connections"])],
+            return_exceptions=True,
+        )
+        sockets = [result for result in results if not isinstance(result, BaseException)]
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Opened {len(sockets)}/{options['connections']} sockets in {elapsed:.1f}s "
+            f"({len(sockets) / elapsed:.0f}/s)"
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            self.stdout.write(f"First failure: {errors[0]!r}")
+
+        listeners = [listener for listener, _ in sockets]
+        await asyncio.sleep(options["hold"])
+        alive = sum(not listener.done() for listener in listeners)
+        self.stdout.write(f"{alive} sockets still open after {options['hold']}s idle")
+        if pid:
+            rss_after = server_rss(pid)
+            per_socket = (rss_after - rss_before) / max(alive, 1)
+            self.stdout.write(f"Server RSS {rss_before / 1024:.0f} MiB -> {rss_after / 1024:.0f} MiB ({per_socket:.1f} KiB/socket)")
+
+        sent = time.perf_counter()
+        await sync_to_async(realtime.publish)(
+            [realtime.user_group(self.useraccount.id)], "benchmark.ping", {},
+        )
+        deadline = sent + 30
+        while len(self.received) < alive and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        latencies = sorted((received - sent) * 1000 for received in self.received.values())
+        if latencies:
+            self.stdout.write(
+                f"Broadcast reached {len(latencies)}/{alive} sockets: "
+                f"p50 {median(latencies):.0f}ms, p99 {latencies[int(len(latencies) * 0.99) - 1]:.0f}ms, "
+                f"last {latencies[-1]:.0f}ms"
+            )
+        else:
+            self.stdout.write("Broadcast reached no sockets")
+
+        for listener in listeners:
+            listener.cancel()
+        for _, writer in sockets:
+            writer.close()
+
+    async def open(self, url, origin, handshakes):
+        async with handshakes:
+            reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+            key = base64.b64encode(os.urandom(16)).decode()
+            writer.write((
+                f"GET {url.path}?token={self.token} HTTP/1.1\r\n"
+                f"Host: {url.netloc}\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n"
+                f"Origin: {origin}\r\n\r\n"
+            ).encode())
+            response = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 30)
+            if not response.startswith(b"HTTP/1.1 101"):
+                writer.close()
+                raise ConnectionError(response.split(b"\r\n", 1)[0].decode())
+            # Listen at once: the server pings idle sockets and drops those that never answer.
+            return asyncio.create_task(self.listen(reader, writer)), writer
+
+    async def listen(self, reader, writer):
+        """Answer the server's keepalive pings and note when the broadcast arrives."""
+        while True:
+            opcode, payload = await read_frame(reader)
+            if opcode == PING:
+                writer.write(encode_frame(PONG, payload))
+            elif opcode == TEXT:
+                self.received.setdefault(writer, time.perf_counter())
+            elif opcode == CLOSE:
+                return
@@ -0,0 +1,11 @@
+from core.management.worker import WorkerCommand
+from core.shared.helper import expire_subscriptions
+
+
+class Command(WorkerCommand):
+    help = "Deactivate premium subscriptions whose expiration date has passed."
+    batch_size = 1000
+    message = "Expired {} subscription(s)"
+
+    def run_once(self, options):
+        return expire_subscriptions(batch_size=options["batch_size"])
@@ -0,0 +1,46 @@
+import csv
+import json
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from core.shared.fixtures import import_fixtures, parse_match_day
+
+FIELDS = ("sport", "competition", "home", "away", "match_day")
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a fixture feed into the catalogue and record the results it carries. "
+        "The feed is a JSON array or a CSV file with sport, competition, home, away, "
+        "match_day and an optional result column."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Feed file, or - to read JSON from stdin")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = self.read(options["path"])
+        for number, row in enumerate(rows, start=1):
+            missing = [field for field in FIELDS if not row.get(field)]
+            if missing:
+                raise CommandError(f"Row {number} has no {', '.join(missing)}")
+            if parse_match_day(row["match_day"]) is None:
+                raise CommandError(f"Row {number} has an invalid match_day: {row['match_day']}")
+
+        games = results = 0
+        for start in range(0, len(rows), options["batch_size"]):
+            batch_games, batch_results = import_fixtures(rows[start:start + options["batch_size"]])
+            games += batch_games
+            results += batch_results
+        self.stdout.write(f"Imported {games} game(s) and {results} result(s) from {len(rows)} row(s)")
+
+    def read(self, path):
+        try:
+            if path == "-":
+                return json.load(sys.stdin)
+            with open(path, newline="") as feed:
+                if path.endswith(".csv"):
+                    return list(csv.DictReader(feed))
+                return json.load(feed)
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Cannot read {path}: {error}")
@@ -0,0 +1,12 @@
+from core.management.worker import WorkerCommand
+from core.shared.avatars import process_pending
+
+
+class Command(WorkerCommand):
+    help = "Render uploaded avatars as WebP and JPEG variants. Any number of workers may run at once."
+    batch_size = 20
+    drain = True
+    message = "Processed {} avatar job(s)"
+
+    def run_once(self, options):
+        return process_pending(batch_size=options["batch_size"])
@@ -0,0 +1,33 @@
+import threading
+from django.db import connection
+from core.management.worker import WorkerCommand
+from core.shared.webhooks import process_pending
+
+
+class Command(WorkerCommand):
+    help = "Handle webhook deliveries waiting in the inbox. Any number of workers may run at once."
+    batch_size = 100
+    drain = True
+    message = "Processed {} webhook event(s)"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--workers", type=int, default=1, help="Threads taking batches side by side")
+
+    def handle(self, *args, **options):
+        if options["workers"] == 1:
+            return self.poll(options)
+        workers = [threading.Thread(target=self.work, args=(options,)) for _ in range(options["workers"])]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    def work(self, options):
+        try:
+            self.poll(options)
+        finally:
+            connection.close()
+
+    def run_once(self, options):
+        return process_pending(batch_size=options["batch_size"])
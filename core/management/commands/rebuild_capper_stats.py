@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from core.shared.leaderboard import rebuild_capper_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the capper leaderboard from play slips, plays and subscriptions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("cappers", nargs="*", type=int, help="Only rebuild these capper ids")
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_capper_stats(options["cappers"] or None)
+        self.stdout.write(f"Rebuilt stats for {rebuilt} capper(s)")
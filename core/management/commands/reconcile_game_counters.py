@@ -0,0 +1,14 @@
+from core.management.worker import WorkerCommand
+from core.shared.fixtures import reconcile_counters
+
+
+class Command(WorkerCommand):
+    help = "Recount the wagers on games and correct wager counters that drifted."
+    message = "Corrected counters on {} game(s)"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--all", action="store_true", help="Include games that are already settled")
+
+    def run_once(self, options):
+        return reconcile_counters(batch_size=options["batch_size"], include_settled=options["all"])
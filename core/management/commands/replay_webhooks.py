@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from core.models.webhook import WebhookEvent
+from core.shared.webhooks import replay
+
+
+class Command(BaseCommand):
+    help = "Queue stored webhook events to be handled again by the webhook worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--provider", choices=[name.lower() for _, name in WebhookEvent.PROVIDER])
+        parser.add_argument("--event", help="Only events with this name, e.g. charge.success")
+        parser.add_argument("--since", help="Only events received at or after this ISO 8601 time")
+        parser.add_argument("--until", help="Only events received before this ISO 8601 time")
+        parser.add_argument("--failed", action="store_true", help="Only events that ran out of attempts")
+        parser.add_argument("reference", nargs="*", help="Only events with these references")
+
+    def handle(self, *args, **options):
+        events = WebhookEvent.objects.all()
+        if options["provider"]:
+            providers = {name.lower(): value for value, name in WebhookEvent.PROVIDER}
+            events = events.filter(provider=providers[options["provider"]])
+        if options["event"]:
+            events = events.filter(event=options["event"])
+        for option, lookup in (("since", "received_time__gte"), ("until", "received_time__lt")):
+            if options[option]:
+                value = parse_datetime(options[option])
+                if value is None:
+                    raise CommandError(f"Invalid --{option} time: {options[option]}")
+                events = events.filter(**{lookup: value})
+        if options["failed"]:
+            events = events.filter(processed_time__isnull=True, last_error__gt="")
+        if options["reference"]:
+            events = events.filter(reference__in=options["reference"])
+        self.stdout.write(f"Queued {replay(events)} webhook event(s) for replay")
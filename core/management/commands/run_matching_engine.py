@@ -0,0 +1,18 @@
+from django.core.management.base import CommandError
+from core.management.worker import WorkerCommand
+from core.shared.orderbook import MatchingEngine
+
+
+class Command(WorkerCommand):
+    help = "Match order-book wagers against opposing orders. Only one instance may run."
+    drain = True
+    message = "Recorded {} fill(s)"
+
+    def handle(self, *args, **options):
+        self.engine = MatchingEngine()
+        if not self.engine.acquire_lock():
+            raise CommandError("Another matching engine is already running")
+        super().handle(*args, **options)
+
+    def run_once(self, options):
+        return self.engine.run_pending(batch_size=options["batch_size"])
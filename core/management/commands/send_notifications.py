@@ -0,0 +1,15 @@
+from core.management.worker import WorkerCommand
+from core.shared.notifications import get_channels, run_pending
+
+
+class Command(WorkerCommand):
+    help = "Deliver new slip notifications to subscribers."
+    drain = True
+    message = "Notified {} subscriber(s)"
+
+    def handle(self, *args, **options):
+        self.channels = get_channels()
+        super().handle(*args, **options)
+
+    def run_once(self, options):
+        return run_pending(batch_size=options["batch_size"], channels=self.channels)
@@ -0,0 +1,10 @@
+from core.management.worker import WorkerCommand
+from core.shared.settlement import settle_pending
+
+
+class Command(WorkerCommand):
+    help = "Settle the wagers and plays on finished games."
+    message = "Settled {} game(s)"
+
+    def run_once(self, options):
+        return settle_pending(batch_size=options["batch_size"])
@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand
+
+
+class WorkerCommand(BaseCommand):
+    """
+    Base for background workers. `run_once(options)` does one pass and
+    returns how many items it handled, reported with `message`. Without
+    --interval the command makes one pass and exits; with it, it keeps
+    running and sleeps INTERVAL seconds between passes.
+
+    Queue workers set `drain` to go again at once while a pass found work
+    and sleep only once it comes back empty, so a backlog is worked off
+    without waiting.
+    """
+    batch_size = 500
+    drain = False
+    message = "Handled {} item(s)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=self.batch_size)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep running and poll every INTERVAL seconds instead of exiting after one pass",
+        )
+
+    def run_once(self, options):
+        raise NotImplementedError
+
+    def handle(self, *args, **options):
+        self.poll(options)
+
+    def poll(self, options):
+        while True:
+            handled = self.run_once(options)
+            if handled or options["verbosity"] > 1:
+                self.stdout.write(self.message.format(handled))
+            if handled and self.drain:
+                continue
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
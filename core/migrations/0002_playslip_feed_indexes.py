@@ -0,0 +1,21 @@
+# Generated by Django 4.1 on 2026-10-18 14:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='playslip',
+            index=models.Index(fields=['issuer', 'date_added'], name='core_playsl_issuer__8817a9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['subscriber', 'issuer', 'is_active'], name='core_subscr_subscri_0460d3_idx'),
+        ),
+    ]
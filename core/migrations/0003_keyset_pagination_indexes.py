@@ -0,0 +1,25 @@
+# Generated by Django 4.1 on 2026-10-18 14:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_playslip_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sportswager',
+            index=models.Index(fields=['backer', 'placed_time'], name='core_sports_backer__9fa6c0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sportswager',
+            index=models.Index(fields=['layer', 'placed_time'], name='core_sports_layer_i_26830c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'time'], name='core_transa_user_id_55d55e_idx'),
+        ),
+    ]
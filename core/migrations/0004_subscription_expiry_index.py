@@ -0,0 +1,17 @@
+# Generated by Django 4.1 on 2026-10-18 14:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('is_active', True), ('type', 1)), fields=['expiration_date'], name='subscription_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.1 on 2026-10-18 14:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+
+def backfill_capper_stats(apps, schema_editor):
+    CapperStats = apps.get_model('core', 'CapperStats')
+    PlaySlip = apps.get_model('core', 'PlaySlip')
+    Subscription = apps.get_model('core', 'Subscription')
+    stats = {}
+    for row in PlaySlip.objects.values('issuer').annotate(
+        latest=Max('date_added'),
+        settled=Count('play', filter=Q(play__status__in=[0, 1])),
+        won=Count('play', filter=Q(play__status=1)),
+    ):
+        stats[row['issuer']] = CapperStats(
+            capper_id=row['issuer'],
+            last_slip_date=row['latest'],
+            settled_play_count=row['settled'],
+            won_play_count=row['won'],
+            win_rate=row['won'] / row['settled'] if row['settled'] else 0.0,
+        )
+    active = Subscription.objects.filter(
+        Q(type=0) | Q(expiration_date__isnull=True) | Q(expiration_date__gte=timezone.now()),
+        is_active=True,
+    )
+    for row in active.values('issuer').annotate(
+        free=Count('id', filter=Q(type=0)),
+        premium=Count('id', filter=Q(type=1)),
+    ):
+        entry = stats.setdefault(row['issuer'], CapperStats(capper_id=row['issuer']))
+        entry.free_subscriber_count = row['free']
+        entry.premium_subscriber_count = row['premium']
+    CapperStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_subscription_expiry_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapperStats',
+            fields=[
+                ('capper', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='core.useraccount')),
+                ('last_slip_date', models.DateTimeField(null=True)),
+                ('settled_play_count', models.PositiveIntegerField(default=0)),
+                ('won_play_count', models.PositiveIntegerField(default=0)),
+                ('win_rate', models.FloatField(default=0.0)),
+                ('free_subscriber_count', models.PositiveIntegerField(default=0)),
+                ('premium_subscriber_count', models.PositiveIntegerField(default=0)),
+                ('last_update', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='capperstats',
+            index=models.Index(fields=['last_slip_date', 'capper'], name='core_capper_last_sl_b5c720_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='capperstats',
+            index=models.Index(fields=['win_rate', 'capper'], name='core_capper_win_rat_63e825_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='capperstats',
+            index=models.Index(fields=['free_subscriber_count', 'capper'], name='core_capper_free_su_0bbb6b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='capperstats',
+            index=models.Index(fields=['premium_subscriber_count', 'capper'], name='core_capper_premium_8022db_idx'),
+        ),
+        migrations.RunPython(backfill_capper_stats, migrations.RunPython.noop),
+    ]
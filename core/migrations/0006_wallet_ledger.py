@@ -0,0 +1,66 @@
+# Generated by Django 4.1 on 2026-10-18 14:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def open_wallet_ledgers(apps, schema_editor):
+    """Give every funded wallet an opening posting against EXTERNAL."""
+    Wallet = apps.get_model('core', 'Wallet')
+    LedgerEntry = apps.get_model('core', 'LedgerEntry')
+    entries = []
+    for wallet in Wallet.objects.exclude(balance=0, withheld=0).iterator():
+        posting = uuid.uuid4()
+        entries += [
+            LedgerEntry(posting=posting, wallet=wallet, account=0, amount=wallet.balance, balance_after=wallet.balance, reference='opening'),
+            LedgerEntry(posting=posting, wallet=wallet, account=1, amount=wallet.withheld, balance_after=wallet.withheld, reference='opening'),
+            LedgerEntry(posting=posting, account=3, amount=-(wallet.balance + wallet.withheld), reference='opening'),
+        ]
+    LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_capper_stats'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "UPDATE core_wallet SET balance = round(balance * 100), withheld = round(withheld * 100)",
+            "UPDATE core_wallet SET balance = balance / 100.0, withheld = withheld / 100.0",
+        ),
+        migrations.AlterField(
+            model_name='wallet',
+            name='balance',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='wallet',
+            name='withheld',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posting', models.UUIDField(db_index=True, editable=False)),
+                ('account', models.PositiveIntegerField(choices=[(0, 'BALANCE'), (1, 'WITHHELD'), (2, 'ESCROW'), (3, 'EXTERNAL'), (4, 'FEES')], editable=False)),
+                ('amount', models.BigIntegerField(editable=False)),
+                ('balance_after', models.BigIntegerField(editable=False, null=True)),
+                ('reference', models.CharField(blank=True, default='', editable=False, max_length=32)),
+                ('time', models.DateTimeField(auto_now_add=True)),
+                ('transaction', models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='core.transaction')),
+                ('wallet', models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ledger_entries', to='core.wallet')),
+            ],
+            options={
+                'verbose_name_plural': 'ledger entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['wallet', 'time'], name='core_ledger_wallet__97c038_idx'),
+        ),
+        migrations.RunPython(open_wallet_ledgers, migrations.RunPython.noop),
+    ]
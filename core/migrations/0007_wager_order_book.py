@@ -0,0 +1,50 @@
+# Generated by Django 4.1 on 2026-10-18 14:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_wallet_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WagerFill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.BigIntegerField()),
+                ('time', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='sportswager',
+            name='booked',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sportswager',
+            name='unmatched_amount',
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='sportswager',
+            index=models.Index(condition=models.Q(('booked', False), ('unmatched_amount__isnull', False)), fields=['placed_time', 'id'], name='wager_order_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sportswager',
+            index=models.Index(condition=models.Q(('booked', True), ('unmatched_amount__gt', 0)), fields=['game', 'market', 'placed_time'], name='wager_resting_order_idx'),
+        ),
+        migrations.AddField(
+            model_name='wagerfill',
+            name='maker',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='maker_fills', to='core.sportswager'),
+        ),
+        migrations.AddField(
+            model_name='wagerfill',
+            name='taker',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='taker_fills', to='core.sportswager'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1 on 2026-10-18 15:05
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_wager_order_book'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='winning_markets',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='sportsgame',
+            name='settled_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sportsgame',
+            name='winning_markets',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), blank=True, default=list, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='sportswager',
+            index=models.Index(fields=['game', 'status'], name='core_sports_game_id_ac22ba_idx'),
+        ),
+    ]
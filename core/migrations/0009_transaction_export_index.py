@@ -0,0 +1,21 @@
+# Generated by Django 4.1 on 2026-10-18 15:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_settlement'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='core_transa_user_id_55d55e_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'time', 'id'], include=('type', 'status', 'amount', 'currency', 'reference'), name='transaction_export_idx'),
+        ),
+    ]
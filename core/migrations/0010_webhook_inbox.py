@@ -0,0 +1,35 @@
+# Generated by Django 4.1 on 2026-10-18 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_transaction_export_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.PositiveIntegerField(choices=[(0, 'PAYSTACK'), (1, 'FLUTTERWAVE'), (2, 'WHATSAPP')], editable=False)),
+                ('event', models.CharField(blank=True, default='', editable=False, max_length=100)),
+                ('reference', models.CharField(editable=False, max_length=200)),
+                ('payload', models.JSONField(editable=False)),
+                ('received_time', models.DateTimeField(auto_now_add=True)),
+                ('processed_time', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='webhookevent',
+            index=models.Index(condition=models.Q(('processed_time__isnull', True)), fields=['id'], name='webhook_event_pending_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='webhookevent',
+            constraint=models.UniqueConstraint(fields=('provider', 'reference'), name='webhook_event_reference_unique'),
+        ),
+    ]
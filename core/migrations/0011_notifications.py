@@ -0,0 +1,55 @@
+# Generated by Django 4.1 on 2026-10-18 15:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_webhook_inbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cursor', models.BigIntegerField(default=0)),
+                ('recipient_count', models.PositiveIntegerField(default=0)),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('finished_time', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NotificationTarget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(max_length=20)),
+                ('address', models.TextField()),
+                ('date_added', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['issuer', 'type', 'subscriber'], name='subscription_fanout_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationtarget',
+            name='useraccount',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_targets', to='core.useraccount'),
+        ),
+        migrations.AddField(
+            model_name='notificationjob',
+            name='slip',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_jobs', to='core.playslip'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationtarget',
+            index=models.Index(fields=['useraccount', 'channel'], name='core_notifi_useracc_59a5ed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationjob',
+            index=models.Index(condition=models.Q(('finished_time__isnull', True)), fields=['id'], name='notification_job_pending_idx'),
+        ),
+    ]
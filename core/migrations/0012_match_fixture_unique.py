@@ -0,0 +1,41 @@
+# Generated by Django 4.1 on 2026-10-18 15:36
+
+from django.db import migrations, models
+
+
+# Point every play at one row per fixture, preferring a row that already has
+# a result, then drop the duplicates. Foreign keys are checked at once so no
+# deferred trigger events are left pending when the constraint is added.
+MERGE_DUPLICATE_MATCHES = """
+    SET CONSTRAINTS ALL IMMEDIATE;
+
+    CREATE TEMPORARY TABLE match_merge ON COMMIT DROP AS
+    SELECT id, keep_id FROM (
+        SELECT id, first_value(id) OVER (
+            PARTITION BY sports, competition, home_team, away_team, match_day
+            ORDER BY result IS NULL, id
+        ) AS keep_id
+        FROM core_match
+    ) ranked
+    WHERE id <> keep_id;
+
+    UPDATE core_play SET match_id = match_merge.keep_id
+    FROM match_merge WHERE core_play.match_id = match_merge.id;
+
+    DELETE FROM core_match USING match_merge WHERE core_match.id = match_merge.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_notifications'),
+    ]
+
+    operations = [
+        migrations.RunSQL(MERGE_DUPLICATE_MATCHES, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='match',
+            constraint=models.UniqueConstraint(fields=('sports', 'competition', 'home_team', 'away_team', 'match_day'), name='match_fixture_unique'),
+        ),
+    ]
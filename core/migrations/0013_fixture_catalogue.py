@@ -0,0 +1,88 @@
+# Generated by Django 4.1 on 2026-10-18 15:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Point every wager at one game per fixture, preferring a game that is still
+# open and then one that has a result, and drop the duplicates.
+MERGE_DUPLICATE_GAMES = """
+    SET CONSTRAINTS ALL IMMEDIATE;
+
+    CREATE TEMPORARY TABLE game_merge ON COMMIT DROP AS
+    SELECT id, keep_id FROM (
+        SELECT id, first_value(id) OVER (
+            PARTITION BY type_id, competition, home, away, match_day
+            ORDER BY settled_time IS NOT NULL, result = '', id
+        ) AS keep_id
+        FROM core_sportsgame
+    ) ranked
+    WHERE id <> keep_id;
+
+    UPDATE core_sportswager SET game_id = game_merge.keep_id
+    FROM game_merge WHERE core_sportswager.game_id = game_merge.id;
+
+    DELETE FROM core_sportsgame USING game_merge WHERE core_sportsgame.id = game_merge.id;
+"""
+
+# Matches become catalogue games: their sports are added to the catalogue by
+# name, each fixture is found or created, a result only a match knew about is
+# kept, and every play is pointed at its game.
+COPY_MATCHES_TO_GAMES = """
+    SET CONSTRAINTS ALL IMMEDIATE;
+
+    INSERT INTO core_sport (name)
+    SELECT DISTINCT sports FROM core_match
+    WHERE NOT EXISTS (SELECT 1 FROM core_sport WHERE core_sport.name = core_match.sports);
+
+    CREATE TEMPORARY TABLE match_game ON COMMIT DROP AS
+    SELECT match.*, sport.id AS type_id
+    FROM core_match AS match
+    JOIN (SELECT name, min(id) AS id FROM core_sport GROUP BY name) AS sport ON sport.name = match.sports;
+
+    INSERT INTO core_sportsgame (
+        type_id, competition, home, away, match_day, result, winning_markets,
+        time_added, markets, is_wager_played
+    )
+    SELECT type_id, competition, home_team, away_team, match_day, coalesce(result, ''), winning_markets,
+           now(), ARRAY['Home win', 'Draw', 'Away win', 'Home 1st Goal', 'Away 1st Goal'], false
+    FROM match_game
+    ON CONFLICT ON CONSTRAINT sportsgame_fixture_unique DO UPDATE
+    SET result = EXCLUDED.result, winning_markets = EXCLUDED.winning_markets
+    WHERE core_sportsgame.result = '' AND EXCLUDED.result <> '';
+
+    UPDATE core_play SET game_id = game.id
+    FROM match_game, core_sportsgame AS game
+    WHERE core_play.match_id = match_game.id
+      AND game.type_id = match_game.type_id AND game.competition = match_game.competition
+      AND game.home = match_game.home_team AND game.away = match_game.away_team
+      AND game.match_day = match_game.match_day;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_match_fixture_unique'),
+    ]
+
+    operations = [
+        migrations.RunSQL(MERGE_DUPLICATE_GAMES, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='sportsgame',
+            constraint=models.UniqueConstraint(fields=('type', 'competition', 'home', 'away', 'match_day'), name='sportsgame_fixture_unique'),
+        ),
+        migrations.AddField(
+            model_name='play',
+            name='game',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='plays', to='core.sportsgame'),
+        ),
+        migrations.RunSQL(COPY_MATCHES_TO_GAMES, migrations.RunSQL.noop),
+        migrations.RemoveField(
+            model_name='play',
+            name='match',
+        ),
+        migrations.DeleteModel(
+            name='Match',
+        ),
+    ]
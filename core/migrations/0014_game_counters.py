@@ -0,0 +1,55 @@
+# Generated by Django 4.1 on 2026-10-18 15:44
+
+from django.db import migrations, models
+
+
+# Start the counters from the wagers already placed.
+BACKFILL_COUNTERS = """
+    UPDATE core_sportsgame AS game
+    SET wager_count = counts.wager_count,
+        matched_count = counts.matched_count,
+        total_stake = counts.total_stake
+    FROM (
+        SELECT game_id,
+               count(*) AS wager_count,
+               count(*) FILTER (WHERE matched) AS matched_count,
+               coalesce(sum(round(stake::numeric * 100)), 0) AS total_stake
+        FROM core_sportswager
+        GROUP BY game_id
+    ) AS counts
+    WHERE game.id = counts.game_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_fixture_catalogue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sportsgame',
+            name='matched_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sportsgame',
+            name='total_stake',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sportsgame',
+            name='wager_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(BACKFILL_COUNTERS, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='sportsgame',
+            index=models.Index(condition=models.Q(('is_wager_played', True)), fields=['match_day'], name='sportsgame_played_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sportsgame',
+            index=models.Index(condition=models.Q(('is_wager_played', True)), fields=['-wager_count'], name='sportsgame_top_idx'),
+        ),
+    ]
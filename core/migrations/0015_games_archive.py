@@ -0,0 +1,64 @@
+# Generated by Django 4.1 on 2026-10-18 15:47
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_game_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSportsGame',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('competition', models.CharField(max_length=100)),
+                ('home', models.CharField(max_length=100)),
+                ('away', models.CharField(max_length=100)),
+                ('match_day', models.DateTimeField(db_index=True)),
+                ('result', models.CharField(blank=True, default='', max_length=10)),
+                ('time_added', models.DateTimeField()),
+                ('markets', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), default=list, size=None)),
+                ('winning_markets', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), blank=True, default=list, size=None)),
+                ('settled_time', models.DateTimeField(blank=True, null=True)),
+                ('archived_time', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='sportsgame',
+            name='sportsgame_played_day_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='sportsgame',
+            name='sportsgame_top_idx',
+        ),
+        migrations.AddIndex(
+            model_name='sportsgame',
+            index=models.Index(condition=models.Q(('is_wager_played', True)), fields=['match_day', 'id'], name='sportsgame_played_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sportsgame',
+            index=models.Index(condition=models.Q(('is_wager_played', True)), fields=['-wager_count', '-id'], name='sportsgame_top_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sportsgame',
+            index=models.Index(condition=models.Q(('is_wager_played', True)), fields=['-time_added', '-id'], name='sportsgame_latest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sportsgame',
+            index=models.Index(fields=['-competition', 'match_day', 'id'], name='sportsgame_fixtures_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sportsgame',
+            index=models.Index(fields=['match_day'], name='sportsgame_match_day_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedsportsgame',
+            name='type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_games', to='core.sport'),
+        ),
+    ]
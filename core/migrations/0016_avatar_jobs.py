@@ -0,0 +1,41 @@
+# Generated by Django 4.1 on 2026-10-18 15:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_games_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useraccount',
+            name='avatar_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='useraccount',
+            name='avatar_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.CreateModel(
+            name='AvatarJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.FileField(editable=False, upload_to='avatars/sources/')),
+                ('content_hash', models.CharField(editable=False, max_length=64)),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('finished_time', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('useraccount', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='avatar_jobs', to='core.useraccount')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='avatarjob',
+            index=models.Index(condition=models.Q(('finished_time__isnull', True)), fields=['id'], name='avatar_job_pending_idx'),
+        ),
+    ]
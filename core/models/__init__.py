@@ -1 +1 @@
-from . import user, play
\ No newline at end of file
+from . import user, play, leaderboard, ledger, webhook, notification, avatar
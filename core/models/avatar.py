@@ -0,0 +1,65 @@
+import hashlib
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.utils import timezone
+
+
+class AvatarJobQuerySet(models.QuerySet):
+    def submit(self, useraccount, upload):
+        """
+        Queue `upload` to be rendered as `useraccount`'s avatar, keyed by its
+        sha256. Returns None without storing anything when the upload is the
+        avatar already shown, which also drops uploads still waiting, or the
+        one that is next to be rendered.
+        """
+        digest = hashlib.sha256()
+        for chunk in upload.chunks():
+            digest.update(chunk)
+        content_hash = digest.hexdigest()
+        upload.seek(0)
+        pending = self.filter(useraccount=useraccount, finished_time__isnull=True)
+        if content_hash == useraccount.avatar_hash:
+            sources = list(pending.values_list('source', flat=True))
+            pending.update(finished_time=timezone.now())
+
+            def delete_sources():
+                for name in sources:
+                    default_storage.delete(name)
+            transaction.on_commit(delete_sources)
+            return None
+        latest = pending.order_by('-id').values_list('content_hash', flat=True).first()
+        if content_hash == latest:
+            return None
+        upload.name = content_hash
+        return self.create(useraccount=useraccount, content_hash=content_hash, source=upload)
+
+
+class AvatarJob(models.Model):
+    """
+    An uploaded avatar waiting to be resized. `source` is the upload as
+    received, stored under its content hash; the avatar worker renders its
+    variants, stamps `finished_time` and deletes the upload. A job
+    superseded by a newer upload for the same user is finished without
+    being rendered.
+    """
+    useraccount = models.ForeignKey('core.UserAccount', on_delete=models.CASCADE, related_name='avatar_jobs')
+    source = models.FileField(upload_to='avatars/sources/', editable=False)
+    content_hash = models.CharField(max_length=64, editable=False)
+    created_time = models.DateTimeField(auto_now_add=True, editable=False)
+    finished_time = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(default="", blank=True)
+
+    objects = AvatarJobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['id'],
+                name='avatar_job_pending_idx',
+                condition=models.Q(finished_time__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.useraccount_id}:{self.content_hash[:12]}'
@@ -1,4 +1,7 @@
+from functools import reduce
+from operator import or_
 from django.db import models
+from django.db.models import Q
 from django.contrib.postgres.fields import ArrayField
 
 
@@ -34,7 +37,36 @@ class Team(models.Model):
     def __str__(self):
         return f'{self.name}'
 
+class SportsGameQuerySet(models.QuerySet):
+    def get_or_create_fixtures(self, fixtures):
+        """
+        The SportsGame row for each fixture in `fixtures` (dicts of
+        FIXTURE_FIELDS), in order, creating the missing ones. Costs two
+        queries however many fixtures there are, and concurrent callers
+        converge on the same rows.
+        """
+        keys = [tuple(fixture[field] for field in SportsGame.FIXTURE_FIELDS) for fixture in fixtures]
+        if not keys:
+            return []
+        unique_keys = list(dict.fromkeys(keys))
+        self.bulk_create(
+            [SportsGame(**dict(zip(SportsGame.FIXTURE_FIELDS, key))) for key in unique_keys],
+            ignore_conflicts=True,
+        )
+        games = {
+            game.fixture: game
+            for game in self.filter(reduce(or_, (Q(**dict(zip(SportsGame.FIXTURE_FIELDS, key))) for key in unique_keys)))
+        }
+        return [games[key] for key in keys]
+
+
 class SportsGame(models.Model):
+    """
+    The fixture catalogue: one row per game, shared by the wagers and the
+    plays on it, so a result is recorded and settled once.
+    """
+    FIXTURE_FIELDS = ('type_id', 'competition', 'home', 'away', 'match_day')
+
     type = models.ForeignKey("core.Sport", on_delete=models.PROTECT, related_name="sports_game")
     competition = models.CharField(max_length=100)
     home = models.CharField(max_length=100)
@@ -44,6 +76,62 @@ class SportsGame(models.Model):
     time_added = models.DateTimeField(auto_now_add=True)
     markets = ArrayField(models.CharField(max_length=50), default=default_markets)
     is_wager_played = models.BooleanField(default=False)
+    # Markets that came true; filled in from `result` when left empty.
+    winning_markets = ArrayField(models.CharField(max_length=50), default=list, blank=True)
+    settled_time = models.DateTimeField(null=True, blank=True)
+    # Kept up to date as wagers are placed and matched, so listings never
+    # count wagers; `reconcile_game_counters` corrects any drift.
+    wager_count = models.PositiveIntegerField(default=0, editable=False)
+    matched_count = models.PositiveIntegerField(default=0, editable=False)
+    # Sum of the wagers' stakes, in minor units like Wallet.balance.
+    total_stake = models.BigIntegerField(default=0, editable=False)
+
+    objects = SportsGameQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['type', 'competition', 'home', 'away', 'match_day'],
+                name='sportsgame_fixture_unique',
+            ),
+        ]
+        # One index per listing order in SportsGamePagination. The played
+        # listings are partial, so they stay small however many fixtures
+        # are imported; open and expired read the same index both ways.
+        indexes = [
+            models.Index(fields=['match_day', 'id'], condition=Q(is_wager_played=True), name='sportsgame_played_day_idx'),
+            models.Index(fields=['-wager_count', '-id'], condition=Q(is_wager_played=True), name='sportsgame_top_idx'),
+            models.Index(fields=['-time_added', '-id'], condition=Q(is_wager_played=True), name='sportsgame_latest_idx'),
+            models.Index(fields=['-competition', 'match_day', 'id'], name='sportsgame_fixtures_idx'),
+            # Finding games old enough to archive.
+            models.Index(fields=['match_day'], name='sportsgame_match_day_idx'),
+        ]
+
+    @property
+    def fixture(self):
+        return tuple(getattr(self, field) for field in self.FIXTURE_FIELDS)
+
+    def __str__(self):
+        return f'{self.competition}-{self.home[0:3]}:{self.away[0:3]}'
+
+
+class ArchivedSportsGame(models.Model):
+    """
+    Past fixtures nothing was wagered or played on, moved out of SportsGame
+    by `archive_games` with their ids, so the live catalogue stays small.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    type = models.ForeignKey("core.Sport", on_delete=models.PROTECT, related_name="archived_games")
+    competition = models.CharField(max_length=100)
+    home = models.CharField(max_length=100)
+    away = models.CharField(max_length=100)
+    match_day = models.DateTimeField(db_index=True)
+    result = models.CharField(max_length=10, default="", blank=True)
+    time_added = models.DateTimeField()
+    markets = ArrayField(models.CharField(max_length=50), default=list)
+    winning_markets = ArrayField(models.CharField(max_length=50), default=list, blank=True)
+    settled_time = models.DateTimeField(null=True, blank=True)
+    archived_time = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f'{self.competition}-{self.home[0:3]}:{self.away[0:3]}'
@@ -0,0 +1,27 @@
+from django.db import models
+
+
+class CapperStats(models.Model):
+    """
+    Leaderboard row per capper, kept current by the signal handlers in
+    core.signals so the capper listing never aggregates over play slips.
+    """
+    capper = models.OneToOneField('core.UserAccount', on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    last_slip_date = models.DateTimeField(null=True)
+    settled_play_count = models.PositiveIntegerField(default=0)
+    won_play_count = models.PositiveIntegerField(default=0)
+    win_rate = models.FloatField(default=0.0)
+    free_subscriber_count = models.PositiveIntegerField(default=0)
+    premium_subscriber_count = models.PositiveIntegerField(default=0)
+    last_update = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_slip_date', 'capper']),
+            models.Index(fields=['win_rate', 'capper']),
+            models.Index(fields=['free_subscriber_count', 'capper']),
+            models.Index(fields=['premium_subscriber_count', 'capper']),
+        ]
+
+    def __str__(self):
+        return f'{self.capper_id}-{self.win_rate:.2f}'
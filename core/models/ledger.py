@@ -0,0 +1,40 @@
+from django.db import models
+
+
+class LedgerEntry(models.Model):
+    """
+    One leg of a posting. The legs of a posting share `posting` and their
+    amounts sum to zero; legs on a wallet account record the resulting
+    wallet figure in `balance_after`.
+    """
+    BALANCE = 0
+    WITHHELD = 1
+    ESCROW = 2
+    EXTERNAL = 3
+    FEES = 4
+    ACCOUNT = (
+        (BALANCE, 'BALANCE'),
+        (WITHHELD, 'WITHHELD'),
+        (ESCROW, 'ESCROW'),
+        (EXTERNAL, 'EXTERNAL'),
+        (FEES, 'FEES'),
+    )
+    WALLET_ACCOUNTS = {BALANCE: 'balance', WITHHELD: 'withheld'}
+
+    posting = models.UUIDField(db_index=True, editable=False)
+    wallet = models.ForeignKey('core.Wallet', on_delete=models.PROTECT, null=True, related_name='ledger_entries', editable=False)
+    account = models.PositiveIntegerField(choices=ACCOUNT, editable=False)
+    amount = models.BigIntegerField(editable=False)
+    balance_after = models.BigIntegerField(null=True, editable=False)
+    transaction = models.ForeignKey('core.Transaction', on_delete=models.SET_NULL, null=True, related_name='ledger_entries', editable=False)
+    reference = models.CharField(max_length=32, default="", blank=True, editable=False)
+    time = models.DateTimeField(auto_now_add=True, editable=False)
+
+    class Meta:
+        verbose_name_plural = 'ledger entries'
+        indexes = [
+            models.Index(fields=['wallet', 'time']),
+        ]
+
+    def __str__(self):
+        return f'{self.posting}-{self.get_account_display()}:{self.amount}'
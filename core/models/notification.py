@@ -0,0 +1,53 @@
+from django.db import models
+
+
+class NotificationJob(models.Model):
+    """
+    Fan-out of one new slip to the issuer's subscribers. The notification
+    worker leases the job until `leased_until`, expands recipients in
+    batches and stamps `finished_time` once none are left. `cursor` is the
+    last subscriber id expanded; `channel_cursors` holds, per channel, the
+    last one that channel delivered to, defaulting to `cursor`, so a
+    failing channel is retried from where it stopped without holding back
+    the others; `channel_failures` counts its failed attempts at that batch.
+    """
+    slip = models.ForeignKey('core.PlaySlip', on_delete=models.CASCADE, related_name='notification_jobs')
+    cursor = models.BigIntegerField(default=0)
+    channel_cursors = models.JSONField(default=dict, blank=True)
+    channel_failures = models.JSONField(default=dict, blank=True)
+    last_error = models.TextField(default="", blank=True)
+    recipient_count = models.PositiveIntegerField(default=0)
+    created_time = models.DateTimeField(auto_now_add=True)
+    leased_until = models.DateTimeField(null=True, blank=True)
+    finished_time = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['id'],
+                name='notification_job_pending_idx',
+                condition=models.Q(finished_time__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.slip_id}@{self.cursor}'
+
+
+class NotificationTarget(models.Model):
+    """
+    Where a user asked to be notified on a channel other than email: a
+    WhatsApp number, a Telegram chat id or a web push subscription (JSON).
+    """
+    useraccount = models.ForeignKey('core.UserAccount', on_delete=models.CASCADE, related_name='notification_targets')
+    channel = models.CharField(max_length=20)
+    address = models.TextField()
+    date_added = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['useraccount', 'channel']),
+        ]
+
+    def __str__(self):
+        return f'{self.useraccount_id}:{self.channel}'
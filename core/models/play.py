@@ -6,19 +6,15 @@ class PlaySlip(models.Model):
     date_added = models.DateTimeField(auto_now_add=True)
     is_premium = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['issuer', 'date_added']),
+        ]
+
     def __str__(self):
         return f'{self.title}'
 
 
-class Match(models.Model):
-    sports = models.CharField(max_length=20)
-    competition = models.CharField(max_length=50)
-    home_team = models.CharField(max_length=50)
-    away_team = models.CharField(max_length=50)
-    match_day = models.DateTimeField()
-    result = models.CharField(max_length=10, null=True)
-
-
 class Play(models.Model):
     LOSS = 0
     WIN = 1
@@ -28,10 +24,10 @@ class Play(models.Model):
         (WIN, "WIN"),
         (PENDING, "PENDING")
     )
-    match = models.ForeignKey('core.Match', on_delete=models.CASCADE, null=True)
+    game = models.ForeignKey('core.SportsGame', on_delete=models.CASCADE, null=True, related_name='plays')
     slip = models.ForeignKey('core.PlaySlip', on_delete=models.CASCADE)    
     prediction = models.CharField(max_length=50)
     status = models.PositiveIntegerField(choices=STATUS, default=PENDING)
 
     def __str__(self):
-        return f'{self.match.sports}-{self.slip.issuer.user.username}'
+        return f'{self.game.type}-{self.slip.issuer.user.username}'
@@ -1,4 +1,29 @@
+import pytz
+from datetime import datetime
 from django.db import models
+from django.db.models import Q
+
+
+class SubscriptionQuerySet(models.QuerySet):
+    def active(self):
+        """
+        Active subscriptions, leaving out premium ones whose expiration date has
+        passed but which the expiry sweeper has not flipped yet.
+        """
+        return self.filter(
+            Q(type=Subscription.FREE)
+            | Q(expiration_date__isnull=True)
+            | Q(expiration_date__gte=datetime.utcnow().replace(tzinfo=pytz.UTC)),
+            is_active=True,
+        )
+
+    def expired(self):
+        return self.filter(
+            type=Subscription.PREMIUM,
+            is_active=True,
+            expiration_date__lt=datetime.utcnow().replace(tzinfo=pytz.UTC),
+        )
+
 
 class Subscription(models.Model):
     FREE = 0
@@ -15,5 +40,22 @@ class Subscription(models.Model):
     expiration_date = models.DateTimeField(null=True)
     is_active = models.BooleanField(default=True)
 
+    objects = SubscriptionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['subscriber', 'issuer', 'is_active']),
+            models.Index(
+                fields=['issuer', 'type', 'subscriber'],
+                condition=Q(is_active=True),
+                name='subscription_fanout_idx',
+            ),
+            models.Index(
+                fields=['expiration_date'],
+                condition=Q(type=1, is_active=True),
+                name='subscription_expiry_idx',
+            ),
+        ]
+
     def __str__(self):
         return f'{self.type}-{self.issuer.user.username}->{self.subscriber.user.username}'
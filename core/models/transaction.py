@@ -46,3 +46,13 @@ class Transaction(models.Model):
     currency = models.ForeignKey('core.Currency', on_delete=models.CASCADE, related_name='currency_transaction', editable=False)
     time = models.DateTimeField(auto_now_add=True, editable=False)
     last_update = models.DateTimeField(auto_now=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Covers the history export, which reads every column listed here.
+            models.Index(
+                fields=['user', 'time', 'id'],
+                include=['type', 'status', 'amount', 'currency', 'reference'],
+                name='transaction_export_idx',
+            ),
+        ]
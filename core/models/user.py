@@ -2,14 +2,18 @@ import pytz
 from datetime import datetime, timedelta
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.postgres.expressions import ArraySubquery
 from django.contrib.postgres.fields import ArrayField
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 # from django.db.models.signals import post_save
 # from django.dispatch import receiver
 from django_countries.fields import CountryField
 from hashlib import md5
 from .subscription import Subscription
-from core.shared.model_utils import optimize_image
+from .play import PlaySlip
+from .avatar import AvatarJob
 
 
 def default_free_features():
@@ -25,8 +29,10 @@ def meta_default():
 
 class Wallet(models.Model):
     currency = models.ForeignKey('core.Currency', on_delete=models.PROTECT)
-    balance = models.FloatField(default=0.00)
-    withheld = models.FloatField(default=0.00)
+    # Minor units of `currency` (kobo, pesewas, ...). Only core.shared.ledger
+    # writes these, under a row lock, alongside balanced LedgerEntry rows.
+    balance = models.BigIntegerField(default=0)
+    withheld = models.BigIntegerField(default=0)
     bank_code = models.CharField(max_length=10, default="", blank=True)
     bank_account_number = models.CharField(max_length=50, default="", blank=True)
     authorizations = ArrayField(models.JSONField(), size=5, default=list, blank=True)
@@ -50,11 +56,69 @@ class Pricing(models.Model):
         return f'{self.amount}'
 
 
+def subscriber_count(subscriptions):
+    return Coalesce(
+        Subquery(
+            subscriptions.order_by().values('issuer').annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def latest_slip_date():
+    return Subquery(
+        PlaySlip.objects.filter(issuer=OuterRef('pk'))
+        .order_by('-date_added').values('date_added')[:1]
+    )
+
+
+class UserAccountQuerySet(models.QuerySet):
+    def with_card(self):
+        """
+        Load what the compact nested card needs: the related user, subscriber
+        counts and the latest slip date.
+        """
+        subscriptions = Subscription.objects.active().filter(issuer=OuterRef('pk'))
+        return self.select_related('user').annotate(
+            free_subscriber_total=subscriber_count(subscriptions.filter(type=Subscription.FREE)),
+            premium_subscriber_total=subscriber_count(subscriptions.filter(type=Subscription.PREMIUM)),
+            latest_slip_date=latest_slip_date(),
+        )
+
+    def with_profile(self):
+        """
+        Load everything the public profile serializers read in one query:
+        related user, wallet currency and pricing, plus subscriber lists and
+        the latest slip date as annotations picked up by the properties below.
+        """
+        subscriptions = Subscription.objects.active()
+        return self.select_related('user', 'pricing', 'wallet__currency').annotate(
+            free_subscriber_names=ArraySubquery(
+                subscriptions.filter(issuer=OuterRef('pk'), type=Subscription.FREE)
+                .values('subscriber__user__username')
+            ),
+            premium_subscriber_names=ArraySubquery(
+                subscriptions.filter(issuer=OuterRef('pk'), type=Subscription.PREMIUM)
+                .values('subscriber__user__username')
+            ),
+            subscription_issuer_names=ArraySubquery(
+                subscriptions.filter(subscriber=OuterRef('pk'), type=Subscription.FREE)
+                .values('issuer__user__username')
+            ),
+            latest_slip_date=latest_slip_date(),
+        )
+
+
 class UserAccount(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     display_name = models.CharField(default="", max_length=50)
     bio = models.TextField(default="")
     image = models.FileField(null=True, blank=True)
+    # Set by the avatar worker: the sha256 of the upload the variants were
+    # rendered from, and their storage names as {size: {format: name}}.
+    avatar_hash = models.CharField(max_length=64, default="", blank=True, editable=False)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     country = CountryField(default="", blank=True, blank_label="(Select country)")
     phone_number = models.CharField(default="", max_length=22)
     twitter_handle = models.CharField(default="", max_length=22, blank=True)
@@ -65,6 +129,8 @@ class UserAccount(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     last_updated = models.DateTimeField(auto_now=True, editable=False)
 
+    objects = UserAccountQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.user.username}'
 
@@ -76,46 +142,63 @@ class UserAccount(models.Model):
 
     @property
     def is_punter(self):
-        try:
-            latest_play = self.playslip_set.latest('date_added')
-            if latest_play.date_added + timedelta(days=14) > datetime.utcnow().replace(tzinfo=pytz.UTC):
-                return True
-            return False
-        except:
-            return False
+        if hasattr(self, 'latest_slip_date'):
+            latest_slip_date = self.latest_slip_date
+        else:
+            try:
+                latest_slip_date = self.playslip_set.latest('date_added').date_added
+            except PlaySlip.DoesNotExist:
+                return False
+        if latest_slip_date and latest_slip_date + timedelta(days=14) > datetime.utcnow().replace(tzinfo=pytz.UTC):
+            return True
+        return False
 
     @property
     def subscription_issuers(self):
-        subscribers = Subscription.objects.filter(
+        if hasattr(self, 'subscription_issuer_names'):
+            return self.subscription_issuer_names
+        subscribers = Subscription.objects.active().filter(
             subscriber=self.pk,
-            is_active=True,
             type=Subscription.FREE
         ).values_list("issuer__user__username", flat=True)
         return subscribers
 
     @property
     def free_subscribers(self):
-        subscribers = Subscription.objects.filter(
+        if hasattr(self, 'free_subscriber_names'):
+            return self.free_subscriber_names
+        subscribers = Subscription.objects.active().filter(
             issuer=self.pk,
-            is_active=True,
             type=Subscription.FREE
         ).values_list("subscriber__user__username", flat=True)
         return subscribers
     
     @property
     def premium_subscribers(self):
-        subscribers = Subscription.objects.filter(
+        if hasattr(self, 'premium_subscriber_names'):
+            return self.premium_subscriber_names
+        subscribers = Subscription.objects.active().filter(
             issuer=self.pk,
-            is_active=True,
             type=Subscription.PREMIUM
         ).values_list("subscriber__user__username", flat=True)
         return subscribers
 
+    @property
+    def free_subscriber_count(self):
+        if hasattr(self, 'free_subscriber_total'):
+            return self.free_subscriber_total
+        return Subscription.objects.active().filter(issuer=self.pk, type=Subscription.FREE).count()
+
+    @property
+    def premium_subscriber_count(self):
+        if hasattr(self, 'premium_subscriber_total'):
+            return self.premium_subscriber_total
+        return Subscription.objects.active().filter(issuer=self.pk, type=Subscription.PREMIUM).count()
+
     def is_subscriber(self, issuer):
-        subscriber_count = Subscription.objects.filter(
+        subscriber_count = Subscription.objects.active().filter(
             issuer=issuer,
             subscriber=self.pk,
-            is_active=True,
         ).count()
 
         if len(subscriber_count) > 0:
@@ -123,11 +206,10 @@ class UserAccount(models.Model):
         return False
     
     def is_premium_subscriber(self, issuer):
-        subscriber_count = Subscription.objects.filter(
+        subscriber_count = Subscription.objects.active().filter(
             issuer=issuer,
             subscriber=self.pk,
             type=Subscription.PREMIUM,
-            is_active=True,
         ).count()
 
         if len(subscriber_count) > 0:
@@ -139,13 +221,24 @@ class UserAccount(models.Model):
         url = 'https://gravatar.com/avatar/{}?d=identicon'.format(digest)
         self.image.name = url
 
+    @property
+    def processed_image(self):
+        """Storage name of the variant served as `image`, if one was rendered."""
+        size = str(settings.AVATAR_DEFAULT_SIZE)
+        return self.avatar_variants.get(size, {}).get('jpeg')
+
     def save(self, *args, **kwargs):
-        gravatar_uri = "https://gravatar.com/avatar/"
-        if not settings.DEBUG and self.image.name and gravatar_uri not in self.image.name:
-            self.image = optimize_image(self)
-        elif not self.image:
+        # A new upload is queued for the avatar worker; until its variants
+        # are ready the current avatar, or the gravatar, stays in place.
+        upload = None
+        if self.image and not self.image._committed:
+            upload = self.image.file
+            self.image = self.processed_image
+        if not self.image:
             self.save_avatar()
         super(UserAccount, self).save()
+        if upload is not None:
+            AvatarJob.objects.submit(self, upload)
 
     # @receiver(post_save, sender=User)
     # def create_user_profile(sender, instance, created, **kwargs):
@@ -25,11 +25,44 @@ class SportsWager(models.Model):
     is_public = models.BooleanField(default=True)
     status = models.PositiveIntegerField(choices=STATUS, default=PENDING)
     transaction = models.ForeignKey('core.Transaction', on_delete=models.CASCADE)
+    # Set only for wagers placed on the order book: the stake still waiting
+    # for opposing orders, in minor units like Wallet.balance.
+    unmatched_amount = models.BigIntegerField(null=True, editable=False)
+    # Whether the matching engine has taken the order into its book.
+    booked = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['backer', 'placed_time']),
+            models.Index(fields=['layer', 'placed_time']),
+            models.Index(fields=['game', 'status']),
+            models.Index(
+                fields=['placed_time', 'id'],
+                name='wager_order_queue_idx',
+                condition=models.Q(booked=False, unmatched_amount__isnull=False),
+            ),
+            models.Index(
+                fields=['game', 'market', 'placed_time'],
+                name='wager_resting_order_idx',
+                condition=models.Q(booked=True, unmatched_amount__gt=0),
+            ),
+        ]
 
     def __str__(self):
         return f'{self.id}-{self.backer}'
 
 
+class WagerFill(models.Model):
+    """Part of an order-book wager matched against an opposing order."""
+    maker = models.ForeignKey('core.SportsWager', on_delete=models.CASCADE, related_name='maker_fills')
+    taker = models.ForeignKey('core.SportsWager', on_delete=models.CASCADE, related_name='taker_fills')
+    amount = models.BigIntegerField()
+    time = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.maker_id}<-{self.taker_id}:{self.amount}'
+
+
 class SportsWagerChallenge(models.Model):
     wager = models.ForeignKey('core.SportsWager', on_delete=models.CASCADE, related_name="invitation")
     requestor = models.ForeignKey('core.UserAccount', on_delete=models.CASCADE, related_name='requestor_request')
@@ -0,0 +1,41 @@
+from django.db import models
+
+
+class WebhookEvent(models.Model):
+    """
+    Append-only inbox of webhook deliveries. A delivery is stored once per
+    (provider, reference), so provider retries are dropped on arrival, and
+    is handled later by the webhook worker, which stamps `processed_time`.
+    Clearing `processed_time` replays an event.
+    """
+    PAYSTACK = 0
+    FLUTTERWAVE = 1
+    WHATSAPP = 2
+    PROVIDER = (
+        (PAYSTACK, 'PAYSTACK'),
+        (FLUTTERWAVE, 'FLUTTERWAVE'),
+        (WHATSAPP, 'WHATSAPP'),
+    )
+    provider = models.PositiveIntegerField(choices=PROVIDER, editable=False)
+    event = models.CharField(max_length=100, default="", blank=True, editable=False)
+    reference = models.CharField(max_length=200, editable=False)
+    payload = models.JSONField(editable=False)
+    received_time = models.DateTimeField(auto_now_add=True, editable=False)
+    processed_time = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(default="", blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'reference'], name='webhook_event_reference_unique'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['id'],
+                name='webhook_event_pending_idx',
+                condition=models.Q(processed_time__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.get_provider_display()}:{self.reference}'
@@ -0,0 +1,176 @@
+import json
+from functools import reduce
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from core.exceptions import BadRequestError
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination, opt-in by default: requests without a `cursor` query
+    param get the whole queryset as before, unless `opt_in` is turned off.
+    `?cursor=` returns the first page and every response carries the cursor
+    for the next one. Pages are found by comparing against the last row
+    seen on `ordering`, so a page costs the same however deep the client
+    scrolls.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+    ordering = ('-id',)
+    opt_in = True
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.opt_in and self.cursor_query_param not in request.query_params:
+            return None
+
+        self.request = request
+        self.model = queryset.model
+        self.ordering = self.get_ordering(request)
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        results = results[:page_size]
+        self.next_position = self.get_position(results[-1]) if self.has_next else None
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, request):
+        return self.ordering
+
+    def get_fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_position(self, instance):
+        return [reduce(getattr, field.split('__'), instance) for field in self.get_fields()]
+
+    def get_model_field(self, path):
+        """Resolve `path`, following relations for lookups like `stats__win_rate`."""
+        model = self.model
+        for name in path.split('__'):
+            field = model._meta.get_field(name)
+            model = field.related_model
+        return field
+
+    def get_keyset_filter(self, position):
+        """
+        Rows strictly after `position`, e.g. for ('-date_added', '-id'):
+        date_added < d OR (date_added = d AND id < i)
+        """
+        keyset = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            keyset |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return keyset
+
+    def encode_cursor(self, position):
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        return urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            fields = self.get_fields()
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            return [
+                self.get_model_field(field).to_python(value)
+                for field, value in zip(fields, values)
+            ]
+        except (TypeError, ValueError, UnicodeError, BinasciiError, ValidationError):
+            raise BadRequestError(detail='Invalid cursor')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+
+class PlaySlipPagination(KeysetPagination):
+    ordering = ('-date_added', '-id')
+
+
+class SportsWagerPagination(KeysetPagination):
+    ordering = ('-placed_time', '-id')
+
+
+class TransactionPagination(KeysetPagination):
+    ordering = ('-time', '-id')
+
+
+class CapperPagination(KeysetPagination):
+    """Leaderboard pages, sorted by `?sort=` (one of `orderings`)."""
+    sort_query_param = 'sort'
+    orderings = {
+        'recent': ('-stats__last_slip_date', '-id'),
+        'win_rate': ('-stats__win_rate', '-id'),
+        'free_subscribers': ('-stats__free_subscriber_count', '-id'),
+        'premium_subscribers': ('-stats__premium_subscriber_count', '-id'),
+    }
+    ordering = orderings['recent']
+
+    def get_ordering(self, request):
+        sort = request.query_params.get(self.sort_query_param)
+        if sort is None:
+            return self.ordering
+        if sort not in self.orderings:
+            raise BadRequestError(detail='Invalid sort')
+        return self.orderings[sort]
+
+
+class SubscriberPagination(KeysetPagination):
+    ordering = ('-subscription_date', '-id')
+    opt_in = False
+
+
+class SportsGamePagination(KeysetPagination):
+    """
+    Games listing pages, in the order of the listing asked for: the first of
+    `orderings` whose filter is on. Always paginated, as the catalogue holds
+    every imported fixture.
+    """
+    orderings = {
+        'top': ('-wager_count', '-id'),
+        'latest': ('-time_added', '-id'),
+        'open': ('match_day', 'id'),
+        'expired': ('-match_day', '-id'),
+        'fixtures': ('-competition', 'match_day', 'id'),
+    }
+    opt_in = False
+
+    def get_ordering(self, request):
+        for listing, ordering in self.orderings.items():
+            if request.query_params.get(listing) in ('true', 'True', '1'):
+                return ordering
+        return self.ordering
@@ -1,3 +1,5 @@
+from ipaddress import ip_address, ip_network
+from django.conf import settings
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
 class  IsOwnerOrReadOnly(BasePermission):
@@ -9,19 +11,29 @@ class  IsOwnerOrReadOnly(BasePermission):
         
         return int(obj) == request.user.useraccount.id
 
+def get_client_ip(request):
+    # nginx-proxy appends the peer it saw, so only the last X-Forwarded-For
+    # entry cannot be set by the client.
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR')
+
+def compile_networks(addresses):
+    return tuple(ip_network(address) for address in addresses)
+
+def ip_in_networks(ip, networks):
+    try:
+        address = ip_address(ip)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
 class PaystackWebhookPermission(BasePermission):
-    def get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+    networks = compile_networks(settings.PAYSTACK_WEBHOOK_IPS)
 
     def has_permission(self, request, view):
-        PAYSTACK_IPS = ['52.31.139.75', '52.49.173.169', '52.214.14.220']
-        client_IP = self.get_client_ip(request) in PAYSTACK_IPS
-        client_IP in PAYSTACK_IPS
+        return ip_in_networks(get_client_ip(request), self.networks)
 
 
 
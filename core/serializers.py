@@ -2,7 +2,10 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.sites.shortcuts import get_current_site
+from django.core.files.storage import default_storage
+from django.db.models import F, Prefetch
 from django.urls.base import reverse
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from dj_rest_auth.registration.serializers import RegisterSerializer
@@ -15,12 +18,19 @@ from allauth.account.utils import user_pk_to_url_str, user_username
 from dj_rest_auth.forms import AllAuthPasswordResetForm
 from dj_rest_auth.serializers import PasswordResetSerializer
 from core.models.user import UserAccount, Pricing, Wallet
-from core.models.play import Play, PlaySlip, Match
+from core.models.play import Play, PlaySlip
 from core.models.wager import SportsWager, SportsWagerChallenge
 from core.models.games import SportsGame, Team, Sport, Competition, Market
 from core.models.transaction import Currency, Transaction
 from core.models.subscription import Subscription
 from core.models.misc import TermsOfUse, PrivacyPolicy, Feedback, Waitlist
+from core.shared.fixtures import get_sport_ids
+from core.shared.ledger import to_major_units, to_minor_units, to_transaction_amount
+
+def prefetch_useraccounts(*lookups):
+    """Prefetch nested user accounts with everything UserAccountCardSerializer reads."""
+    return [Prefetch(lookup, queryset=UserAccount.objects.with_card()) for lookup in lookups]
+
 
 class UserAccountRegisterSerializer(RegisterSerializer):
     username = serializers.CharField(required=False)
@@ -106,7 +116,33 @@ class UserPricingSerializer(serializers.ModelSerializer):
 
 
 
+class MinorUnitsField(serializers.ReadOnlyField):
+    """Wallet amounts are stored in minor units but served in major units."""
+    def to_representation(self, value):
+        return to_major_units(value)
+
+
+class AvatarVariantsField(serializers.ReadOnlyField):
+    """Rendered avatar variants as URLs, keyed by size and then format."""
+    def to_representation(self, value):
+        return {
+            size: {fmt: default_storage.url(name) for fmt, name in formats.items()}
+            for size, formats in value.items()
+        }
+
+
 class OwnerUserWalletSerializer(serializers.ModelSerializer):
+    balance = MinorUnitsField()
+    withheld = MinorUnitsField()
+
+    def update(self, instance, validated_data):
+        # Save only the submitted fields so a concurrent ledger posting
+        # to balance/withheld is never overwritten.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
     class Meta:
         model = Wallet
         fields = '__all__'
@@ -131,6 +167,7 @@ class OwnerUserAccountSerializer(serializers.ModelSerializer):
     wallet = OwnerUserWalletSerializer()
     country = CountryField(name_only=True)
     image = serializers.ImageField(required=False)
+    avatar_variants = AvatarVariantsField()
 
     class Meta:
         model = UserAccount
@@ -159,6 +196,7 @@ class UserAccountSerializer(serializers.ModelSerializer):
     currency = serializers.CharField(source="wallet.currency.code")
     is_premium_capper = serializers.SerializerMethodField()
     fw_subaccount_id = serializers.SerializerMethodField()
+    avatar_variants = AvatarVariantsField()
 
     def get_is_premium_capper(self, instance):
         return instance.wallet.bank_code and instance.wallet.bank_account_number \
@@ -167,19 +205,61 @@ class UserAccountSerializer(serializers.ModelSerializer):
     def get_fw_subaccount_id(self, instance):
         return instance.wallet.meta.get("fw_subaccount_id")
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.with_profile()
+
+    class Meta:
+        model = UserAccount
+        exclude = ['ip_address', 'phone_number', 'avatar_hash']
+
+
+class CapperSerializer(UserAccountSerializer):
+    """Public profile plus the capper's leaderboard stats."""
+    win_rate = serializers.FloatField(source="stats.win_rate")
+    settled_play_count = serializers.IntegerField(source="stats.settled_play_count")
+    last_slip_date = serializers.DateTimeField(source="stats.last_slip_date")
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.with_profile().select_related('stats')
+
+    class Meta(UserAccountSerializer.Meta):
+        pass
+
+
+class UserAccountCardSerializer(serializers.ModelSerializer):
+    """Compact public representation used wherever a user is nested."""
+    username = serializers.CharField(source="user.username")
+    is_punter = serializers.BooleanField()
+    free_subscriber_count = serializers.IntegerField()
+    premium_subscriber_count = serializers.IntegerField()
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.with_card()
+
     class Meta:
         model = UserAccount
-        exclude = ['ip_address', 'phone_number']
+        fields = [
+            'id', 'username', 'display_name', 'image', 'is_punter',
+            'free_subscriber_count', 'premium_subscriber_count',
+        ]
 
 
 class PlaySlipSerializer(serializers.ModelSerializer):
-    issuer = UserAccountSerializer()
+    issuer = UserAccountCardSerializer()
     plays = serializers.SerializerMethodField(read_only=True)
 
     def get_plays(self, instance):
-        serializer = PlaySerializer(data=instance.play_set.all(), many=True)
-        serializer.is_valid()
-        return serializer.data
+        return PlaySerializer(instance.play_set.all(), many=True).data
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.prefetch_related(
+            *prefetch_useraccounts('issuer'),
+            Prefetch('play_set', queryset=Play.objects.select_related('game__type')),
+        )
 
     class Meta:
         model = PlaySlip
@@ -188,18 +268,58 @@ class PlaySlipSerializer(serializers.ModelSerializer):
 
 
 class MatchSerializer(serializers.ModelSerializer):
+    """A catalogue game in the shape plays have always been served in."""
+    sports = serializers.CharField(source='type.name')
+    home_team = serializers.CharField(source='home')
+    away_team = serializers.CharField(source='away')
 
     class Meta:
-        model = Match
-        fields = '__all__'
+        model = SportsGame
+        fields = ('id', 'sports', 'competition', 'home_team', 'away_team', 'match_day', 'result', 'winning_markets')
 
 
 class PlaySerializer(serializers.ModelSerializer):
-    match = MatchSerializer()
+    match = MatchSerializer(source='game')
 
     class Meta:
         model = Play
-        fields = '__all__'
+        exclude = ('game',)
+
+
+class FixtureSerializer(serializers.Serializer):
+    """The fields that identify a match; results are never taken from cappers."""
+    sports = serializers.CharField(max_length=50)
+    competition = serializers.CharField(max_length=100)
+    home_team = serializers.CharField(max_length=100, source='home')
+    away_team = serializers.CharField(max_length=100, source='away')
+    match_day = serializers.DateTimeField()
+
+
+class NewPlaySerializer(serializers.ModelSerializer):
+    match = FixtureSerializer()
+
+    class Meta:
+        model = Play
+        fields = ('match', 'prediction')
+
+
+class NewPlaySlipSerializer(serializers.ModelSerializer):
+    plays = NewPlaySerializer(many=True, allow_empty=False)
+
+    def validate_plays(self, plays):
+        """Swap each sport name for its catalogue id, looking them all up at once."""
+        names = {play['match']['sports'] for play in plays}
+        sports = get_sport_ids(names)
+        unknown = names - sports.keys()
+        if unknown:
+            raise ValidationError(f"Unknown sport: {', '.join(sorted(unknown))}")
+        for play in plays:
+            play['match']['type_id'] = sports[play['match'].pop('sports')]
+        return plays
+
+    class Meta:
+        model = PlaySlip
+        fields = ('title', 'is_premium', 'plays')
 
 
 class CurrencySerializer(serializers.ModelSerializer):
@@ -217,14 +337,30 @@ class TransactionSerializer(serializers.ModelSerializer):
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
-    issuer = UserAccountSerializer()
-    subscriber = UserAccountSerializer()
+    issuer = UserAccountCardSerializer()
+    subscriber = UserAccountCardSerializer()
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.prefetch_related(*prefetch_useraccounts('issuer', 'subscriber'))
 
     class Meta:
         model = Subscription
         fields = '__all__'
 
 
+class SubscriberSerializer(serializers.ModelSerializer):
+    subscriber = UserAccountCardSerializer()
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.prefetch_related(*prefetch_useraccounts('subscriber'))
+
+    class Meta:
+        model = Subscription
+        fields = ['id', 'type', 'subscription_date', 'subscriber']
+
+
 class SportSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -234,7 +370,6 @@ class SportSerializer(serializers.ModelSerializer):
 
 class SportsGameSerializer(serializers.ModelSerializer):
     type = SportSerializer()
-    wager_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = SportsGame
@@ -243,9 +378,9 @@ class SportsGameSerializer(serializers.ModelSerializer):
 
 class SportsWagerSerializer(serializers.ModelSerializer):
     game = SportsGameSerializer()
-    backer = UserAccountSerializer()
-    layer = UserAccountSerializer()
-    winner = UserAccountSerializer()
+    backer = UserAccountCardSerializer()
+    layer = UserAccountCardSerializer()
+    winner = UserAccountCardSerializer()
 
     def to_internal_value(self, data):
         new_data = data
@@ -254,36 +389,63 @@ class SportsWagerSerializer(serializers.ModelSerializer):
         return new_data
 
     def create(self, validated_data):
-        sport = Sport.objects.get(name=validated_data.get("game").pop("type"))
-        sports_game = SportsGame.objects.get_or_create(
-            type=sport,
-            competition=validated_data.get("game").pop("competition"),
-            home=validated_data.get("game").pop("home"),
-            away=validated_data.get("game").pop("away"),
-            match_day=validated_data.get("game").pop("match_day")
-        )
-        if sports_game[0].result:
+        sports_game = self.get_game(validated_data.get("game"))
+        if sports_game.result:
             raise ValidationError(detail="Game no longer available for wager")
+        if validated_data.get("unmatched_amount") is not None and sports_game.match_day <= timezone.now():
+            raise ValidationError(detail="Game has already started")
         transaction = Transaction.objects.create(
             type=Transaction.WAGER,
-            amount=validated_data.get("stake"),
-            balance=validated_data.get("backer").wallet.balance,
+            amount=to_transaction_amount(to_minor_units(validated_data.get("stake"))),
             user=validated_data.get("backer"),
             status=Transaction.PENDING,
             currency=validated_data.get("backer").wallet.currency
         )
         sports_wager = SportsWager.objects.create(
-            game=sports_game[0],
+            game=sports_game,
             market=validated_data.get("market"),
             backer=validated_data.get("backer"),
             backer_option=validated_data.get("backer_option"),
             stake=validated_data.get("stake"),
             transaction=transaction,
+            unmatched_amount=validated_data.get("unmatched_amount"),
+        )
+        SportsGame.objects.filter(id=sports_game.id).update(
+            is_wager_played=True,
+            wager_count=F('wager_count') + 1,
+            total_stake=F('total_stake') + to_minor_units(sports_wager.stake),
         )
-        sports_game[0].is_wager_played = True
-        sports_game[0].save()
         return sports_wager
 
+    @staticmethod
+    def get_game(game):
+        """
+        The catalogue game a new wager is placed on: either its id, or the
+        fixture itself, which is added to the catalogue if it is new.
+        """
+        if not isinstance(game, dict):
+            try:
+                return SportsGame.objects.get(id=game)
+            except (SportsGame.DoesNotExist, ValueError, TypeError):
+                raise ValidationError(detail="Game not found")
+        try:
+            sport = Sport.objects.get(name=game.get("type"))
+        except Sport.DoesNotExist:
+            raise ValidationError(detail="Unknown sport")
+        return SportsGame.objects.get_or_create_fixtures([{
+            "type_id": sport.id,
+            "competition": game.get("competition"),
+            "home": game.get("home"),
+            "away": game.get("away"),
+            "match_day": serializers.DateTimeField().to_internal_value(game.get("match_day")),
+        }])[0]
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('game__type').prefetch_related(
+            *prefetch_useraccounts('backer', 'layer', 'winner')
+        )
+
     class Meta:
         model = SportsWager
         exclude = ['transaction']
@@ -291,8 +453,8 @@ class SportsWagerSerializer(serializers.ModelSerializer):
 
 class SportsWagerChallengeSerializer(serializers.ModelSerializer):
     wager = SportsWagerSerializer()
-    requestor = UserAccountSerializer()
-    requestee = UserAccountSerializer()
+    requestor = UserAccountCardSerializer()
+    requestee = UserAccountCardSerializer()
 
     class Meta:
         model = SportsWagerChallenge
@@ -300,9 +462,13 @@ class SportsWagerChallengeSerializer(serializers.ModelSerializer):
 
 
 class TransactionSerializer(serializers.ModelSerializer):
-    user = UserAccountSerializer()
+    user = UserAccountCardSerializer()
     currency = CurrencySerializer()
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('currency').prefetch_related(*prefetch_useraccounts('user'))
+
     class Meta:
         model = Transaction
         fields = '__all__'
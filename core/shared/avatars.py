@@ -0,0 +1,93 @@
+from io import BytesIO
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from core.models.avatar import AvatarJob
+from core.models.user import UserAccount
+from core.shared import queue
+
+# variant format -> (file extension, Pillow format, encoder options)
+FORMATS = {
+    'webp': ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', 'JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def get_variant_names(content_hash):
+    """Storage names of every variant of an upload, as {size: {format: name}}."""
+    return {
+        str(size): {fmt: f'avatars/{content_hash}/{size}.{extension}' for fmt, (extension, _, _) in FORMATS.items()}
+        for size in settings.AVATAR_SIZES
+    }
+
+
+def decode(source):
+    """Open an upload once, upright and flattened onto white, decoded no larger than the biggest variant needs."""
+    image = Image.open(source)
+    largest = max(settings.AVATAR_SIZES)
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render(job):
+    """
+    Write the variants of `job`'s upload and return their names. Names are
+    derived from the content hash, so variants that are already stored, from
+    an earlier attempt or another account uploading the same picture, are
+    kept and the upload is not decoded at all when none are missing.
+    """
+    names = get_variant_names(job.content_hash)
+    missing = {
+        (size, fmt) for size, formats in names.items()
+        for fmt, name in formats.items() if not default_storage.exists(name)
+    }
+    if not missing:
+        return names
+    with job.source.open('rb') as source:
+        image = decode(source)
+    # Each size is cut from the previous, larger one.
+    for size in sorted(settings.AVATAR_SIZES, reverse=True):
+        image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        for fmt, (_, pil_format, options) in FORMATS.items():
+            if (str(size), fmt) not in missing:
+                continue
+            output = BytesIO()
+            image.save(output, format=pil_format, **options)
+            names[str(size)][fmt] = default_storage.save(names[str(size)][fmt], ContentFile(output.getvalue()))
+    return names
+
+
+def apply(job):
+    if not AvatarJob.objects.filter(useraccount=job.useraccount_id, id__gt=job.id).exists():
+        variants = render(job)
+        UserAccount.objects.filter(id=job.useraccount_id).update(
+            image=variants[str(settings.AVATAR_DEFAULT_SIZE)]['jpeg'],
+            avatar_hash=job.content_hash,
+            avatar_variants=variants,
+            last_updated=timezone.now(),
+        )
+    # The upload is only needed until the job is done.
+    name = job.source.name
+    transaction.on_commit(lambda: default_storage.delete(name))
+
+
+def process_pending(batch_size=20):
+    """
+    Render up to `batch_size` queued avatars, oldest first, and return how
+    many jobs were taken. Only the newest upload of an account is rendered,
+    and each finished job's upload is deleted once the batch commits. A
+    failing job is retried up to AVATAR_MAX_ATTEMPTS times, reusing the
+    variants it already stored (see queue.process_batch).
+    """
+    return queue.process_batch(
+        AvatarJob.objects.all(), apply, 'finished_time', settings.AVATAR_MAX_ATTEMPTS, batch_size=batch_size,
+    )
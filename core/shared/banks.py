@@ -0,0 +1,41 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from core.shared.cache import get_or_build
+
+
+def succeeded(response):
+    """Whether a Paystack (`true`) or Flutterwave (`"success"`) response reports success."""
+    return response.get('status') in (True, 'success')
+
+
+def list_banks(provider, country, fetch):
+    """
+    The provider's bank list for `country`. Lists are served from the cache
+    and refreshed in the background once stale, so requests only wait on the
+    provider when nothing is cached yet. Failed responses are not cached.
+    """
+    return get_or_build(
+        f'banks:{provider}:{country}',
+        fetch,
+        timeout=settings.BANK_LIST_CACHE_TTL,
+        background=True,
+        cacheable=succeeded,
+    )
+
+
+def resolve_account(provider, bank_code, account_number, fetch):
+    """
+    Resolve an account through `fetch`, remembering the answer briefly.
+    Accounts that resolve are kept for ACCOUNT_RESOLUTION_CACHE_TTL and
+    rejected ones for the shorter ACCOUNT_RESOLUTION_NEGATIVE_TTL. Account
+    numbers are hashed into the key so they are not stored in clear.
+    """
+    digest = hashlib.sha256(f'{bank_code}:{account_number}'.encode()).hexdigest()
+    key = f'account-resolution:{provider}:{digest}'
+    response = cache.get(key)
+    if response is None:
+        response = fetch()
+        timeout = settings.ACCOUNT_RESOLUTION_CACHE_TTL if succeeded(response) else settings.ACCOUNT_RESOLUTION_NEGATIVE_TTL
+        cache.set(key, response, timeout=timeout)
+    return response
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.http import urlencode
+
+logger = logging.getLogger(__name__)
+
+
+def get_or_build(key, build, timeout=settings.CACHE_TTL, lock_timeout=30, wait=1.0, background=False, cacheable=None):
+    """
+    Return the cached value for `key`, calling `build()` to refresh it.
+
+    Entries are kept for twice `timeout` but considered fresh only for
+    `timeout`. Once stale, a single caller takes the `<key>:lock` and
+    rebuilds while everyone else keeps serving the stale copy, so an expiry
+    never turns into a stampede. On a cold key, callers that lose the lock
+    wait up to `wait` seconds for the winner before building themselves.
+
+    With `background`, the caller that takes the lock on a stale entry also
+    serves it and rebuilds on a thread, and a failed rebuild leaves the
+    stale copy in place. Values rejected by `cacheable(value)` are returned
+    but not stored.
+    """
+    lock_key = f'{key}:lock'
+    entry = cache.get(key)
+    if entry is not None and entry['expires'] > time.time():
+        return entry['value']
+
+    token = secrets.token_hex(8)
+    locked = cache.add(lock_key, token, timeout=lock_timeout)
+    if not locked:
+        if entry is not None:
+            return entry['value']
+        deadline = time.time() + wait
+        while time.time() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry['value']
+
+    def refresh():
+        try:
+            value = build()
+            if cacheable is None or cacheable(value):
+                cache.set(key, {'value': value, 'expires': time.time() + timeout}, timeout=timeout * 2)
+        finally:
+            # Only release the lock this caller took, and only if it has not
+            # expired and gone to someone else meanwhile.
+            if locked and cache.get(lock_key) == token:
+                cache.delete(lock_key)
+        return value
+
+    if background and entry is not None:
+        def refresh_quietly():
+            try:
+                refresh()
+            except Exception:
+                logger.exception('Background refresh of %s failed', key)
+        threading.Thread(target=refresh_quietly, daemon=True).start()
+        return entry['value']
+    return refresh()
+
+
+def get_version(namespace):
+    """Current version of `namespace`; bumping it orphans every key built on it."""
+    key = f'{namespace}:version'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key, 0)
+    return version
+
+
+def bump_version(*namespaces):
+    """
+    Orphan every key built on `namespaces` once the current transaction
+    commits, so no reader can rebuild from the old rows under the new version.
+    """
+    def bump():
+        for namespace in namespaces:
+            cache.set(f'{namespace}:version', time.time_ns(), timeout=None)
+        local_cache.publish_invalidation(namespaces)
+    transaction.on_commit(bump)
+
+
+def versioned_key(namespace, params):
+    """Cache key for `namespace` at its current version, one per set of `params`."""
+    return f'{namespace}:v{get_version(namespace)}:{urlencode(sorted(params.items()))}'
+
+
+def get_etag(data):
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return '"%s"' % hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+
+def get_redis_connection():
+    """Raw Redis client behind the default cache, or None for other backends."""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except NotImplementedError:
+        return None
+
+
+class LocalCache:
+    """
+    Bounded, thread-safe LRU with a TTL, kept per worker process in front
+    of the shared cache. Entries belong to a namespace; invalidating one
+    drops its entries here and, through Redis pub/sub, in every other
+    worker. The TTL bounds staleness should a message be missed.
+    """
+
+    def __init__(self, max_size, timeout, channel):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.channel = channel
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.listener_pid = None
+
+    def get(self, namespace, key):
+        with self.lock:
+            entry = self.entries.get((namespace, key))
+            if entry is None or entry[1] <= time.monotonic():
+                self.misses += 1
+                return None
+            self.entries.move_to_end((namespace, key))
+            self.hits += 1
+            return entry[0]
+
+    def get_or_build(self, namespace, key, build):
+        self.listen()
+        value = self.get(namespace, key)
+        if value is not None:
+            return value
+        generation = self.generations.get(namespace, 0)
+        value = build()
+        with self.lock:
+            # Skip storing a value that an invalidation raced past.
+            if self.generations.get(namespace, 0) == generation:
+                self.entries[(namespace, key)] = (value, time.monotonic() + self.timeout)
+                self.entries.move_to_end((namespace, key))
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+        return value
+
+    def invalidate(self, namespace):
+        with self.lock:
+            self.generations[namespace] = self.generations.get(namespace, 0) + 1
+            for entry_key in [entry_key for entry_key in self.entries if entry_key[0] == namespace]:
+                del self.entries[entry_key]
+
+    def clear(self):
+        with self.lock:
+            for namespace in self.generations:
+                self.generations[namespace] += 1
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries), 'max_size': self.max_size}
+
+    def publish_invalidation(self, namespaces):
+        for namespace in namespaces:
+            self.invalidate(namespace)
+        connection = get_redis_connection()
+        if connection is not None:
+            for namespace in namespaces:
+                connection.publish(self.channel, namespace)
+
+    def listen(self):
+        """Start the invalidation subscriber once per (forked) process."""
+        if self.listener_pid == os.getpid():
+            return
+        with self.lock:
+            if self.listener_pid == os.getpid():
+                return
+            self.listener_pid = os.getpid()
+        connection = get_redis_connection()
+        if connection is not None:
+            threading.Thread(target=self.subscribe, args=(connection,), daemon=True).start()
+
+    def subscribe(self, connection):
+        while True:
+            try:
+                pubsub = connection.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Anything published while disconnected was missed.
+                self.clear()
+                for message in pubsub.listen():
+                    self.invalidate(message['data'].decode('utf-8'))
+            except Exception:
+                logger.exception('Local cache invalidation listener failed, reconnecting')
+                time.sleep(1)
+
+
+local_cache = LocalCache(settings.LOCAL_CACHE_MAX_SIZE, settings.LOCAL_CACHE_TTL, settings.LOCAL_CACHE_CHANNEL)
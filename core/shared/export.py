@@ -0,0 +1,23 @@
+import csv
+import json
+
+
+class Echo:
+    """File-like object whose `write` hands the line back instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(header, rows):
+    """Yield `header` and then each row as CSV lines, one at a time."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_ndjson(header, rows):
+    """Yield each row as a JSON object keyed by `header`, one per line."""
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), default=str) + '\n'
@@ -0,0 +1,148 @@
+import logging
+from datetime import timedelta, timezone as dt_timezone
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from core.models.games import Sport, SportsGame
+
+logger = logging.getLogger(__name__)
+
+# Recount the wagers on a range of games and fix the counters that drifted.
+RECONCILE_COUNTERS = """
+    WITH counts AS (
+        SELECT game.id,
+               count(wager.id) AS wager_count,
+               count(wager.id) FILTER (WHERE wager.matched) AS matched_count,
+               coalesce(sum(round(wager.stake::numeric * 100)), 0) AS total_stake
+        FROM core_sportsgame AS game
+        LEFT JOIN core_sportswager AS wager ON wager.game_id = game.id
+        WHERE game.id = ANY(%(games)s)
+        GROUP BY game.id
+    )
+    UPDATE core_sportsgame AS game
+    SET wager_count = counts.wager_count,
+        matched_count = counts.matched_count,
+        total_stake = counts.total_stake,
+        is_wager_played = game.is_wager_played OR counts.wager_count > 0
+    FROM counts
+    WHERE game.id = counts.id
+      AND (game.wager_count, game.matched_count, game.total_stake)
+          IS DISTINCT FROM (counts.wager_count, counts.matched_count, counts.total_stake)
+"""
+
+# Move a batch of past games that no wager or play refers to into the
+# archive in one statement, so a game is never in both tables or neither.
+ARCHIVE_GAMES = """
+    WITH moved AS (
+        DELETE FROM core_sportsgame AS game
+        WHERE game.id IN (
+            SELECT candidate.id FROM core_sportsgame AS candidate
+            WHERE candidate.match_day < %(before)s
+              AND NOT EXISTS (SELECT 1 FROM core_sportswager AS wager WHERE wager.game_id = candidate.id)
+              AND NOT EXISTS (SELECT 1 FROM core_play AS play WHERE play.game_id = candidate.id)
+            ORDER BY candidate.match_day
+            LIMIT %(batch_size)s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING game.*
+    )
+    INSERT INTO core_archivedsportsgame (
+        id, type_id, competition, home, away, match_day, result, time_added,
+        markets, winning_markets, settled_time, archived_time
+    )
+    SELECT id, type_id, competition, home, away, match_day, result, time_added,
+           markets, winning_markets, settled_time, now()
+    FROM moved
+"""
+
+
+def get_sport_ids(names):
+    """Catalogue ids of the sports among `names`, keyed by name, in one query."""
+    return dict(Sport.objects.filter(name__in=set(names)).values_list('name', 'id'))
+
+
+def parse_match_day(value):
+    match_day = parse_datetime(value) if isinstance(value, str) else value
+    if match_day is not None and timezone.is_naive(match_day):
+        match_day = timezone.make_aware(match_day, dt_timezone.utc)
+    return match_day
+
+
+def import_fixtures(rows):
+    """
+    Add a batch of feed rows to the fixture catalogue and record the results
+    they carry. Each row has `sport`, `competition`, `home`, `away` and
+    `match_day`, and optionally `result`; rows for sports that are not in the
+    catalogue are skipped.
+
+    Games are found or created in two queries and all new results written
+    with one UPDATE, whatever the batch size. A changed result clears
+    `winning_markets` so settlement derives them again, and games that are
+    already settled are left alone. Returns `(games, results)` touched.
+    """
+    sports = get_sport_ids(row['sport'] for row in rows)
+    fixtures = []
+    for row in rows:
+        if row['sport'] not in sports:
+            logger.warning('Skipping fixture %s v %s: unknown sport %r', row['home'], row['away'], row['sport'])
+            continue
+        fixtures.append({
+            'type_id': sports[row['sport']],
+            'competition': row['competition'],
+            'home': row['home'],
+            'away': row['away'],
+            'match_day': parse_match_day(row['match_day']),
+            'result': row.get('result') or '',
+        })
+    games = SportsGame.objects.get_or_create_fixtures(fixtures)
+
+    finished = {}
+    for fixture, game in zip(fixtures, games):
+        if fixture['result'] and fixture['result'] != game.result and game.settled_time is None:
+            game.result = fixture['result']
+            game.winning_markets = []
+            finished[game.id] = game
+    results = 0
+    if finished:
+        results = SportsGame.objects.filter(settled_time__isnull=True).bulk_update(
+            finished.values(), ['result', 'winning_markets'],
+        )
+    return len({game.id for game in games}), results
+
+
+def reconcile_counters(batch_size=500, include_settled=False):
+    """
+    Recount wagers for every open game, or every game with
+    `include_settled`, `batch_size` games per statement, and return the
+    number of games whose counters had drifted. Request paths keep the
+    counters current; this is the periodic safety net.
+    """
+    games = SportsGame.objects.all() if include_settled else SportsGame.objects.filter(settled_time__isnull=True)
+    corrected = 0
+    last_id = 0
+    while True:
+        ids = list(games.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return corrected
+        with connection.cursor() as cursor:
+            cursor.execute(RECONCILE_COUNTERS, {'games': ids})
+            corrected += cursor.rowcount
+        last_id = ids[-1]
+
+
+def archive_games(days, batch_size=1000):
+    """
+    Move games whose match day is more than `days` ago and that nothing was
+    wagered or played on into ArchivedSportsGame, `batch_size` per
+    transaction, and return how many were moved. Games with wagers or plays
+    stay, as their history still points at them.
+    """
+    before = timezone.now() - timedelta(days=days)
+    archived = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(ARCHIVE_GAMES, {'before': before, 'batch_size': batch_size})
+            moved = cursor.rowcount
+        archived += moved
+        if moved < batch_size:
+            return archived
@@ -1,68 +1,109 @@
 import pytz
 from datetime import datetime
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
 
+from core.models.games import SportsGame
+from core.models.play import PlaySlip
+from core.models.user import UserAccount
 from core.models.transaction import Transaction
 from core.models.subscription import Subscription
+from core.models.wager import SportsWager
+from core.exceptions import ConflictError
 from core.serializers import SportsWagerSerializer
+from core.shared import ledger, realtime
+from core.signals import subscriptions_expired
 
-def sync_subscriptions(**kwargs):
-    if kwargs.get("issuer"):
-        premium_subscriptions = Subscription.objects.filter(
-            issuer=kwargs.get("issuer"),
-            type=1,
-            is_active=True,
-            expiration_date__lt=datetime.utcnow().replace(tzinfo=pytz.UTC)
-        )
-    else:
-        premium_subscriptions = Subscription.objects.filter(
-            subscriber=kwargs.get("subscriber"),
-            type=1,
-            is_active=True,
-            expiration_date__lt=datetime.utcnow().replace(tzinfo=pytz.UTC)
-        )
-    for premium in premium_subscriptions:
-        premium.is_active = False
-        premium.save()
-
-def sync_records(sports_wager, layer, **kwargs):
-    # Record Wagers
-    sports_wager.layer = layer
-    sports_wager.layer_option = kwargs.get("layer_option")
-    sports_wager.matched = True
-    sports_wager.matched_time = datetime.utcnow().replace(tzinfo=pytz.UTC)
-    sports_wager.save()
+def expire_subscriptions(batch_size=1000):
+    """
+    Deactivate premium subscriptions past their expiration date in bulk
+    `UPDATE`s of at most `batch_size` rows and send `subscriptions_expired`
+    for each batch. Rows locked by a concurrent sweeper are skipped.
+    Returns the number of subscriptions expired.
+    """
+    expired = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Subscription.objects.expired()
+                .select_for_update(skip_locked=True)
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return expired
+            Subscription.objects.filter(id__in=ids).update(is_active=False)
+        expired += len(ids)
+        subscriptions_expired.send(sender=Subscription, ids=ids)
 
-    # Record Wallets
-    layer_wallet = layer.wallet
-    layer_wallet.balance = layer_wallet.balance - sports_wager.stake
-    layer_wallet.save()
+def get_subscriber_feed(subscriber):
+    """
+    Slips issued by `subscriber` and by every capper they follow, limited to
+    slips added after the matching subscription started.
 
-    backer = sports_wager.backer
-    backer_wallet = backer.wallet
-    backer_wallet.withheld = backer_wallet.withheld - sports_wager.stake
-    backer_wallet.save()
-
-    # Record Transaction
-    sports_wager.transaction.status = Transaction.SUCCEED
-    sports_wager.transaction.save()
-    Transaction.objects.create(
-        type=Transaction.WAGER,
-        amount=sports_wager.stake,
-        balance=layer_wallet.balance,
-        user=layer,
-        status=Transaction.SUCCEED,
-        currency=backer.currency
+    Candidate issuers are resolved with a single semi-join against
+    `Subscription`, so the query keeps the same shape however many cappers
+    are followed and each issuer is read through the
+    `(issuer, date_added)` index.
+    """
+    subscriptions = Subscription.objects.active().filter(subscriber=subscriber)
+    issuers = subscriptions.values("issuer").union(
+        UserAccount.objects.filter(pk=subscriber).values("pk"),
+    )
+    subscribed = subscriptions.filter(
+        issuer=OuterRef("issuer"),
+        subscription_date__lte=OuterRef("date_added"),
     )
+    return PlaySlip.objects.filter(issuer__in=issuers).filter(
+        Q(issuer=subscriber)
+        | Q(Exists(subscribed.filter(type=Subscription.FREE)), is_premium=False)
+        | Q(Exists(subscribed.filter(type=Subscription.PREMIUM)), is_premium=True)
+    ).order_by("-date_added")
 
-    serializer = SportsWagerSerializer(sports_wager)
-    return serializer
+def sync_records(sports_wager, layer, **kwargs):
+    """
+    Match `sports_wager` with `layer`. The wager is claimed with a single
+    conditional UPDATE, so of several concurrent callers exactly one wins;
+    the others get a ConflictError and nothing is written for them.
+    """
+    with transaction.atomic():
+        # Record Wagers
+        sports_wager.layer = layer
+        sports_wager.layer_option = kwargs.get("layer_option")
+        sports_wager.matched = True
+        sports_wager.matched_time = datetime.utcnow().replace(tzinfo=pytz.UTC)
+        claimed = SportsWager.objects.filter(
+            id=sports_wager.id, matched=False, unmatched_amount__isnull=True, status=SportsWager.PENDING,
+        ).update(
+            layer=layer,
+            layer_option=sports_wager.layer_option,
+            matched=True,
+            matched_time=sports_wager.matched_time,
+        )
+        if not claimed:
+            raise ConflictError(detail="Wager no longer available to play")
+        SportsGame.objects.filter(id=sports_wager.game_id).update(matched_count=F('matched_count') + 1)
+        realtime.wager_matched([sports_wager.id], sports_wager.game_id, [sports_wager.backer_id, layer.id])
 
+        # Record Transaction
+        sports_wager.transaction.status = Transaction.SUCCEED
+        sports_wager.transaction.save()
+        layer_transaction = Transaction.objects.create(
+            type=Transaction.WAGER,
+            amount=ledger.to_transaction_amount(ledger.to_minor_units(sports_wager.stake)),
+            user=layer,
+            status=Transaction.SUCCEED,
+            currency=layer.wallet.currency
+        )
 
-def notify_telegram_users():
-    pass
+        # Record Wallets
+        ledger.match_stakes(
+            sports_wager.backer.wallet_id,
+            layer.wallet_id,
+            ledger.to_minor_units(sports_wager.stake),
+            transaction=layer_transaction,
+            reference=sports_wager.id,
+        )
 
-def notify_whatsapp_users():
-    pass
+    serializer = SportsWagerSerializer(sports_wager)
+    return serializer
 
-def notify_subscribers(data):
-    pass
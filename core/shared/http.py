@@ -0,0 +1,187 @@
+import logging
+import os
+import random
+import threading
+import time
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from core.exceptions import ProviderUnavailableError
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+
+def never_sent(error):
+    """Whether `error` happened before the request could reach the provider."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class CircuitBreaker:
+    """
+    Stop calling a provider after `failure_threshold` consecutive failures.
+    Once `reset_timeout` seconds have passed a single trial call is let
+    through; its success closes the circuit again, its failure reopens it.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial or time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.trial = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+
+class ProviderClient:
+    """
+    JSON client for one payment provider's API. Connections are kept alive
+    in a per-process pool, every call has a (connect, read) timeout, and
+    transient failures are retried with full-jitter exponential backoff:
+    idempotent methods on connection errors, timeouts and 429/5xx gateway
+    statuses, other methods only when the connection could not be made, so
+    a payment is never sent twice.
+
+    `arequest` runs the same call on a worker thread for async callers, so
+    the event loop is not held for the provider round trip.
+    """
+
+    def __init__(self, name, base_url, headers=None, timeout=None, retries=None, backoff=None, pool_size=None):
+        self.name = name
+        self.base_url = base_url
+        self.headers = headers or {}
+        self.timeout = timeout or settings.PROVIDER_HTTP_TIMEOUT
+        self.retries = settings.PROVIDER_HTTP_RETRIES if retries is None else retries
+        self.backoff = settings.PROVIDER_HTTP_BACKOFF if backoff is None else backoff
+        self.pool_size = pool_size or settings.PROVIDER_HTTP_POOL_SIZE
+        self.breaker = CircuitBreaker(settings.PROVIDER_CIRCUIT_FAILURES, settings.PROVIDER_CIRCUIT_RESET)
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        # Pooled sockets must not be shared with a forked worker.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    session.headers.update(self.headers)
+                    self._session, self._pid = session, os.getpid()
+        return self._session
+
+    def should_retry(self, method, attempt, error=None, response=None):
+        if attempt >= self.retries:
+            return False
+        if error is not None:
+            return method in IDEMPOTENT_METHODS or never_sent(error)
+        return method in IDEMPOTENT_METHODS and response.status_code in RETRY_STATUSES
+
+    def sleep(self, attempt):
+        time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    def request(self, method, path, **kwargs):
+        """Send `method` to `path` on the provider and return the decoded JSON body."""
+        method = method.upper()
+        url = path if path.startswith('http') else self.base_url + path
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise self.unavailable(sent=False)
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as error:
+                self.breaker.record_failure()
+                logger.warning('%s %s %s failed: %s', self.name, method, path, error)
+                if not self.should_retry(method, attempt, error=error):
+                    raise self.unavailable(sent=not never_sent(error))
+            else:
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if not self.should_retry(method, attempt, response=response):
+                    return self.decode(response)
+            self.sleep(attempt)
+            attempt += 1
+
+    def decode(self, response):
+        try:
+            return response.json()
+        except ValueError:
+            logger.warning('%s returned a non-JSON %s response', self.name, response.status_code)
+            raise self.unavailable(sent=True)
+
+    def unavailable(self, sent):
+        """
+        The error raised when no usable answer came back. `sent` tells
+        whether the provider may still have acted on the request.
+        """
+        error = ProviderUnavailableError()
+        error.sent = sent
+        return error
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    async def arequest(self, method, path, **kwargs):
+        return await sync_to_async(self.request, thread_sensitive=False)(method, path, **kwargs)
+
+    async def aget(self, path, **kwargs):
+        return await self.arequest('GET', path, **kwargs)
+
+    async def apost(self, path, **kwargs):
+        return await self.arequest('POST', path, **kwargs)
+
+
+paystack = ProviderClient(
+    'paystack',
+    'https://api.paystack.co/',
+    headers={'Authorization': f'Bearer {settings.PAYSTACK_SECRET_KEY}'},
+)
+
+flutterwave = ProviderClient(
+    'flutterwave',
+    'https://api.flutterwave.com/v3/',
+    headers={'Authorization': settings.RAVE_SECRET_KEY or ''},
+)
@@ -0,0 +1,62 @@
+from django.db.models import Count, Max, Q
+from core.models.leaderboard import CapperStats
+from core.models.play import Play, PlaySlip
+from core.models.subscription import Subscription
+
+
+def record_slip(slip):
+    """Move the capper's last slip date forward without touching other stats."""
+    updated = CapperStats.objects.filter(
+        Q(last_slip_date__lt=slip.date_added) | Q(last_slip_date__isnull=True),
+        capper=slip.issuer_id,
+    ).update(last_slip_date=slip.date_added)
+    if not updated:
+        CapperStats.objects.get_or_create(capper_id=slip.issuer_id, defaults={'last_slip_date': slip.date_added})
+
+
+def refresh_play_stats(capper_ids):
+    """Recompute settled plays and win rate for the given cappers only."""
+    totals = Play.objects.filter(slip__issuer__in=capper_ids).values('slip__issuer').annotate(
+        settled=Count('id', filter=Q(status__in=[Play.WIN, Play.LOSS])),
+        won=Count('id', filter=Q(status=Play.WIN)),
+    )
+    for row in totals:
+        settled, won = row['settled'], row['won']
+        CapperStats.objects.update_or_create(
+            capper_id=row['slip__issuer'],
+            defaults={
+                'settled_play_count': settled,
+                'won_play_count': won,
+                'win_rate': won / settled if settled else 0.0,
+            },
+        )
+
+
+def refresh_subscriber_stats(capper_ids):
+    """Recompute active subscriber counts for the given cappers only."""
+    counts = {capper_id: {'free_subscriber_count': 0, 'premium_subscriber_count': 0} for capper_id in capper_ids}
+    rows = Subscription.objects.active().filter(issuer__in=capper_ids).values('issuer').annotate(
+        free=Count('id', filter=Q(type=Subscription.FREE)),
+        premium=Count('id', filter=Q(type=Subscription.PREMIUM)),
+    )
+    for row in rows:
+        counts[row['issuer']] = {'free_subscriber_count': row['free'], 'premium_subscriber_count': row['premium']}
+    for capper_id, defaults in counts.items():
+        CapperStats.objects.update_or_create(capper_id=capper_id, defaults=defaults)
+
+
+def rebuild_capper_stats(capper_ids=None):
+    """
+    Recompute every stat for `capper_ids`, or for every capper with a slip
+    when omitted. Used for backfills and to correct drift; request paths
+    never call it.
+    """
+    if capper_ids is None:
+        capper_ids = PlaySlip.objects.values_list('issuer', flat=True).distinct()
+    capper_ids = list(capper_ids)
+    latest = PlaySlip.objects.filter(issuer__in=capper_ids).values('issuer').annotate(latest=Max('date_added'))
+    for row in latest:
+        CapperStats.objects.update_or_create(capper_id=row['issuer'], defaults={'last_slip_date': row['latest']})
+    refresh_play_stats(capper_ids)
+    refresh_subscriber_stats(capper_ids)
+    return len(capper_ids)
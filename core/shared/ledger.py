@@ -0,0 +1,186 @@
+import uuid
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import connection, transaction as db_transaction
+from core.exceptions import InsuficientFundError
+from core.models.ledger import LedgerEntry
+from core.models.user import Wallet
+
+
+def to_minor_units(amount):
+    """Convert a major-unit amount (e.g. naira) to integer minor units (kobo)."""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def to_major_units(amount):
+    return amount / 100
+
+
+def to_transaction_amount(amount):
+    """Round a minor-unit amount half up to the whole major units Transaction.amount records."""
+    return int((Decimal(amount) / 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+@db_transaction.atomic
+def post(legs, transaction=None, reference=''):
+    """
+    Post `legs`, a list of `(wallet, account, amount)` with amounts in
+    minor units, as one balanced posting.
+
+    Wallets are locked with SELECT ... FOR UPDATE in id order, so
+    concurrent postings touching the same wallets serialize instead of
+    losing updates or deadlocking. A leg that would take a wallet account
+    below zero aborts the whole posting with InsuficientFundError.
+    Returns the updated wallets by id.
+    """
+    if sum(amount for _, _, amount in legs) != 0:
+        raise ValueError('Ledger postings must balance')
+
+    wallet_ids = {getattr(wallet, 'id', wallet) for wallet, _, _ in legs if wallet is not None}
+    wallets = {
+        wallet.id: wallet
+        for wallet in Wallet.objects.select_for_update().filter(id__in=wallet_ids).order_by('id')
+    }
+
+    posting = uuid.uuid4()
+    entries = []
+    for wallet, account, amount in legs:
+        balance_after = None
+        if wallet is not None:
+            wallet = wallets[getattr(wallet, 'id', wallet)]
+            field = LedgerEntry.WALLET_ACCOUNTS[account]
+            balance_after = getattr(wallet, field) + amount
+            if balance_after < 0:
+                raise InsuficientFundError(detail="You don't have sufficient fund for this transaction")
+            setattr(wallet, field, balance_after)
+        entries.append(LedgerEntry(
+            posting=posting,
+            wallet=wallet,
+            account=account,
+            amount=amount,
+            balance_after=balance_after,
+            transaction=transaction,
+            reference=reference,
+        ))
+
+    for wallet in wallets.values():
+        wallet.save(update_fields=['balance', 'withheld'])
+    LedgerEntry.objects.bulk_create(entries)
+    return wallets
+
+
+def deposit(wallet, amount, **kwargs):
+    return post([
+        (None, LedgerEntry.EXTERNAL, -amount),
+        (wallet, LedgerEntry.BALANCE, amount),
+    ], **kwargs)
+
+
+def withdraw(wallet, amount, **kwargs):
+    return post([
+        (wallet, LedgerEntry.BALANCE, -amount),
+        (None, LedgerEntry.EXTERNAL, amount),
+    ], **kwargs)
+
+
+def hold_stake(wallet, amount, **kwargs):
+    """Move a backer's stake from balance to withheld until the wager is matched."""
+    return post([
+        (wallet, LedgerEntry.BALANCE, -amount),
+        (wallet, LedgerEntry.WITHHELD, amount),
+    ], **kwargs)
+
+
+def match_stakes(backer_wallet, layer_wallet, amount, **kwargs):
+    """Move both stakes of a matched wager into escrow."""
+    return post([
+        (backer_wallet, LedgerEntry.WITHHELD, -amount),
+        (layer_wallet, LedgerEntry.BALANCE, -amount),
+        (None, LedgerEntry.ESCROW, 2 * amount),
+    ], **kwargs)
+
+
+def pay_subscription(subscriber_wallet, tipster_wallet, amount, fee, **kwargs):
+    return post([
+        (subscriber_wallet, LedgerEntry.BALANCE, -amount),
+        (tipster_wallet, LedgerEntry.BALANCE, amount - fee),
+        (None, LedgerEntry.FEES, fee),
+    ], **kwargs)
+
+
+def fill_orders(taker_wallet, maker_fills, **kwargs):
+    """
+    Move the matched parts of an incoming order and the opposing orders it
+    filled, `[(maker_wallet, amount), ...]`, from withheld into escrow.
+    """
+    total = sum(amount for _, amount in maker_fills)
+    return post([
+        (taker_wallet, LedgerEntry.WITHHELD, -total),
+        *[(maker_wallet, LedgerEntry.WITHHELD, -amount) for maker_wallet, amount in maker_fills],
+        (None, LedgerEntry.ESCROW, 2 * total),
+    ], **kwargs)
+
+
+@db_transaction.atomic
+def post_bulk(wallet_legs, system_legs, reference=''):
+    """
+    Post one balanced posting across many wallets with set-based SQL, for
+    batch jobs such as settlement. `wallet_legs` maps `(wallet_id, account)`
+    and `system_legs` maps `account` to an amount in minor units.
+
+    Wallets are locked in id order like `post`, then updated with a single
+    UPDATE ... FROM unnest(...). Returns the number of wallets touched.
+    """
+    wallet_legs = {key: amount for key, amount in wallet_legs.items() if amount}
+    system_legs = {account: amount for account, amount in system_legs.items() if amount}
+    if sum(wallet_legs.values()) + sum(system_legs.values()) != 0:
+        raise ValueError('Ledger postings must balance')
+    if not wallet_legs and not system_legs:
+        return 0
+
+    deltas = {}
+    for (wallet_id, account), amount in wallet_legs.items():
+        delta = deltas.setdefault(wallet_id, {'balance': 0, 'withheld': 0})
+        delta[LedgerEntry.WALLET_ACCOUNTS[account]] += amount
+    wallet_ids = sorted(deltas)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT id FROM core_wallet WHERE id = ANY(%s) ORDER BY id FOR UPDATE",
+            [wallet_ids],
+        )
+        cursor.execute(
+            """
+            UPDATE core_wallet AS wallet
+            SET balance = wallet.balance + delta.balance, withheld = wallet.withheld + delta.withheld
+            FROM unnest(%s::bigint[], %s::bigint[], %s::bigint[]) AS delta(id, balance, withheld)
+            WHERE wallet.id = delta.id
+            RETURNING wallet.id, wallet.balance, wallet.withheld
+            """,
+            [
+                wallet_ids,
+                [deltas[wallet_id]['balance'] for wallet_id in wallet_ids],
+                [deltas[wallet_id]['withheld'] for wallet_id in wallet_ids],
+            ],
+        )
+        updated = {wallet_id: {'balance': balance, 'withheld': withheld} for wallet_id, balance, withheld in cursor.fetchall()}
+
+    if any(value < 0 for figures in updated.values() for value in figures.values()):
+        raise InsuficientFundError(detail="You don't have sufficient fund for this transaction")
+
+    posting = uuid.uuid4()
+    entries = [
+        LedgerEntry(
+            posting=posting,
+            wallet_id=wallet_id,
+            account=account,
+            amount=amount,
+            balance_after=updated[wallet_id][LedgerEntry.WALLET_ACCOUNTS[account]],
+            reference=reference,
+        )
+        for (wallet_id, account), amount in wallet_legs.items()
+    ] + [
+        LedgerEntry(posting=posting, account=account, amount=amount, reference=reference)
+        for account, amount in system_legs.items()
+    ]
+    LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+    return len(updated)
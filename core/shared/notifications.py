@@ -0,0 +1,257 @@
+import json
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from core.models.notification import NotificationJob, NotificationTarget
+from core.models.subscription import Subscription
+from core.models.user import UserAccount
+from core.shared import realtime
+from core.shared.http import ProviderClient
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_slip(slip):
+    """Queue the fan-out of a new slip; delivery happens in the notification worker."""
+    return NotificationJob.objects.create(slip=slip)
+
+
+def get_recipients(slip):
+    """
+    Subscriber ids to notify about `slip`, in id order: premium slips go to
+    premium subscribers and free slips to free subscribers, as in the feed.
+    """
+    return Subscription.objects.active().filter(
+        issuer=slip.issuer_id,
+        type=Subscription.PREMIUM if slip.is_premium else Subscription.FREE,
+    ).order_by('subscriber').values_list('subscriber', flat=True).distinct()
+
+
+def build_message(slip):
+    issuer = slip.issuer.display_name or slip.issuer.user.username
+    kind = 'premium slip' if slip.is_premium else 'slip'
+    return {
+        'subject': f'New {kind} from {issuer}',
+        'body': f'{issuer} just posted a new {kind}: {slip.title}',
+        'slip': slip.id,
+    }
+
+
+class RateLimiter:
+    """
+    Allow `rate` messages per second on a channel across every worker,
+    counted in one-second windows in the shared cache.
+    """
+
+    def __init__(self, name, rate):
+        self.name = name
+        self.rate = rate
+
+    def acquire(self, count):
+        while True:
+            now = time.time()
+            key = f'notification-rate:{self.name}:{int(now)}'
+            cache.add(key, 0, timeout=2)
+            used = cache.incr(key, count)
+            if used <= self.rate or used == count:
+                return
+            time.sleep(int(now) + 1 - now)
+
+
+class Channel:
+    """
+    A way of reaching subscribers. Subclasses look up addresses for a batch
+    of user accounts and send one message to a batch of addresses; sends are
+    split into batches of at most `batch_size` and paced by `rate` per second.
+    """
+    def __init__(self, name, rate=10, batch_size=100, **options):
+        self.name = name
+        self.batch_size = min(batch_size, rate)
+        self.limiter = RateLimiter(name, rate)
+        self.options = options
+
+    def get_addresses(self, useraccount_ids):
+        return list(
+            NotificationTarget.objects.filter(useraccount__in=useraccount_ids, channel=self.name)
+            .values_list('address', flat=True)
+        )
+
+    def send(self, addresses, message):
+        raise NotImplementedError
+
+    def deliver(self, useraccount_ids, message):
+        addresses = self.get_addresses(useraccount_ids)
+        for start in range(0, len(addresses), self.batch_size):
+            batch = addresses[start:start + self.batch_size]
+            self.limiter.acquire(len(batch))
+            self.send(batch, message)
+        return len(addresses)
+
+
+class EmailChannel(Channel):
+    def get_addresses(self, useraccount_ids):
+        return list(
+            UserAccount.objects.filter(id__in=useraccount_ids, user__is_active=True)
+            .exclude(user__email='').values_list('user__email', flat=True)
+        )
+
+    def send(self, addresses, message):
+        with get_connection() as connection:
+            connection.send_messages([
+                EmailMessage(message['subject'], message['body'], to=[address]) for address in addresses
+            ])
+
+
+class WhatsAppChannel(Channel):
+    def __init__(self, name, **options):
+        super().__init__(name, **options)
+        self.client = ProviderClient(
+            'whatsapp',
+            f'https://graph.facebook.com/{settings.WHATSAPP_API_VERSION}/',
+            headers={'Authorization': f'Bearer {settings.WHATSAPP_ACCESS_TOKEN}'},
+        )
+
+    def send(self, addresses, message):
+        for address in addresses:
+            self.client.post(f'{settings.WHATSAPP_PHONE_NUMBER_ID}/messages', json={
+                'messaging_product': 'whatsapp',
+                'to': address,
+                'type': 'text',
+                'text': {'body': message['body']},
+            })
+
+
+class TelegramChannel(Channel):
+    def __init__(self, name, **options):
+        super().__init__(name, **options)
+        self.client = ProviderClient('telegram', f'https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/')
+
+    def send(self, addresses, message):
+        for address in addresses:
+            self.client.post('sendMessage', json={'chat_id': address, 'text': message['body']})
+
+
+class WebPushChannel(Channel):
+    def send(self, addresses, message):
+        from pywebpush import webpush, WebPushException
+
+        for address in addresses:
+            try:
+                webpush(
+                    subscription_info=json.loads(address),
+                    data=json.dumps(message),
+                    vapid_private_key=settings.WEBPUSH_VAPID_PRIVATE_KEY,
+                    vapid_claims={'sub': settings.WEBPUSH_VAPID_SUBJECT},
+                )
+            except WebPushException as error:
+                if error.response is not None and error.response.status_code in (404, 410):
+                    NotificationTarget.objects.filter(channel=self.name, address=address).delete()
+                else:
+                    raise
+
+
+class WebSocketChannel(Channel):
+    """Pushes the slip to subscribers' open sockets; users without one simply miss it."""
+
+    def get_addresses(self, useraccount_ids):
+        return list(useraccount_ids)
+
+    def send(self, addresses, message):
+        realtime.publish([realtime.user_group(address) for address in addresses], 'slip.created', message)
+
+
+class LocalChannel(Channel):
+    """Keeps deliveries in `outbox` instead of sending them, for tests and local development."""
+    outbox = []
+
+    def get_addresses(self, useraccount_ids):
+        return [f'useraccount:{useraccount_id}' for useraccount_id in useraccount_ids]
+
+    def send(self, addresses, message):
+        self.outbox.extend((self.name, address, message) for address in addresses)
+
+
+def get_channels():
+    return [
+        import_string(config['BACKEND'])(
+            name,
+            **{key.lower(): value for key, value in config.items() if key != 'BACKEND'},
+        )
+        for name, config in settings.NOTIFICATION_CHANNELS.items()
+    ]
+
+
+def run_pending(batch_size=500, channels=None):
+    """
+    Deliver the next batch of recipients of the oldest unfinished job that
+    no other worker holds, and return how many subscribers it covered, 0
+    when there is no work.
+
+    The job is leased in a short transaction and the batch is sent outside
+    it, so no row lock is held across network calls and rate-limit waits.
+    Each channel moves its own cursor only when its send succeeds: a failing
+    channel is retried from the same recipients after a backoff while the
+    others carry on, and its batch is skipped after NOTIFICATION_MAX_ATTEMPTS
+    failures. A worker that dies mid-batch leaves the lease to expire and
+    the batch is sent again.
+    """
+    channels = get_channels() if channels is None else channels
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            NotificationJob.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(Q(leased_until__isnull=True) | Q(leased_until__lte=now), finished_time__isnull=True)
+            .select_related('slip__issuer__user')
+            .order_by('id')
+            .first()
+        )
+        if job is None:
+            return 0
+        lease = now + timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS)
+        NotificationJob.objects.filter(id=job.id).update(leased_until=lease)
+
+    cursors = {channel.name: job.channel_cursors.get(channel.name, job.cursor) for channel in channels}
+    failures = {name: count for name, count in job.channel_failures.items() if name in cursors}
+    recipients = list(get_recipients(job.slip).filter(subscriber__gt=min(cursors.values(), default=job.cursor))[:batch_size])
+    retry_time = None
+    if recipients:
+        message = build_message(job.slip)
+        for channel in channels:
+            pending = [recipient for recipient in recipients if recipient > cursors[channel.name]]
+            if not pending:
+                continue
+            try:
+                channel.deliver(pending, message)
+            except Exception as error:
+                job.last_error = f'{channel.name}: {error!r}'
+                failures[channel.name] = failures.get(channel.name, 0) + 1
+                if failures[channel.name] < settings.NOTIFICATION_MAX_ATTEMPTS:
+                    logger.exception('Notification channel %s failed for slip %s, retrying', channel.name, job.slip_id)
+                    retry_time = timezone.now() + timedelta(seconds=2 ** failures[channel.name])
+                    continue
+                logger.exception(
+                    'Notification channel %s failed for slip %s, skipping %d recipient(s)',
+                    channel.name, job.slip_id, len(pending),
+                )
+            failures.pop(channel.name, None)
+            cursors[channel.name] = pending[-1]
+        job.recipient_count += len([recipient for recipient in recipients if recipient > job.cursor])
+        job.cursor = max(job.cursor, recipients[-1])
+    finished = len(recipients) < batch_size and retry_time is None
+    NotificationJob.objects.filter(id=job.id, leased_until=lease).update(
+        cursor=job.cursor,
+        channel_cursors=cursors,
+        channel_failures=failures,
+        last_error=job.last_error,
+        recipient_count=job.recipient_count,
+        finished_time=timezone.now() if finished else None,
+        leased_until=retry_time,
+    )
+    return max(len(recipients), 1)
@@ -0,0 +1,195 @@
+import heapq
+import itertools
+import logging
+import pytz
+from datetime import datetime
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from core.models.games import SportsGame
+from core.models.wager import SportsWager, WagerFill
+from core.shared import ledger, realtime
+
+logger = logging.getLogger(__name__)
+
+# Key for the Postgres advisory lock that keeps a single engine running.
+ENGINE_LOCK_ID = 0x6f72646572
+
+
+class OrderBook:
+    """
+    Resting orders for one (game, market). An incoming order is matched
+    against the opposite option oldest first, partially filling the last
+    order it touches, and any remainder rests on its own side.
+
+    Each side is a heap of `(priority, sequence, order_id)`, so adding or
+    removing an order costs O(log n). Cancelled orders are dropped lazily
+    when they reach the top of the heap. Orders of the same owner never
+    fill each other; they are stepped over and stay in the book.
+    """
+
+    def __init__(self):
+        self.sides = {True: [], False: []}
+        self.remaining = {}
+        self.owners = {}
+        self.sequence = itertools.count()
+
+    def __len__(self):
+        return len(self.remaining)
+
+    def add(self, order_id, option, amount, priority, owner=None):
+        heapq.heappush(self.sides[option], (priority, next(self.sequence), order_id))
+        self.remaining[order_id] = amount
+        self.owners[order_id] = owner
+
+    def cancel(self, order_id):
+        self.remaining.pop(order_id, None)
+        self.owners.pop(order_id, None)
+
+    def match(self, order_id, option, amount, priority, owner=None):
+        """Return `[(maker_id, amount), ...]` filled for the incoming order."""
+        fills = []
+        own_orders = []
+        opposite = self.sides[not option]
+        while amount and opposite:
+            maker_id = opposite[0][2]
+            available = self.remaining.get(maker_id)
+            if not available:
+                heapq.heappop(opposite)
+                self.owners.pop(maker_id, None)
+                continue
+            if owner is not None and self.owners.get(maker_id) == owner:
+                own_orders.append(heapq.heappop(opposite))
+                continue
+            size = min(available, amount)
+            fills.append((maker_id, size))
+            amount -= size
+            if size == available:
+                heapq.heappop(opposite)
+                del self.remaining[maker_id]
+                del self.owners[maker_id]
+            else:
+                self.remaining[maker_id] = available - size
+        for entry in own_orders:
+            heapq.heappush(opposite, entry)
+        if amount:
+            self.add(order_id, option, amount, priority, owner)
+        return fills
+
+
+class FillConflict(Exception):
+    """A resting order changed outside the engine; its book must be reloaded."""
+
+
+class MatchingEngine:
+    """
+    Keeps an OrderBook per (game, market) in memory and feeds it the
+    order-book wagers that have not been booked yet. The database stays
+    the source of truth: books are loaded from resting orders on first use
+    and fills are persisted with conditional UPDATEs, so a book that went
+    stale is detected, dropped and rebuilt.
+
+    Only one engine may run at a time; see `acquire_lock`.
+    """
+
+    def __init__(self):
+        self.books = {}
+
+    @staticmethod
+    def acquire_lock():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [ENGINE_LOCK_ID])
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def pending_orders():
+        return SportsWager.objects.filter(
+            booked=False, unmatched_amount__isnull=False,
+        ).select_related('game', 'backer').order_by('placed_time', 'id')
+
+    def get_book(self, game_id, market):
+        key = (game_id, market)
+        if key not in self.books:
+            book = self.books[key] = OrderBook()
+            resting = SportsWager.objects.filter(
+                game_id=game_id, market=market, booked=True, unmatched_amount__gt=0,
+            ).order_by('placed_time').values_list('id', 'backer_option', 'unmatched_amount', 'placed_time', 'backer')
+            for order_id, option, amount, placed_time, backer_id in resting.iterator():
+                book.add(order_id, option, amount, placed_time.timestamp(), backer_id)
+        return self.books[key]
+
+    def run_pending(self, batch_size=500):
+        """Match up to `batch_size` new orders; returns the number of fills."""
+        fills = 0
+        for order in self.pending_orders()[:batch_size]:
+            fills += self.submit(order)
+        return fills
+
+    def submit(self, order):
+        if order.game.result or order.game.match_day <= timezone.now():
+            # Nothing is matched once a game has kicked off; the order is
+            # booked as it is and settlement releases its stake.
+            self.book_unmatched(order)
+            return 0
+        book = self.get_book(order.game_id, order.market)
+        fills = book.match(
+            order.id, order.backer_option, order.unmatched_amount, order.placed_time.timestamp(), order.backer_id,
+        )
+        try:
+            persist_fills(order, fills)
+        except FillConflict:
+            # The order stays unbooked and is retried against a fresh book.
+            logger.warning('Order book %s/%s went stale, reloading', order.game_id, order.market)
+            del self.books[(order.game_id, order.market)]
+            return 0
+        except Exception:
+            # Any other failure would repeat on every pass and hold up the
+            # orders queued behind this one, so it rests without fills. The
+            # book was already changed by `match` and is rebuilt.
+            logger.exception('Order %s could not be matched, booking it unmatched', order.id)
+            self.book_unmatched(order)
+            return 0
+        return len(fills)
+
+    def book_unmatched(self, order):
+        SportsWager.objects.filter(id=order.id).update(booked=True)
+        self.books.pop((order.game_id, order.market), None)
+
+
+def take(wager_id, amount, **updates):
+    """Conditionally reduce a wager's unmatched amount; False if it no longer covers `amount`."""
+    return SportsWager.objects.filter(id=wager_id, unmatched_amount__gte=amount).update(
+        unmatched_amount=F('unmatched_amount') - amount, **updates,
+    ) == 1
+
+
+@transaction.atomic
+def persist_fills(taker, fills):
+    """Record the fills of `taker` and move the matched stakes into escrow, all or nothing."""
+    if not take(taker.id, sum(amount for _, amount in fills), booked=True):
+        raise FillConflict()
+    if not fills:
+        return
+    maker_rows = list(
+        SportsWager.objects.filter(id__in=[maker_id for maker_id, _ in fills]).values_list('id', 'backer__wallet', 'backer')
+    )
+    makers = {maker_id: wallet_id for maker_id, wallet_id, _ in maker_rows}
+    for maker_id, amount in fills:
+        if not take(maker_id, amount):
+            raise FillConflict()
+    ledger.fill_orders(
+        taker.backer.wallet_id,
+        [(makers[maker_id], amount) for maker_id, amount in fills],
+        reference=taker.id,
+    )
+    WagerFill.objects.bulk_create([
+        WagerFill(maker_id=maker_id, taker_id=taker.id, amount=amount) for maker_id, amount in fills
+    ])
+    matched = SportsWager.objects.filter(
+        id__in=[taker.id, *makers], unmatched_amount=0, matched=False,
+    ).update(matched=True, matched_time=datetime.utcnow().replace(tzinfo=pytz.UTC))
+    if matched:
+        SportsGame.objects.filter(id=taker.game_id).update(matched_count=F('matched_count') + matched)
+    realtime.wager_matched(
+        [taker.id, *makers], taker.game_id, [taker.backer_id, *[backer_id for _, _, backer_id in maker_rows]],
+    )
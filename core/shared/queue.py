@@ -0,0 +1,38 @@
+import logging
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def process_batch(queryset, handle, done_field, max_attempts, batch_size=100):
+    """
+    Run `handle(item)` on up to `batch_size` pending rows of a job table,
+    oldest first, and return how many were taken. A row is pending while
+    `done_field` is empty and it has been tried fewer than `max_attempts`
+    times; it needs `attempts` and `last_error` columns.
+
+    Rows are locked with SKIP LOCKED, so any number of workers can run side
+    by side, and each handler's writes commit in the same transaction that
+    stamps `done_field`: an item is handled exactly once. A failing handler
+    is rolled back on its own and retried on a later pass.
+    """
+    with transaction.atomic():
+        items = list(
+            queryset.select_for_update(skip_locked=True)
+            .filter(**{f'{done_field}__isnull': True}, attempts__lt=max_attempts)
+            .order_by('id')[:batch_size]
+        )
+        for item in items:
+            item.attempts += 1
+            try:
+                with transaction.atomic():
+                    handle(item)
+            except Exception as error:
+                logger.exception('%s %s failed', item._meta.verbose_name.capitalize(), item)
+                item.last_error = repr(error)
+            else:
+                setattr(item, done_field, timezone.now())
+                item.last_error = ''
+        queryset.model.objects.bulk_update(items, ['attempts', done_field, 'last_error'])
+    return len(items)
@@ -0,0 +1,62 @@
+import json
+import logging
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def user_group(useraccount_id):
+    return f'user.{useraccount_id}'
+
+
+def game_group(game_id):
+    return f'game.{game_id}'
+
+
+def publish(groups, event, data):
+    """
+    Push `event` to every socket in `groups`. Sockets are a convenience on
+    top of the REST API, so a channel layer outage is logged and never
+    fails the caller.
+    """
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    message = {
+        'type': 'event.push',
+        'event': event,
+        'data': json.loads(json.dumps(data, cls=DjangoJSONEncoder)),
+    }
+    async def send():
+        for group in groups:
+            await layer.group_send(group, message)
+
+    try:
+        # One event loop, and so one Redis connection, for all the groups.
+        async_to_sync(send)()
+    except Exception:
+        logger.exception('Could not publish %s to %s', event, groups)
+
+
+def publish_on_commit(groups, event, data):
+    """Publish once the current transaction commits, so clients never see an event that was rolled back."""
+    transaction.on_commit(lambda: publish(groups, event, data))
+
+
+def wager_matched(wager_ids, game_id, useraccount_ids):
+    publish_on_commit(
+        [game_group(game_id), *[user_group(useraccount_id) for useraccount_id in set(useraccount_ids)]],
+        'wager.matched',
+        {'wagers': list(wager_ids), 'game': game_id},
+    )
+
+
+def challenge_received(challenge):
+    publish_on_commit([user_group(challenge.requestee_id)], 'challenge.received', {
+        'challenge': challenge.id,
+        'wager': challenge.wager_id,
+        'requestor': challenge.requestor.user.username,
+    })
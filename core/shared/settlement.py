@@ -0,0 +1,236 @@
+import logging
+from collections import defaultdict
+from django.db import connection, transaction
+from django.utils import timezone
+from core.models.games import SportsGame
+from core.models.ledger import LedgerEntry
+from core.models.play import Play
+from core.models.transaction import Transaction
+from core.models.wager import SportsWager
+from core.shared import ledger, leaderboard
+
+logger = logging.getLogger(__name__)
+
+SETTLEMENT_REFERENCE = 'settlement'
+
+# Matched direct wagers: the side whose option agrees with the outcome of the
+# market takes both stakes.
+SETTLE_MATCHED_WAGERS = """
+    WITH settled AS (
+        UPDATE core_sportswager AS wager
+        SET status = %(settled)s,
+            winner_id = CASE WHEN (wager.market = ANY(game.winning_markets)) = wager.backer_option
+                             THEN wager.backer_id ELSE wager.layer_id END
+        FROM core_sportsgame AS game
+        WHERE wager.game_id = game.id AND game.id = ANY(%(games)s)
+          AND wager.status = %(pending)s AND wager.matched AND wager.unmatched_amount IS NULL
+        RETURNING wager.winner_id, wager.stake
+    )
+    SELECT settled.winner_id, account.wallet_id, wallet.currency_id, settled.stake
+    FROM settled
+    JOIN core_useraccount AS account ON account.id = settled.winner_id
+    JOIN core_wallet AS wallet ON wallet.id = account.wallet_id
+"""
+
+# Direct wagers nobody took are void; the backer's stake is still withheld.
+VOID_UNMATCHED_WAGERS = """
+    WITH voided AS (
+        UPDATE core_sportswager AS wager
+        SET status = %(void)s
+        WHERE wager.game_id = ANY(%(games)s)
+          AND wager.status = %(pending)s AND NOT wager.matched AND wager.unmatched_amount IS NULL
+        RETURNING wager.backer_id, wager.stake, wager.transaction_id
+    ), failed AS (
+        UPDATE core_transaction SET status = %(failed)s, last_update = now()
+        WHERE id IN (SELECT transaction_id FROM voided)
+    )
+    SELECT account.wallet_id, voided.stake
+    FROM voided
+    JOIN core_useraccount AS account ON account.id = voided.backer_id
+"""
+
+# Fills pay both matched amounts to whichever order backed the outcome.
+# Read before the orders themselves are closed below.
+SETTLE_FILLS = """
+    SELECT winner.backer_id, account.wallet_id, wallet.currency_id, fill.amount
+    FROM core_wagerfill AS fill
+    JOIN core_sportswager AS taker ON taker.id = fill.taker_id
+    JOIN core_sportswager AS maker ON maker.id = fill.maker_id
+    JOIN core_sportsgame AS game ON game.id = taker.game_id
+    JOIN core_sportswager AS winner ON winner.id = CASE
+        WHEN (taker.market = ANY(game.winning_markets)) = taker.backer_option THEN taker.id ELSE maker.id END
+    JOIN core_useraccount AS account ON account.id = winner.backer_id
+    JOIN core_wallet AS wallet ON wallet.id = account.wallet_id
+    WHERE taker.game_id = ANY(%(games)s) AND taker.status = %(pending)s
+"""
+
+# Order-book wagers: whatever never found an opposing order is released, and
+# an order without any fill is void.
+CLOSE_ORDERS = """
+    WITH orders AS (
+        SELECT wager.id, wager.unmatched_amount,
+               EXISTS (SELECT 1 FROM core_wagerfill AS fill
+                       WHERE fill.maker_id = wager.id OR fill.taker_id = wager.id) AS filled
+        FROM core_sportswager AS wager
+        WHERE wager.game_id = ANY(%(games)s)
+          AND wager.status = %(pending)s AND wager.unmatched_amount IS NOT NULL
+        FOR UPDATE
+    ), closed AS (
+        UPDATE core_sportswager AS wager
+        SET unmatched_amount = 0,
+            status = CASE WHEN orders.filled THEN %(settled)s ELSE %(void)s END,
+            winner_id = CASE WHEN orders.filled AND (wager.market = ANY(game.winning_markets)) = wager.backer_option
+                             THEN wager.backer_id END
+        FROM orders, core_sportsgame AS game
+        WHERE wager.id = orders.id AND game.id = wager.game_id
+        RETURNING wager.backer_id, orders.unmatched_amount
+    )
+    SELECT account.wallet_id, closed.unmatched_amount
+    FROM closed
+    JOIN core_useraccount AS account ON account.id = closed.backer_id
+    WHERE closed.unmatched_amount > 0
+"""
+
+# Plays on the same games are won or lost against the same winning markets.
+SETTLE_PLAYS = """
+    WITH settled AS (
+        UPDATE core_play AS play
+        SET status = CASE WHEN play.prediction = ANY(game.winning_markets) THEN %(win)s ELSE %(loss)s END
+        FROM core_sportsgame AS game
+        WHERE play.game_id = game.id AND game.id = ANY(%(games)s)
+          AND play.status = %(play_pending)s
+        RETURNING play.slip_id
+    )
+    SELECT DISTINCT slip.issuer_id
+    FROM settled
+    JOIN core_playslip AS slip ON slip.id = settled.slip_id
+"""
+
+
+def markets_from_score(result):
+    """
+    Full-time markets that came true for a `"home-away"` score such as
+    `"2-1"`. Returns an empty list when the result is not a score.
+    """
+    try:
+        home, away = (int(goals) for goals in result.replace(':', '-').split('-'))
+    except (AttributeError, ValueError):
+        return []
+    if home > away:
+        return ['Home win']
+    if home < away:
+        return ['Away win']
+    return ['Draw']
+
+
+def resolve_winning_markets(objects):
+    """Fill in `winning_markets` from the score where it was left empty, and return the objects that have some."""
+    missing = [obj for obj in objects if not obj.winning_markets]
+    for obj in missing:
+        obj.winning_markets = markets_from_score(obj.result)
+    changed = [obj for obj in missing if obj.winning_markets]
+    if changed:
+        type(changed[0]).objects.bulk_update(changed, ['winning_markets'])
+    for obj in missing:
+        if not obj.winning_markets:
+            logger.warning('Cannot settle %s %s: no winning markets for result %r', type(obj).__name__, obj.pk, obj.result)
+    return [obj for obj in objects if obj.winning_markets]
+
+
+def settle_games(game_ids):
+    """
+    Settle every wager and play on the finished games among `game_ids` in
+    one transaction and return the number of games settled.
+
+    Wagers are resolved with a handful of set-based UPDATEs, so the cost per
+    game does not grow with round trips per wager. Escrowed stakes are paid
+    to winners and unmatched stakes released in a single ledger posting, and
+    a payout transaction is written per winning wager or order. A game is
+    settled once: it is locked and skipped if `settled_time` is already set,
+    so re-running over the same ids is a no-op. Plays are marked won or
+    lost and their cappers' stats refreshed in the same pass.
+    """
+    with transaction.atomic():
+        games = list(
+            SportsGame.objects.select_for_update(skip_locked=True)
+            .filter(id__in=game_ids, settled_time__isnull=True)
+            .exclude(result='')
+        )
+        games = resolve_winning_markets(games)
+        if not games:
+            return 0
+        params = {
+            'games': [game.id for game in games],
+            'settled': SportsWager.SETTLED,
+            'void': SportsWager.VOID,
+            'pending': SportsWager.PENDING,
+            'failed': Transaction.FAILED,
+            'win': Play.WIN,
+            'loss': Play.LOSS,
+            'play_pending': Play.PENDING,
+        }
+
+        # (user, wallet, currency) -> amount won in minor units
+        payouts = defaultdict(int)
+        # wallet -> stake released from withheld, in minor units
+        releases = defaultdict(int)
+        with connection.cursor() as cursor:
+            cursor.execute(SETTLE_MATCHED_WAGERS, params)
+            for user_id, wallet_id, currency_id, stake in cursor.fetchall():
+                payouts[(user_id, wallet_id, currency_id)] += 2 * ledger.to_minor_units(stake)
+            cursor.execute(SETTLE_FILLS, params)
+            for user_id, wallet_id, currency_id, amount in cursor.fetchall():
+                payouts[(user_id, wallet_id, currency_id)] += 2 * amount
+            cursor.execute(VOID_UNMATCHED_WAGERS, params)
+            for wallet_id, stake in cursor.fetchall():
+                releases[wallet_id] += ledger.to_minor_units(stake)
+            cursor.execute(CLOSE_ORDERS, params)
+            for wallet_id, amount in cursor.fetchall():
+                releases[wallet_id] += amount
+            cursor.execute(SETTLE_PLAYS, params)
+            cappers = [capper_id for capper_id, in cursor.fetchall()]
+
+        wallet_legs = defaultdict(int)
+        for (_, wallet_id, _), amount in payouts.items():
+            wallet_legs[(wallet_id, LedgerEntry.BALANCE)] += amount
+        for wallet_id, amount in releases.items():
+            wallet_legs[(wallet_id, LedgerEntry.WITHHELD)] -= amount
+            wallet_legs[(wallet_id, LedgerEntry.BALANCE)] += amount
+        ledger.post_bulk(
+            wallet_legs,
+            {LedgerEntry.ESCROW: -sum(payouts.values())},
+            reference=SETTLEMENT_REFERENCE,
+        )
+        Transaction.objects.bulk_create([
+            Transaction(
+                type=Transaction.WAGER,
+                status=Transaction.SUCCEED,
+                amount=ledger.to_transaction_amount(amount),
+                user_id=user_id,
+                currency_id=currency_id,
+            )
+            for (user_id, _, currency_id), amount in payouts.items()
+        ], batch_size=1000)
+        SportsGame.objects.filter(id__in=params['games']).update(settled_time=timezone.now())
+        if cappers:
+            leaderboard.refresh_play_stats(cappers)
+    return len(games)
+
+
+def settle_pending(batch_size=500):
+    """
+    Sweep every finished game that is not settled yet, `batch_size` at a
+    time, and return the number of games settled.
+    """
+    games = 0
+    last_id = 0
+    while True:
+        ids = list(
+            SportsGame.objects.filter(settled_time__isnull=True, id__gt=last_id)
+            .exclude(result='').order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        games += settle_games(ids)
+        last_id = ids[-1]
+    return games
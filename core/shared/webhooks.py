@@ -0,0 +1,128 @@
+import hashlib
+import json
+from django.conf import settings
+from core.models.user import UserAccount, Wallet
+from core.models.transaction import Transaction
+from core.models.webhook import WebhookEvent
+from core.shared import ledger, queue
+
+# (provider, event) -> handler called with the event's payload
+HANDLERS = {}
+
+
+def handler(provider, event):
+    def register(func):
+        HANDLERS[(provider, event)] = func
+        return func
+    return register
+
+
+def get_event_name(provider, payload):
+    if provider == WebhookEvent.WHATSAPP:
+        return payload.get('object', '')
+    return payload.get('event', '')
+
+
+def get_reference(provider, payload):
+    """
+    Key a delivery by what the provider sends again when it retries: the
+    event name with the transaction reference or id when there is one,
+    otherwise a digest of the whole body.
+    """
+    data = payload.get('data')
+    if provider != WebhookEvent.WHATSAPP and isinstance(data, dict):
+        reference = data.get('reference') or data.get('tx_ref') or data.get('id')
+        if reference:
+            return f'{get_event_name(provider, payload)}:{reference}'
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def receive(provider, payload):
+    """
+    Store a delivery in the inbox without handling it. Returns False for a
+    redelivery of an event that is already stored.
+    """
+    _, created = WebhookEvent.objects.get_or_create(
+        provider=provider,
+        reference=get_reference(provider, payload),
+        defaults={'event': get_event_name(provider, payload), 'payload': payload},
+    )
+    return created
+
+
+def process_pending(batch_size=100):
+    """
+    Handle up to `batch_size` unprocessed events, oldest first, and return
+    how many were taken. Each handler's writes commit with the stamp on its
+    event, so an event's effects are applied exactly once; a failing event
+    is retried up to WEBHOOK_MAX_ATTEMPTS times (see queue.process_batch).
+    """
+    def handle(event):
+        handle_event = HANDLERS.get((event.provider, event.event))
+        if handle_event is not None:
+            handle_event(event.payload)
+
+    return queue.process_batch(
+        WebhookEvent.objects.all(), handle, 'processed_time', settings.WEBHOOK_MAX_ATTEMPTS, batch_size=batch_size,
+    )
+
+
+def replay(events):
+    """Queue `events` to be handled again. Handlers are idempotent, so replays never double-apply money movements."""
+    return events.update(processed_time=None, attempts=0, last_error='')
+
+
+@handler(WebhookEvent.PAYSTACK, 'charge.success')
+def record_successful_deposit(payload):
+    data = payload['data']
+    if Transaction.objects.filter(type=Transaction.DEPOSIT, reference=data['reference']).exists():
+        return
+    user = UserAccount.objects.select_related('wallet').get(user__email=data['customer']['email'])
+    wallet = Wallet.objects.select_for_update().get(id=user.wallet_id)
+    wallet.authorizations = [data.get('authorization')] + wallet.authorizations
+    wallet.save(update_fields=['authorizations'])
+    # Paystack reports amounts in the currency's minor unit.
+    amount = int(data['amount'])
+    deposit = Transaction.objects.create(
+        type=Transaction.DEPOSIT,
+        status=Transaction.SUCCEED,
+        amount=ledger.to_transaction_amount(amount),
+        currency_id=data.get('currency'),
+        reference=data['reference'],
+        user=user,
+    )
+    ledger.deposit(wallet.id, amount, transaction=deposit, reference=data['reference'])
+
+
+@handler(WebhookEvent.PAYSTACK, 'transfer.success')
+def record_successful_withdrawal(payload):
+    Transaction.objects.filter(
+        type=Transaction.WITHDRAWAL, reference=payload['data'].get('reference'), status=Transaction.PENDING,
+    ).update(status=Transaction.SUCCEED)
+
+
+@handler(WebhookEvent.PAYSTACK, 'transfer.failed')
+@handler(WebhookEvent.PAYSTACK, 'transfer.reversed')
+def refund_withdrawal(payload):
+    withdrawal = Transaction.objects.select_for_update(of=('self',)).filter(
+        type=Transaction.WITHDRAWAL, reference=payload['data'].get('reference'), status=Transaction.PENDING,
+    ).select_related('user').first()
+    if withdrawal is None:
+        return
+    ledger.deposit(
+        withdrawal.user.wallet_id,
+        ledger.to_minor_units(withdrawal.amount),
+        transaction=withdrawal,
+        reference=withdrawal.reference,
+    )
+    Transaction.objects.filter(id=withdrawal.id).update(status=Transaction.FAILED)
+
+
+@handler(WebhookEvent.FLUTTERWAVE, 'transfer.completed')
+def record_completed_payout(payload):
+    status = payload['data'].get('status')
+    if status == 'SUCCESSFUL':
+        record_successful_withdrawal(payload)
+    elif status == 'FAILED':
+        refund_withdrawal(payload)
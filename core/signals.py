@@ -0,0 +1,61 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import Signal, receiver
+from core.models.misc import TermsOfUse, PrivacyPolicy
+from core.models.games import Sport, Competition, Team, Market
+from core.models.play import Play, PlaySlip
+from core.models.subscription import Subscription
+from core.shared import leaderboard
+from core.shared.cache import bump_version
+
+# Sent by the expiry sweeper with the ids of the subscriptions it deactivated.
+subscriptions_expired = Signal()
+
+
+@receiver(post_save, sender=PlaySlip)
+def update_last_slip_date(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        leaderboard.record_slip(instance)
+
+
+@receiver(post_save, sender=Play)
+def update_play_stats(sender, instance, raw=False, **kwargs):
+    if not raw and instance.status != Play.PENDING:
+        issuer_id = PlaySlip.objects.filter(id=instance.slip_id).values_list('issuer', flat=True).first()
+        leaderboard.refresh_play_stats([issuer_id])
+
+
+@receiver(post_save, sender=Subscription)
+def update_subscriber_stats(sender, instance, raw=False, **kwargs):
+    if not raw:
+        leaderboard.refresh_subscriber_stats([instance.issuer_id])
+
+
+@receiver(subscriptions_expired)
+def update_expired_subscriber_stats(sender, ids, **kwargs):
+    issuer_ids = set(Subscription.objects.filter(id__in=ids).values_list('issuer', flat=True))
+    leaderboard.refresh_subscriber_stats(issuer_ids)
+
+
+# Cache namespaces (see CachedListMixin) whose payloads embed each model.
+REFERENCE_DATA_NAMESPACES = {
+    Sport: ('sport', 'competition', 'market'),
+    Competition: ('competition', 'team'),
+    Team: ('team',),
+    Market: ('market',),
+    TermsOfUse: ('terms_of_use',),
+    PrivacyPolicy: ('privacy_policy',),
+}
+
+
+def invalidate_reference_data(sender, **kwargs):
+    bump_version(*REFERENCE_DATA_NAMESPACES[sender])
+
+
+for model in REFERENCE_DATA_NAMESPACES:
+    post_save.connect(invalidate_reference_data, sender=model)
+    post_delete.connect(invalidate_reference_data, sender=model)
+
+
+@receiver(m2m_changed, sender=Team.competition.through)
+def invalidate_team_competitions(sender, **kwargs):
+    bump_version('team')
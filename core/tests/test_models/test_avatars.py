@@ -0,0 +1,120 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+from PIL import Image
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.tests.view_test_mixins import create_useraccount
+from core.models.avatar import AvatarJob
+from core.shared import avatars
+
+
+def upload(color, size=(900, 600), mode="RGB", format="PNG"):
+    output = BytesIO()
+    Image.new(mode, size, color).save(output, format=format)
+    return SimpleUploadedFile("avatar.png", output.getvalue(), content_type="image/png")
+
+
+@override_settings(AVATAR_SIZES=(512, 256, 64), AVATAR_DEFAULT_SIZE=256, AVATAR_MAX_ATTEMPTS=3)
+class AvatarPipelineTest(TestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        storage = override_settings(
+            DEFAULT_FILE_STORAGE="django.core.files.storage.FileSystemStorage", MEDIA_ROOT=media_root,
+        )
+        storage.enable()
+        self.addCleanup(storage.disable)
+        self.useraccount = create_useraccount("avatar_user")
+
+    def upload_avatar(self, image):
+        self.useraccount.image = image
+        self.useraccount.save()
+
+    def test_upload_is_rendered_in_the_background(self):
+        self.upload_avatar(upload("red", mode="RGBA"))
+        self.useraccount.refresh_from_db()
+        self.assertTrue(self.useraccount.image.name.startswith("https://gravatar.com/avatar/"))
+        job = AvatarJob.objects.get()
+
+        self.assertTrue(default_storage.exists(job.source.name))
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("process_avatars", stdout=out)
+        self.assertEqual(out.getvalue(), "Processed 1 avatar job(s)\n")
+        job.refresh_from_db()
+        self.useraccount.refresh_from_db()
+        self.assertIsNotNone(job.finished_time)
+        self.assertFalse(default_storage.exists(job.source.name))
+        self.assertEqual(self.useraccount.avatar_hash, job.content_hash)
+        self.assertEqual(self.useraccount.image.name, f"avatars/{job.content_hash}/256.jpg")
+        self.assertEqual(sorted(self.useraccount.avatar_variants), ["256", "512", "64"])
+        for size, formats in self.useraccount.avatar_variants.items():
+            for fmt, name in formats.items():
+                with default_storage.open(name) as variant:
+                    image = Image.open(variant)
+                    self.assertEqual((image.format.lower(), image.size), (fmt, (int(size), int(size))))
+
+        # Later saves keep the rendered avatar as it is.
+        self.useraccount.bio = "New bio"
+        self.useraccount.save()
+        self.useraccount.refresh_from_db()
+        self.assertEqual(self.useraccount.image.name, f"avatars/{job.content_hash}/256.jpg")
+        self.assertEqual(AvatarJob.objects.count(), 1)
+
+    def test_unchanged_uploads_are_skipped(self):
+        self.upload_avatar(upload("red"))
+        self.upload_avatar(upload("red"))
+        self.assertEqual(AvatarJob.objects.count(), 1)
+        avatars.process_pending()
+        self.useraccount.refresh_from_db()
+
+        self.upload_avatar(upload("red"))
+        self.assertEqual(AvatarJob.objects.count(), 1)
+
+        # Going back to the current avatar drops the upload still waiting.
+        self.upload_avatar(upload("blue"))
+        blue = AvatarJob.objects.latest("id")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload_avatar(upload("red"))
+        self.assertEqual(avatars.process_pending(), 0)
+        self.assertFalse(default_storage.exists(blue.source.name))
+
+    def test_only_the_newest_upload_is_rendered(self):
+        self.upload_avatar(upload("red"))
+        self.upload_avatar(upload("blue"))
+        self.assertEqual(avatars.process_pending(), 2)
+        red, blue = AvatarJob.objects.order_by("id")
+        self.useraccount.refresh_from_db()
+        self.assertEqual(self.useraccount.avatar_hash, blue.content_hash)
+        self.assertFalse(default_storage.exists(f"avatars/{red.content_hash}/64.jpg"))
+
+    def test_stored_variants_are_reused_without_decoding(self):
+        self.upload_avatar(upload("green"))
+        avatars.process_pending()
+        other = create_useraccount("avatar_other")
+        other.image = upload("green")
+        other.save()
+        with mock.patch("core.shared.avatars.decode") as decode:
+            self.assertEqual(avatars.process_pending(), 1)
+        decode.assert_not_called()
+        other.refresh_from_db()
+        self.useraccount.refresh_from_db()
+        self.assertEqual(other.avatar_variants, self.useraccount.avatar_variants)
+
+    def test_broken_upload_is_retried_then_left(self):
+        self.upload_avatar(SimpleUploadedFile("avatar.png", b"not an image"))
+        with self.assertLogs("core.shared.queue", "ERROR"):
+            for _ in range(4):
+                avatars.process_pending()
+        job = AvatarJob.objects.get()
+        self.assertEqual((job.attempts, job.finished_time), (3, None))
+        self.assertIn("UnidentifiedImageError", job.last_error)
+        self.useraccount.refresh_from_db()
+        self.assertTrue(self.useraccount.image.name.startswith("https://gravatar.com/avatar/"))
@@ -0,0 +1,105 @@
+import csv
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from core.models.games import ArchivedSportsGame, Sport, SportsGame
+from core.models.play import Play, PlaySlip
+from core.shared import settlement
+from core.shared.fixtures import archive_games, import_fixtures, parse_match_day
+from core.tests.test_models.test_settlement import create_wager
+from core.tests.view_test_mixins import create_useraccount
+
+
+def row(home, away="Malaga", **extra):
+    return {
+        "sport": "Soccer", "competition": "La Liga", "home": home, "away": away,
+        "match_day": "2030-03-11T15:00:00Z", **extra,
+    }
+
+
+class FixtureCatalogueTest(TestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.sport = Sport.objects.create(name="Soccer")
+
+    def test_fixtures_are_looked_up_in_two_queries(self):
+        fixtures = [
+            {"type_id": self.sport.id, "competition": "La Liga", "home": f"Team {index}", "away": "Malaga",
+             "match_day": parse_match_day("2030-03-11T15:00:00Z")}
+            for index in range(20)
+        ]
+        SportsGame.objects.get_or_create_fixtures(fixtures[:5])
+        with CaptureQueriesContext(connection) as queries:
+            games = SportsGame.objects.get_or_create_fixtures(fixtures + fixtures[:3])
+        self.assertEqual(len(queries), 2)
+        self.assertEqual([game.home for game in games], [f"Team {index}" for index in range(20)] + ["Team 0", "Team 1", "Team 2"])
+        self.assertEqual(SportsGame.objects.count(), 20)
+
+    def test_import_is_idempotent_and_skips_unknown_sports(self):
+        rows = [row("Levante"), row("Getafe"), row("Levante"), row("Djokovic", sport="Tennis")]
+        with self.assertLogs("core.shared.fixtures", "WARNING"):
+            self.assertEqual(import_fixtures(rows), (2, 0))
+            self.assertEqual(import_fixtures(rows), (2, 0))
+        self.assertEqual(SportsGame.objects.count(), 2)
+
+    def test_result_is_settled_once_for_plays_and_wagers(self):
+        import_fixtures([row("Levante")])
+        game = SportsGame.objects.get()
+        backer = create_useraccount("fixture_backer", balance=10000)
+        wager = create_wager(backer, game, 10)
+        play = Play.objects.create(game=game, slip=PlaySlip.objects.create(issuer=backer), prediction="Home win")
+
+        self.assertEqual(import_fixtures([row("Levante", result="2-0")]), (1, 1))
+        self.assertEqual(settlement.settle_pending(), 1)
+        play.refresh_from_db()
+        wager.refresh_from_db()
+        self.assertEqual((play.status, wager.status), (Play.WIN, wager.VOID))
+
+        # A late correction does not reopen a settled game.
+        self.assertEqual(import_fixtures([row("Levante", result="0-2")]), (1, 0))
+        game.refresh_from_db()
+        self.assertEqual(game.result, "2-0")
+
+    def test_command_reads_csv_feeds(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="") as feed:
+            writer = csv.DictWriter(feed, ["sport", "competition", "home", "away", "match_day", "result"])
+            writer.writeheader()
+            writer.writerows([row("Levante", result="1-1"), row("Getafe", match_day="2030-03-12 18:00")])
+            feed.flush()
+            out = StringIO()
+            call_command("import_fixtures", feed.name, stdout=out)
+        self.assertIn("Imported 2 game(s) and 1 result(s)", out.getvalue())
+        self.assertEqual(SportsGame.objects.get(home="Levante").result, "1-1")
+
+    def test_command_rejects_incomplete_rows(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as feed:
+            feed.write('[{"sport": "Soccer", "home": "Levante", "away": "Malaga", "match_day": "soon"}]')
+            feed.flush()
+            with self.assertRaisesMessage(CommandError, "Row 1 has no competition"):
+                call_command("import_fixtures", feed.name, stdout=StringIO())
+        self.assertFalse(SportsGame.objects.exists())
+
+    def test_only_past_games_without_history_are_archived(self):
+        past = timezone.now() - timedelta(days=40)
+        games = SportsGame.objects.bulk_create([
+            SportsGame(type=self.sport, competition="La Liga", home=home, away="Malaga", match_day=match_day, result="1-0")
+            for home, match_day in (
+                ("Levante", past), ("Getafe", past), ("Sevilla", past), ("Osasuna", timezone.now() - timedelta(days=2)),
+            )
+        ])
+        backer = create_useraccount("archive_backer", balance=10000)
+        create_wager(backer, games[1], 10)
+        Play.objects.create(game=games[2], slip=PlaySlip.objects.create(issuer=backer), prediction="Draw")
+
+        self.assertEqual(archive_games(30, batch_size=1), 1)
+        self.assertEqual(archive_games(30), 0)
+        archived = ArchivedSportsGame.objects.get()
+        self.assertEqual((archived.id, archived.home, archived.result), (games[0].id, "Levante", "1-0"))
+        self.assertEqual(set(SportsGame.objects.values_list("home", flat=True)), {"Getafe", "Sevilla", "Osasuna"})
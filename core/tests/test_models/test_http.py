@@ -0,0 +1,113 @@
+import asyncio
+import requests
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from core.exceptions import ProviderUnavailableError
+from core.shared import banks
+from core.shared.http import CircuitBreaker, ProviderClient
+
+
+def json_response(status_code=200, body=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = b'{"status": true}' if body is None else body
+    return response
+
+
+def refused():
+    reason = NewConnectionError(None, "Connection refused")
+    return requests.exceptions.ConnectionError(MaxRetryError(None, "/", reason))
+
+
+class ProviderClientTestCase(SimpleTestCase):
+    def setUp(self):
+        self.client = ProviderClient("test", "https://provider.test/", retries=2, backoff=0)
+        self.calls = mock.patch.object(self.client.session, "request").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_pooled_session_is_reused(self):
+        self.calls.return_value = json_response()
+        self.assertEqual(self.client.get("banks"), {"status": True})
+        self.client.get("banks")
+        self.calls.assert_called_with("GET", "https://provider.test/banks", timeout=self.client.timeout)
+
+    def test_idempotent_calls_are_retried(self):
+        self.calls.side_effect = [requests.exceptions.ReadTimeout(), json_response(503), json_response()]
+        self.assertEqual(self.client.get("banks"), {"status": True})
+        self.assertEqual(self.calls.call_count, 3)
+
+    def test_posts_are_only_retried_when_never_sent(self):
+        self.calls.side_effect = [refused(), json_response()]
+        self.assertEqual(self.client.post("transfer"), {"status": True})
+
+        self.calls.reset_mock()
+        self.calls.side_effect = [requests.exceptions.ReadTimeout(), json_response()]
+        with self.assertRaises(ProviderUnavailableError) as raised:
+            self.client.post("transfer")
+        self.assertTrue(raised.exception.sent)
+        self.assertEqual(self.calls.call_count, 1)
+
+    def test_circuit_opens_after_repeated_failures(self):
+        self.client.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        self.calls.side_effect = requests.exceptions.ConnectTimeout()
+        with self.assertRaises(ProviderUnavailableError):
+            self.client.get("banks")
+        self.assertTrue(self.client.breaker.is_open)
+
+        self.calls.reset_mock()
+        with self.assertRaises(ProviderUnavailableError) as raised:
+            self.client.get("banks")
+        self.assertFalse(raised.exception.sent)
+        self.calls.assert_not_called()
+
+    def test_half_open_trial_closes_circuit(self):
+        self.client.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        self.calls.side_effect = [requests.exceptions.ConnectTimeout(), json_response()]
+        self.assertEqual(self.client.get("banks"), {"status": True})
+        self.assertEqual(self.calls.call_count, 2)
+        self.assertFalse(self.client.breaker.is_open)
+
+    def test_non_json_response(self):
+        self.calls.return_value = json_response(200, b"<html>")
+        with self.assertRaises(ProviderUnavailableError):
+            self.client.get("banks")
+
+    def test_async_interface(self):
+        self.calls.return_value = json_response()
+        self.assertEqual(asyncio.run(self.client.aget("banks")), {"status": True})
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class BankCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bank_list_is_fetched_once_per_provider_and_country(self):
+        fetch = mock.Mock(return_value={"status": True, "data": ["Access Bank"]})
+        banks.list_banks("paystack", "Nigeria", fetch)
+        self.assertEqual(banks.list_banks("paystack", "Nigeria", fetch)["data"], ["Access Bank"])
+        banks.list_banks("paystack", "Ghana", fetch)
+        banks.list_banks("flutterwave", "Nigeria", fetch)
+        self.assertEqual(fetch.call_count, 3)
+
+    def test_failed_bank_list_is_not_cached(self):
+        fetch = mock.Mock(side_effect=[{"status": False}, {"status": "success", "data": []}])
+        self.assertEqual(banks.list_banks("flutterwave", "NG", fetch), {"status": False})
+        self.assertEqual(banks.list_banks("flutterwave", "NG", fetch)["status"], "success")
+
+    def test_account_resolution_is_cached_briefly(self):
+        fetch = mock.Mock(return_value={"status": True, "data": {"account_name": "ADA OBI"}})
+        with mock.patch("core.shared.banks.cache.set", wraps=cache.set) as cache_set:
+            banks.resolve_account("paystack", "058", "0123456789", fetch)
+            banks.resolve_account("paystack", "058", "0123456789", fetch)
+            banks.resolve_account("paystack", "058", "9999999999", mock.Mock(return_value={"status": False}))
+        self.assertEqual(fetch.call_count, 1)
+        (key, _), kwargs = cache_set.call_args_list[0]
+        self.assertNotIn("0123456789", key)
+        self.assertEqual(
+            [call.kwargs["timeout"] for call in cache_set.call_args_list],
+            [settings.ACCOUNT_RESOLUTION_CACHE_TTL, settings.ACCOUNT_RESOLUTION_NEGATIVE_TTL],
+        )
@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
+from core.exceptions import InsuficientFundError
+from core.models.ledger import LedgerEntry
+from core.shared import ledger
+from core.tests.view_test_mixins import create_useraccount
+
+
+class LedgerTestCase(TestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.backer = create_useraccount("ledger_backer", balance=10000).wallet
+        self.layer = create_useraccount("ledger_layer", balance=10000).wallet
+
+    def test_to_minor_units(self):
+        self.assertEqual(ledger.to_minor_units("12.345"), 1235)
+        self.assertEqual(ledger.to_minor_units(0.1 + 0.2), 30)
+
+    def test_wager_lifecycle_balances(self):
+        ledger.hold_stake(self.backer, 2500)
+        ledger.match_stakes(self.backer, self.layer, 2500)
+        self.backer.refresh_from_db()
+        self.layer.refresh_from_db()
+        self.assertEqual((self.backer.balance, self.backer.withheld), (7500, 0))
+        self.assertEqual((self.layer.balance, self.layer.withheld), (7500, 0))
+        self.assertEqual(LedgerEntry.objects.aggregate(total=Sum("amount"))["total"], 0)
+        self.assertEqual(
+            LedgerEntry.objects.filter(account=LedgerEntry.ESCROW).aggregate(total=Sum("amount"))["total"],
+            5000,
+        )
+
+    def test_overdraft_rolls_back_whole_posting(self):
+        with self.assertRaises(InsuficientFundError):
+            ledger.pay_subscription(self.backer, self.layer, 20000, 2000)
+        self.layer.refresh_from_db()
+        self.assertEqual(self.layer.balance, 10000)
+        self.assertFalse(LedgerEntry.objects.exists())
+
+    def test_unbalanced_posting_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ledger.post([(self.backer, LedgerEntry.BALANCE, 100)])
+
+
+class LedgerConcurrencyTestCase(TransactionTestCase):
+    fixtures = ['currency.json']
+
+    def test_parallel_stakes_never_overdraw(self):
+        wallet = create_useraccount("stressed_backer", balance=150 * 100).wallet
+
+        def place(_):
+            try:
+                ledger.hold_stake(wallet.id, 100)
+                return True
+            except InsuficientFundError:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            placed = sum(executor.map(place, range(300)))
+
+        wallet.refresh_from_db()
+        self.assertEqual(placed, 150)
+        self.assertEqual((wallet.balance, wallet.withheld), (0, 150 * 100))
+        self.assertEqual(LedgerEntry.objects.filter(wallet=wallet).count(), 300)
+        self.assertEqual(LedgerEntry.objects.aggregate(total=Sum("amount"))["total"], 0)
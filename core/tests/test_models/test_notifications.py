@@ -0,0 +1,179 @@
+from contextlib import contextmanager
+from datetime import timedelta
+from unittest import mock
+from django.core import mail
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.tests.view_test_mixins import create_useraccount
+from core.models.games import Sport
+from core.models.notification import NotificationJob, NotificationTarget
+from core.models.play import PlaySlip
+from core.models.subscription import Subscription
+from core.shared import notifications
+from core.shared.notifications import Channel, EmailChannel, LocalChannel
+
+
+LOCAL_CHANNELS = {
+    "fake": {"BACKEND": "core.shared.notifications.LocalChannel", "RATE": 1000, "BATCH_SIZE": 1000},
+}
+
+
+@override_settings(
+    NOTIFICATION_CHANNELS=LOCAL_CHANNELS,
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+class NotificationFanOutTest(TestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        LocalChannel.outbox.clear()
+        self.capper = create_useraccount("notify_capper")
+        self.free = [create_useraccount(f"notify_free_{i}") for i in range(5)]
+        self.premium = [create_useraccount(f"notify_premium_{i}") for i in range(3)]
+        for subscriber in self.free:
+            Subscription.objects.create(type=Subscription.FREE, issuer=self.capper, subscriber=subscriber)
+        for subscriber in self.premium:
+            Subscription.objects.create(
+                type=Subscription.PREMIUM, issuer=self.capper, subscriber=subscriber,
+                expiration_date=timezone.now() + timedelta(days=30),
+            )
+        lapsed = create_useraccount("notify_lapsed")
+        Subscription.objects.create(
+            type=Subscription.PREMIUM, issuer=self.capper, subscriber=lapsed,
+            expiration_date=timezone.now() - timedelta(days=1),
+        )
+
+    def drain(self, batch_size=500):
+        while notifications.run_pending(batch_size=batch_size):
+            pass
+
+    def delivered_to(self):
+        return sorted(address for _, address, _ in LocalChannel.outbox)
+
+    def test_premium_slips_reach_current_premium_subscribers_only(self):
+        notifications.enqueue_slip(PlaySlip.objects.create(issuer=self.capper, title="Weekend", is_premium=True))
+        self.drain()
+        self.assertEqual(self.delivered_to(), sorted(f"useraccount:{u.id}" for u in self.premium))
+
+    def test_free_slips_reach_free_subscribers(self):
+        notifications.enqueue_slip(PlaySlip.objects.create(issuer=self.capper, title="Weekend"))
+        self.drain()
+        self.assertEqual(self.delivered_to(), sorted(f"useraccount:{u.id}" for u in self.free))
+        self.assertIn("Weekend", LocalChannel.outbox[0][2]["body"])
+
+    def test_recipients_are_expanded_in_batches(self):
+        notifications.enqueue_slip(PlaySlip.objects.create(issuer=self.capper, title="Weekend"))
+        self.assertEqual(notifications.run_pending(batch_size=2), 2)
+        job = NotificationJob.objects.get()
+        self.assertEqual((job.cursor, job.recipient_count, job.finished_time), (self.free[1].id, 2, None))
+        self.drain(batch_size=2)
+        job.refresh_from_db()
+        self.assertEqual(job.recipient_count, 5)
+        self.assertIsNotNone(job.finished_time)
+        self.assertEqual(len(LocalChannel.outbox), 5)
+        self.assertEqual(notifications.run_pending(), 0)
+
+    def test_failing_channel_does_not_block_others(self):
+        broken = Channel("broken")
+        broken.get_addresses = mock.Mock(side_effect=RuntimeError("down"))
+        channels = [broken, LocalChannel("fake")]
+        notifications.enqueue_slip(PlaySlip.objects.create(issuer=self.capper, title="Weekend"))
+        with self.assertLogs("core.shared.notifications", "ERROR"):
+            notifications.run_pending(channels=channels)
+        self.assertEqual(len(LocalChannel.outbox), 5)
+        job = NotificationJob.objects.get()
+        self.assertIsNone(job.finished_time)
+        self.assertEqual((job.channel_cursors, job.channel_failures), ({"broken": 0, "fake": self.free[-1].id}, {"broken": 1}))
+        # The job is held back until the retry is due.
+        self.assertEqual(notifications.run_pending(channels=channels), 0)
+
+        # The retry only goes to the channel that failed.
+        broken.get_addresses = mock.Mock(side_effect=lambda ids: [f"broken:{id}" for id in ids])
+        broken.send = mock.Mock()
+        NotificationJob.objects.update(leased_until=timezone.now())
+        notifications.run_pending(channels=channels)
+        broken.send.assert_called_once_with([f"broken:{u.id}" for u in self.free], mock.ANY)
+        self.assertEqual(len(LocalChannel.outbox), 5)
+        job.refresh_from_db()
+        self.assertEqual((job.channel_failures, job.recipient_count), ({}, 5))
+        self.assertIsNotNone(job.finished_time)
+
+    @override_settings(NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_channel_batch_is_skipped_after_max_attempts(self):
+        broken = Channel("broken")
+        broken.get_addresses = mock.Mock(side_effect=RuntimeError("down"))
+        notifications.enqueue_slip(PlaySlip.objects.create(issuer=self.capper, title="Weekend"))
+        with self.assertLogs("core.shared.notifications", "ERROR") as logs:
+            notifications.run_pending(channels=[broken])
+            NotificationJob.objects.update(leased_until=timezone.now())
+            notifications.run_pending(channels=[broken])
+        self.assertIn("skipping 5 recipient(s)", logs.output[-1])
+        job = NotificationJob.objects.get()
+        self.assertIsNotNone(job.finished_time)
+        self.assertIn("down", job.last_error)
+
+    def test_job_is_leased_not_locked_while_delivering(self):
+        notifications.enqueue_slip(PlaySlip.objects.create(issuer=self.capper, title="Weekend"))
+        atomic_blocks = []
+
+        @contextmanager
+        def tracked_atomic(*args, **kwargs):
+            with transaction.atomic(*args, **kwargs):
+                atomic_blocks.append(True)
+                yield
+                atomic_blocks.pop()
+
+        def send(addresses, message):
+            self.assertEqual(atomic_blocks, [])
+            self.assertIsNotNone(NotificationJob.objects.get().leased_until)
+
+        channel = LocalChannel("fake")
+        with mock.patch.object(channel, "send", side_effect=send) as sent, \
+                mock.patch("core.shared.notifications.transaction", atomic=tracked_atomic):
+            notifications.run_pending(channels=[channel])
+        sent.assert_called_once()
+        self.assertIsNone(NotificationJob.objects.get().leased_until)
+
+    def test_channel_sends_in_rate_limited_batches(self):
+        channel = LocalChannel("fake", rate=2, batch_size=10)
+        with mock.patch("core.shared.notifications.time") as clock:
+            clock.time.side_effect = [100.5, 100.7, 101.0]
+            channel.deliver([u.id for u in self.free[:4]], {"body": "hi"})
+        self.assertEqual(len(LocalChannel.outbox), 4)
+        clock.sleep.assert_called_once()
+        self.assertAlmostEqual(clock.sleep.call_args.args[0], 0.3)
+
+    def test_email_and_opt_in_channels(self):
+        message = {"subject": "New slip", "body": "hi"}
+        EmailChannel("email").deliver([u.id for u in self.free], message)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(u.user.email for u in self.free))
+
+        NotificationTarget.objects.create(useraccount=self.free[0], channel="telegram", address="1234")
+        channel = Channel("telegram")
+        channel.send = mock.Mock()
+        channel.deliver([u.id for u in self.free], message)
+        channel.send.assert_called_once_with(["1234"], message)
+
+    def test_creating_a_slip_only_enqueues_the_fan_out(self):
+        Sport.objects.create(name="Soccer")
+        client = APIClient()
+        client.force_authenticate(user=self.capper.user)
+        response = client.post(reverse('plays'), {
+            "title": "Midweek",
+            "is_premium": False,
+            "plays": [{
+                "match": {
+                    "sports": "Soccer", "competition": "La Liga", "home_team": "Levante",
+                    "away_team": "Malaga", "match_day": timezone.now() + timedelta(days=2),
+                },
+                "prediction": "Draw",
+            }],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        job = NotificationJob.objects.get()
+        self.assertEqual((job.slip.title, job.finished_time), ("Midweek", None))
+        self.assertEqual(LocalChannel.outbox, [])
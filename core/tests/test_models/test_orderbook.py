@@ -0,0 +1,38 @@
+from django.test import SimpleTestCase
+from core.shared.orderbook import OrderBook
+
+
+class OrderBookTestCase(SimpleTestCase):
+    def setUp(self):
+        self.book = OrderBook()
+
+    def test_same_option_rests(self):
+        self.assertEqual(self.book.match("a", True, 100, 1), [])
+        self.assertEqual(self.book.match("b", True, 100, 2), [])
+        self.assertEqual(len(self.book), 2)
+
+    def test_oldest_opposing_order_fills_first(self):
+        self.book.match("a", True, 100, 2)
+        self.book.match("b", True, 100, 1)
+        self.assertEqual(self.book.match("c", False, 150, 3), [("b", 100), ("a", 50)])
+        self.assertEqual(self.book.remaining, {"a": 50})
+
+    def test_remainder_rests_on_own_side(self):
+        self.book.match("a", True, 100, 1)
+        self.assertEqual(self.book.match("b", False, 300, 2), [("a", 100)])
+        self.assertEqual(self.book.match("c", True, 50, 3), [("b", 50)])
+        self.assertEqual(self.book.remaining, {"b": 150})
+
+    def test_cancelled_orders_are_skipped(self):
+        self.book.match("a", True, 100, 1)
+        self.book.match("b", True, 100, 2)
+        self.book.cancel("a")
+        self.assertEqual(self.book.match("c", False, 100, 3), [("b", 100)])
+        self.assertEqual(len(self.book), 0)
+
+    def test_own_orders_are_stepped_over(self):
+        self.book.match("a", True, 100, 1, owner=1)
+        self.book.match("b", True, 100, 2, owner=2)
+        self.assertEqual(self.book.match("c", False, 150, 3, owner=1), [("b", 100)])
+        self.assertEqual(self.book.remaining, {"a": 100, "c": 50})
+        self.assertEqual(self.book.match("d", False, 100, 4, owner=2), [("a", 100)])
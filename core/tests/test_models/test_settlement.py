@@ -0,0 +1,143 @@
+import pytz
+from datetime import datetime, timedelta
+from django.db.models import Sum
+from django.test import TestCase
+from core.models.games import Sport, SportsGame
+from core.models.ledger import LedgerEntry
+from core.models.play import Play, PlaySlip
+from core.models.transaction import Transaction
+from core.models.wager import SportsWager
+from core.shared import ledger, settlement
+from core.shared.orderbook import persist_fills
+from core.tests.view_test_mixins import create_useraccount
+
+
+def create_wager(backer, game, stake, **kwargs):
+    transaction = Transaction.objects.create(
+        type=Transaction.WAGER,
+        amount=stake,
+        status=Transaction.PENDING,
+        user=backer,
+        currency=backer.wallet.currency,
+    )
+    ledger.hold_stake(backer.wallet_id, ledger.to_minor_units(stake))
+    kwargs.setdefault("market", "Home win")
+    kwargs.setdefault("backer_option", True)
+    return SportsWager.objects.create(backer=backer, game=game, stake=stake, transaction=transaction, **kwargs)
+
+
+class SettlementTestCase(TestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.backer = create_useraccount("settle_backer", balance=10000)
+        self.layer = create_useraccount("settle_layer", balance=10000)
+        self.game = SportsGame.objects.create(
+            type=Sport.objects.create(name="Soccer"),
+            competition="Premier League",
+            home="Arsenal",
+            away="Chelsea",
+            match_day=datetime.utcnow().replace(tzinfo=pytz.UTC) - timedelta(hours=2),
+        )
+
+    def balances(self, useraccount):
+        useraccount.wallet.refresh_from_db()
+        return useraccount.wallet.balance, useraccount.wallet.withheld
+
+    def finish(self, result):
+        SportsGame.objects.filter(id=self.game.id).update(result=result)
+        return settlement.settle_games([self.game.id])
+
+    def test_markets_from_score(self):
+        self.assertEqual(settlement.markets_from_score("2-1"), ["Home win"])
+        self.assertEqual(settlement.markets_from_score("0:0"), ["Draw"])
+        self.assertEqual(settlement.markets_from_score("1-3"), ["Away win"])
+        self.assertEqual(settlement.markets_from_score("postponed"), [])
+
+    def test_matched_wager_pays_winner(self):
+        wager = create_wager(self.backer, self.game, 25, backer_option=False)
+        ledger.match_stakes(self.backer.wallet_id, self.layer.wallet_id, 2500)
+        SportsWager.objects.filter(id=wager.id).update(layer=self.layer, layer_option=True, matched=True)
+
+        self.assertEqual(self.finish("2-1"), 1)
+        wager.refresh_from_db()
+        self.assertEqual((wager.status, wager.winner_id), (SportsWager.SETTLED, self.layer.id))
+        self.assertEqual(self.balances(self.backer), (7500, 0))
+        self.assertEqual(self.balances(self.layer), (12500, 0))
+        self.assertTrue(Transaction.objects.filter(user=self.layer, amount=50, status=Transaction.SUCCEED).exists())
+        self.assertEqual(LedgerEntry.objects.filter(account=LedgerEntry.ESCROW).aggregate(total=Sum("amount"))["total"], 0)
+
+    def test_unmatched_wager_is_void_and_released(self):
+        wager = create_wager(self.backer, self.game, 10)
+        self.finish("0-0")
+        wager.refresh_from_db()
+        self.assertEqual((wager.status, wager.winner_id), (SportsWager.VOID, None))
+        self.assertEqual(wager.transaction.status, Transaction.FAILED)
+        self.assertEqual(self.balances(self.backer), (10000, 0))
+
+    def test_order_book_fills_and_remainders(self):
+        maker = create_wager(self.backer, self.game, 30, unmatched_amount=3000, booked=True)
+        taker = create_wager(self.layer, self.game, 20, unmatched_amount=2000, backer_option=False)
+        idle = create_wager(self.layer, self.game, 5, unmatched_amount=500, market="Draw", booked=True)
+        persist_fills(taker, [(maker.id, 2000)])
+
+        self.finish("1-0")
+        maker.refresh_from_db()
+        taker.refresh_from_db()
+        idle.refresh_from_db()
+        self.assertEqual((maker.status, maker.winner_id, maker.unmatched_amount), (SportsWager.SETTLED, self.backer.id, 0))
+        self.assertEqual((taker.status, taker.winner_id), (SportsWager.SETTLED, None))
+        self.assertEqual((idle.status, idle.unmatched_amount), (SportsWager.VOID, 0))
+        self.assertEqual(self.balances(self.backer), (7000 + 4000 + 1000, 0))
+        self.assertEqual(self.balances(self.layer), (8000, 0))
+
+    def test_fractional_payout_is_rounded_in_history(self):
+        maker = create_wager(self.backer, self.game, 10.25, unmatched_amount=1025, booked=True)
+        taker = create_wager(self.layer, self.game, 10.25, unmatched_amount=1025, backer_option=False)
+        persist_fills(taker, [(maker.id, 1025)])
+
+        self.finish("1-0")
+        self.assertEqual(self.balances(self.backer), (10000 + 1025, 0))
+        payout = Transaction.objects.get(user=self.backer, type=Transaction.WAGER, status=Transaction.SUCCEED)
+        self.assertEqual(payout.amount, 21)
+
+    def test_rerun_is_a_no_op(self):
+        wager = create_wager(self.backer, self.game, 25)
+        ledger.match_stakes(self.backer.wallet_id, self.layer.wallet_id, 2500)
+        SportsWager.objects.filter(id=wager.id).update(layer=self.layer, layer_option=False, matched=True)
+        self.finish("3-1")
+        entries = LedgerEntry.objects.count()
+        transactions = Transaction.objects.count()
+
+        self.assertEqual(settlement.settle_games([self.game.id]), 0)
+        self.assertEqual(settlement.settle_pending(), 0)
+        self.assertEqual(self.balances(self.backer), (12500, 0))
+        self.assertEqual((LedgerEntry.objects.count(), Transaction.objects.count()), (entries, transactions))
+
+    def test_unknown_result_waits_for_winning_markets(self):
+        create_wager(self.backer, self.game, 10)
+        self.assertEqual(self.finish("abandoned"), 0)
+        self.game.refresh_from_db()
+        self.assertIsNone(self.game.settled_time)
+
+        SportsGame.objects.filter(id=self.game.id).update(winning_markets=["Draw"])
+        self.assertEqual(settlement.settle_pending(), 1)
+
+    def test_plays_settled_with_wagers_and_stats_refreshed(self):
+        wager = create_wager(self.backer, self.game, 25)
+        ledger.match_stakes(self.backer.wallet_id, self.layer.wallet_id, 2500)
+        SportsWager.objects.filter(id=wager.id).update(layer=self.layer, layer_option=False, matched=True)
+        slip = PlaySlip.objects.create(issuer=self.backer, title="weekend")
+        won = Play.objects.create(game=self.game, slip=slip, prediction="Draw")
+        lost = Play.objects.create(game=self.game, slip=slip, prediction="Home win")
+        SportsGame.objects.filter(id=self.game.id).update(result="1-1")
+
+        self.assertEqual(settlement.settle_pending(), 1)
+        won.refresh_from_db()
+        lost.refresh_from_db()
+        wager.refresh_from_db()
+        self.assertEqual((won.status, lost.status), (Play.WIN, Play.LOSS))
+        self.assertEqual(wager.winner, self.layer)
+        self.backer.stats.refresh_from_db()
+        self.assertEqual((self.backer.stats.settled_play_count, self.backer.stats.win_rate), (2, 0.5))
+        self.assertEqual(settlement.settle_pending(), 0)
@@ -1,6 +1,11 @@
+import pytz
+from datetime import datetime, timedelta
 from django.test import TestCase
 from django.contrib.auth.models import User
 from core.models.subscription import Subscription
+from core.signals import subscriptions_expired
+from core.shared.helper import expire_subscriptions
+from core.tests.view_test_mixins import create_useraccount
 
 
 class SubscriptionModelTestCase(TestCase):
@@ -44,3 +49,44 @@ class SubscriptionModelTestCase(TestCase):
     def test__str__label(self):
         subscription = Subscription.objects.get(id=105)
         self.assertEqual(subscription.__str__(), f"{subscription.type}-{subscription.issuer.user.username}->{subscription.subscriber.user.username}")
+
+
+class SubscriptionExpiryTestCase(TestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.issuer = create_useraccount("expiry_issuer")
+        self.subscriber = create_useraccount("expiry_subscriber")
+        now = datetime.utcnow().replace(tzinfo=pytz.UTC)
+        self.expired = Subscription.objects.create(
+            type=Subscription.PREMIUM, issuer=self.issuer, subscriber=self.subscriber,
+            expiration_date=now - timedelta(days=1),
+        )
+        self.current = Subscription.objects.create(
+            type=Subscription.PREMIUM, issuer=self.issuer, subscriber=self.subscriber,
+            expiration_date=now + timedelta(days=1),
+        )
+        self.free = Subscription.objects.create(
+            type=Subscription.FREE, issuer=self.issuer, subscriber=self.subscriber,
+        )
+
+    def test_active_excludes_lapsed_premium_without_writing(self):
+        active = Subscription.objects.active()
+        self.assertCountEqual(active, [self.current, self.free])
+        self.expired.refresh_from_db()
+        self.assertTrue(self.expired.is_active)
+
+    def test_expire_subscriptions_flips_in_bulk_and_sends_signal(self):
+        received = []
+        def receiver(sender, ids, **kwargs):
+            received.extend(ids)
+        subscriptions_expired.connect(receiver)
+        self.addCleanup(subscriptions_expired.disconnect, receiver)
+
+        self.assertEqual(expire_subscriptions(), 1)
+        self.assertEqual(received, [self.expired.id])
+        self.assertEqual(
+            list(Subscription.objects.filter(is_active=False).values_list("id", flat=True)),
+            [self.expired.id],
+        )
+        self.assertEqual(expire_subscriptions(), 0)
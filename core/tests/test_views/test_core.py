@@ -1,15 +1,28 @@
+import csv
+import json
 import pytz
+import time
+from unittest import mock
 from datetime import datetime, timedelta
-from django.test import override_settings
+from django.db import connection
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.urls import reverse
+from django.utils.http import urlencode
 
-from core.tests.view_test_mixins import get_mock_request
+from core.tests.view_test_mixins import get_mock_request, create_useraccount, QueryCountMixin
 from core.views.play import SubscriptionView
 from core.models.user import UserAccount
 from core.models.subscription import Subscription
 from core.models.play import PlaySlip, Play
+from core.models.games import Sport, SportsGame
+from core.models.transaction import Transaction
+from core.shared.helper import get_subscriber_feed
+from core.shared.cache import get_or_build
+from core.shared.leaderboard import rebuild_capper_stats
 
 
 @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }})
@@ -187,3 +200,403 @@ class PlayViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response['content-type'], 'application/json')
         self.assertEqual(response.json()['data']['issuer']['id'], 98)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }})
+class PlayFeedViewTest(APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.subscriber = create_useraccount("feed_subscriber")
+        self.free_capper = create_useraccount("feed_free_capper")
+        self.premium_capper = create_useraccount("feed_premium_capper")
+        self.stranger = create_useraccount("feed_stranger")
+        Subscription.objects.create(type=Subscription.FREE, issuer=self.free_capper, subscriber=self.subscriber)
+        Subscription.objects.create(type=Subscription.PREMIUM, issuer=self.premium_capper, subscriber=self.subscriber)
+        self.url = reverse('plays')
+        self.client.force_authenticate(user=self.subscriber.user)
+
+    def get_titles(self):
+        response = self.client.get(self.url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(slip['title'] for slip in response.json())
+
+    def test_feed_is_scoped_to_subscribed_issuers(self):
+        PlaySlip.objects.create(issuer=self.subscriber, title="own")
+        PlaySlip.objects.create(issuer=self.free_capper, title="free")
+        PlaySlip.objects.create(issuer=self.free_capper, title="free-premium", is_premium=True)
+        PlaySlip.objects.create(issuer=self.premium_capper, title="premium", is_premium=True)
+        PlaySlip.objects.create(issuer=self.stranger, title="stranger")
+        PlaySlip.objects.create(issuer=self.stranger, title="stranger-premium", is_premium=True)
+        self.assertEqual(self.get_titles(), ["free", "own", "premium"])
+
+    def test_feed_hides_slips_older_than_subscription(self):
+        slip = PlaySlip.objects.create(issuer=self.free_capper, title="old")
+        PlaySlip.objects.filter(id=slip.id).update(date_added=datetime.utcnow().replace(tzinfo=pytz.UTC) - timedelta(days=1))
+        self.assertEqual(self.get_titles(), [])
+
+    def test_feed_query_count_is_independent_of_subscriptions(self):
+        for index in range(5):
+            capper = create_useraccount(f"feed_capper_{index}")
+            Subscription.objects.create(type=Subscription.FREE, issuer=capper, subscriber=self.subscriber)
+        with CaptureQueriesContext(connection) as queries:
+            list(get_subscriber_feed(self.subscriber.id))
+        self.assertEqual(len(queries), 1)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }})
+class PlaySlipCreateViewTest(APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.capper = create_useraccount("slip_capper")
+        self.client.force_authenticate(user=self.capper.user)
+        Sport.objects.create(name="Soccer")
+
+    def slip(self, fixtures, **extra):
+        return {
+            "title": "Weekend",
+            "is_premium": False,
+            "plays": [{
+                "match": {
+                    "sports": "Soccer", "competition": "La Liga", "home_team": home, "away_team": "Malaga",
+                    "match_day": "2030-03-11T15:00:00Z", **extra,
+                },
+                "prediction": "Draw",
+            } for home in fixtures],
+        }
+
+    def post(self, data):
+        return self.client.post(reverse('plays'), data, format='json')
+
+    def test_slip_is_created_with_its_plays(self):
+        response = self.post(self.slip(["Levante", "Getafe"]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()['data']
+        self.assertEqual(data['issuer']['username'], "slip_capper")
+        self.assertEqual([play['match']['home_team'] for play in data['plays']], ["Levante", "Getafe"])
+        self.assertEqual(PlaySlip.objects.get().play_set.count(), 2)
+
+    def test_fixtures_are_shared_across_slips(self):
+        self.post(self.slip(["Levante", "Getafe"]))
+        other = create_useraccount("slip_other_capper")
+        self.client.force_authenticate(user=other.user)
+        self.post(self.slip(["Getafe", "Levante", "Getafe"]))
+        self.assertEqual(SportsGame.objects.count(), 2)
+        self.assertEqual(Play.objects.count(), 5)
+
+    def test_query_count_is_independent_of_plays(self):
+        # The capper's first slip also opens their stats row.
+        self.post(self.slip(["Osasuna"]))
+        with CaptureQueriesContext(connection) as one:
+            self.post(self.slip(["Levante"]))
+        with CaptureQueriesContext(connection) as many:
+            self.post(self.slip([f"Team {index}" for index in range(20)]))
+        self.assertEqual(len(one), len(many))
+
+    def test_invalid_slips_are_rejected_without_writes(self):
+        self.assertEqual(self.post({"title": "Empty", "plays": []}).status_code, status.HTTP_400_BAD_REQUEST)
+        slip = self.slip(["Levante"])
+        del slip["plays"][0]["match"]["match_day"]
+        self.assertEqual(self.post(slip).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(PlaySlip.objects.exists())
+
+    def test_cappers_cannot_set_results(self):
+        self.post(self.slip(["Levante"], result="1-0"))
+        self.assertEqual(SportsGame.objects.get().result, "")
+
+    def test_unknown_sports_and_finished_games_are_rejected(self):
+        self.assertEqual(self.post(self.slip(["Levante"], sports="Curling")).status_code, status.HTTP_400_BAD_REQUEST)
+        self.post(self.slip(["Levante"]))
+        SportsGame.objects.update(result="1-0")
+        self.assertEqual(self.post(self.slip(["Levante"])).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(PlaySlip.objects.count(), 1)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }})
+class KeysetPaginationViewTest(APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.useraccount = create_useraccount("paged_user")
+        self.client.force_authenticate(user=self.useraccount.user)
+        PlaySlip.objects.bulk_create([
+            PlaySlip(issuer=self.useraccount, title=f"slip-{index}") for index in range(7)
+        ])
+        # Identical timestamps force the id tie-breaker to be used.
+        PlaySlip.objects.update(date_added=datetime.utcnow().replace(tzinfo=pytz.UTC))
+
+    def test_without_cursor_returns_full_list(self):
+        response = self.client.get(reverse('plays'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 7)
+
+    def test_cursor_pages_through_feed_without_gaps(self):
+        url = reverse('plays') + '?cursor=&page_size=3'
+        ids = []
+        while url:
+            response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [slip['id'] for slip in response.json()['results']]
+            url = response.json()['next']
+        self.assertEqual(ids, list(PlaySlip.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('plays') + '?cursor=not-a-cursor', format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_transactions_cursor(self):
+        Transaction.objects.bulk_create([
+            Transaction(
+                type=Transaction.DEPOSIT,
+                amount=100,
+                status=Transaction.SUCCEED,
+                user=self.useraccount,
+                currency=self.useraccount.wallet.currency,
+            )
+            for _ in range(3)
+        ])
+        response = self.client.get(reverse('transactions') + '?cursor=&page_size=2', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 2)
+        response = self.client.get(response.json()['next'], format='json')
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertIsNone(response.json()['next'])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }})
+class ListQueryCountTest(QueryCountMixin, APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.useraccount = create_useraccount("counted_user")
+        self.client.force_authenticate(user=self.useraccount.user)
+
+    def subscribe(self, issuer, subscriber):
+        Subscription.objects.create(type=Subscription.FREE, issuer=issuer, subscriber=subscriber)
+        PlaySlip.objects.create(issuer=issuer, title="slip")
+
+    def test_subscriptions(self):
+        self.subscribe(create_useraccount("capper_0"), self.useraccount)
+        self.assertConstantQueries(reverse('subscriptions'), lambda: [
+            self.subscribe(create_useraccount(f"capper_{index}"), self.useraccount) for index in range(1, 4)
+        ])
+
+    def test_subscribers(self):
+        self.subscribe(self.useraccount, create_useraccount("follower_0"))
+        self.assertConstantQueries(reverse('subscribers'), lambda: [
+            self.subscribe(self.useraccount, create_useraccount(f"follower_{index}")) for index in range(1, 4)
+        ])
+
+    def test_cappers(self):
+        self.subscribe(create_useraccount("capper_0"), self.useraccount)
+        self.assertConstantQueries(reverse('cappers'), lambda: [
+            self.subscribe(create_useraccount(f"capper_{index}"), self.useraccount) for index in range(1, 4)
+        ])
+
+    def test_plays(self):
+        self.sport = Sport.objects.create(name="Soccer")
+
+        def add_slip():
+            slip = PlaySlip.objects.create(issuer=self.useraccount, title="slip")
+            for home, away in (("Levante", "Malaga"), ("Chelsea", "Fulham")):
+                game = SportsGame.objects.create(
+                    type=self.sport,
+                    competition="La Liga",
+                    home=home,
+                    away=away,
+                    match_day=datetime.utcnow().replace(tzinfo=pytz.UTC),
+                )
+                Play.objects.create(slip=slip, game=game, prediction="Draw")
+        add_slip()
+        self.assertConstantQueries(reverse('plays'), lambda: [add_slip() for _ in range(3)])
+
+    def test_transactions(self):
+        def add_transaction():
+            Transaction.objects.create(
+                type=Transaction.DEPOSIT,
+                amount=100,
+                status=Transaction.SUCCEED,
+                user=self.useraccount,
+                currency=self.useraccount.wallet.currency,
+            )
+        add_transaction()
+        self.assertConstantQueries(reverse('transactions'), lambda: [add_transaction() for _ in range(3)])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }})
+class CapperLeaderboardTest(APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.sharp = create_useraccount("sharp_capper")
+        self.average = create_useraccount("average_capper", currency="GHS", country="GH")
+        self.settle(self.sharp, [Play.WIN, Play.WIN, Play.LOSS])
+        self.settle(self.average, [Play.WIN, Play.LOSS, Play.LOSS, Play.PENDING])
+        for index in range(2):
+            Subscription.objects.create(type=Subscription.FREE, issuer=self.average, subscriber=create_useraccount(f"fan_{index}"))
+
+    def settle(self, capper, outcomes):
+        slip = PlaySlip.objects.create(issuer=capper, title="slip")
+        sport = Sport.objects.get_or_create(name="Soccer")[0]
+        for outcome in outcomes:
+            game = SportsGame.objects.create(
+                type=sport,
+                competition="La Liga",
+                home="Levante",
+                away="Malaga",
+                match_day=datetime.utcnow().replace(tzinfo=pytz.UTC),
+            )
+            play = Play.objects.create(slip=slip, game=game, prediction="Draw")
+            play.status = outcome
+            play.save()
+
+    def get_usernames(self, query=''):
+        response = self.client.get(reverse('cappers') + query, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [capper['user']['username'] for capper in response.json()]
+
+    def test_stats_follow_slips_plays_and_subscriptions(self):
+        self.assertEqual(self.sharp.stats.settled_play_count, 3)
+        self.assertEqual(self.sharp.stats.won_play_count, 2)
+        self.assertAlmostEqual(self.sharp.stats.win_rate, 2 / 3)
+        self.average.stats.refresh_from_db()
+        self.assertEqual(self.average.stats.settled_play_count, 3)
+        self.assertEqual(self.average.stats.free_subscriber_count, 2)
+        self.assertIsNotNone(self.average.stats.last_slip_date)
+
+    def test_sorts_and_filters(self):
+        self.assertEqual(self.get_usernames('?sort=win_rate'), ["sharp_capper", "average_capper"])
+        self.assertEqual(self.get_usernames('?sort=free_subscribers'), ["average_capper", "sharp_capper"])
+        self.assertEqual(self.get_usernames('?country=GH'), ["average_capper"])
+
+    def test_cursor_pages_by_win_rate(self):
+        response = self.client.get(reverse('cappers') + '?sort=win_rate&cursor=&page_size=1', format='json')
+        self.assertEqual([capper['win_rate'] for capper in response.json()['results']], [self.sharp.stats.win_rate])
+        response = self.client.get(response.json()['next'], format='json')
+        self.assertEqual([capper['user']['username'] for capper in response.json()['results']], ["average_capper"])
+        self.assertIsNone(response.json()['next'])
+
+    def test_invalid_sort(self):
+        response = self.client.get(reverse('cappers') + '?sort=roi', format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_inactive_cappers_are_hidden(self):
+        PlaySlip.objects.filter(issuer=self.average).update(
+            date_added=datetime.utcnow().replace(tzinfo=pytz.UTC) - timedelta(days=30)
+        )
+        rebuild_capper_stats([self.average.id])
+        self.assertEqual(self.get_usernames(), ["sharp_capper"])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }})
+class TransactionExportViewTest(APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.useraccount = create_useraccount("exporting_user")
+        self.client.force_authenticate(user=self.useraccount.user)
+        Transaction.objects.bulk_create([
+            Transaction(
+                type=Transaction.DEPOSIT,
+                amount=100 + index,
+                status=Transaction.SUCCEED,
+                user=self.useraccount,
+                currency=self.useraccount.wallet.currency,
+            )
+            for index in range(5)
+        ])
+        self.now = datetime.utcnow().replace(tzinfo=pytz.UTC)
+        for days, transaction in enumerate(Transaction.objects.order_by('id')):
+            Transaction.objects.filter(id=transaction.id).update(time=self.now - timedelta(days=4 - days))
+        other = create_useraccount("other_exporter")
+        Transaction.objects.create(
+            type=Transaction.WAGER, amount=1, status=Transaction.PENDING, user=other, currency=other.wallet.currency,
+        )
+
+    def export(self, query=''):
+        response = self.client.get(reverse('transactions-export') + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_is_newest_first_and_scoped_to_user(self):
+        rows = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual([row['amount'] for row in rows], [104, 103, 102, 101, 100])
+        self.assertEqual(rows[0]['type'], 'DEPOSIT')
+        self.assertEqual(rows[0]['status'], 'SUCCEED')
+        self.assertEqual(rows[0]['currency'], 'NGN')
+
+    def test_csv_with_date_range(self):
+        since = (self.now - timedelta(days=3, hours=1)).isoformat()
+        until = (self.now - timedelta(hours=12)).isoformat()
+        query = '?' + urlencode({'output': 'csv', 'time__gte': since, 'time__lt': until})
+        rows = list(csv.reader(self.export(query).splitlines()))
+        self.assertEqual(rows[0], ['id', 'time', 'type', 'status', 'amount', 'currency', 'reference'])
+        self.assertEqual([row[4] for row in rows[1:]], ['103', '102', '101'])
+
+    def test_invalid_parameters(self):
+        response = self.client.get(reverse('transactions-export') + '?output=xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('transactions-export') + '?time__gte=yesterday')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_is_a_single_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.export()
+        self.assertEqual(len(queries), 1)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CacheGetOrBuildTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def build(self):
+        self.calls += 1
+        return self.calls
+
+    def test_fresh_entry_is_reused(self):
+        self.assertEqual(get_or_build("leaderboard", self.build, timeout=60), 1)
+        self.assertEqual(get_or_build("leaderboard", self.build, timeout=60), 1)
+
+    def test_stale_entry_is_served_while_locked(self):
+        get_or_build("leaderboard", self.build, timeout=60)
+        later = time.time() + 90
+        with mock.patch("core.shared.cache.time.time", return_value=later):
+            cache.add("leaderboard:lock", 1)
+            self.assertEqual(get_or_build("leaderboard", self.build, timeout=60), 1)
+            cache.delete("leaderboard:lock")
+            self.assertEqual(get_or_build("leaderboard", self.build, timeout=60), 2)
+
+    def test_caller_that_outwaits_the_lock_keeps_it_held(self):
+        cache.add("leaderboard:lock", "winner")
+        self.assertEqual(get_or_build("leaderboard", self.build, timeout=60, wait=0), 1)
+        self.assertEqual(cache.get("leaderboard:lock"), "winner")
+
+    def test_background_refresh_serves_stale_entry(self):
+        get_or_build("leaderboard", self.build, timeout=60)
+        later = time.time() + 90
+        with mock.patch("core.shared.cache.time.time", return_value=later), \
+                mock.patch("core.shared.cache.threading.Thread") as thread:
+            self.assertEqual(get_or_build("leaderboard", self.build, timeout=60, background=True), 1)
+            self.assertEqual(self.calls, 1)
+            thread.call_args.kwargs["target"]()
+            self.assertEqual(get_or_build("leaderboard", self.build, timeout=60, background=True), 2)
+
+    def test_failed_background_refresh_keeps_stale_entry(self):
+        get_or_build("leaderboard", self.build, timeout=60)
+        later = time.time() + 90
+        with mock.patch("core.shared.cache.time.time", return_value=later), \
+                mock.patch("core.shared.cache.threading.Thread") as thread:
+            get_or_build("leaderboard", mock.Mock(side_effect=ValueError), timeout=60, background=True)
+            thread.call_args.kwargs["target"]()
+            self.assertIsNone(cache.get("leaderboard:lock"))
+            self.assertEqual(get_or_build("leaderboard", self.build, timeout=60, background=True), 1)
+
+    def test_uncacheable_values_are_not_stored(self):
+        self.assertEqual(get_or_build("leaderboard", self.build, cacheable=lambda value: value > 1), 1)
+        self.assertEqual(get_or_build("leaderboard", self.build, cacheable=lambda value: value > 1), 2)
+        self.assertEqual(get_or_build("leaderboard", self.build, cacheable=lambda value: value > 1), 2)
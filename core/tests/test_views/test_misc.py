@@ -1,6 +1,13 @@
+import os
+import time
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.urls import reverse
+from core.models.misc import TermsOfUse
+from core.shared.cache import LocalCache, local_cache
 
 
 class TermsOfUseAPITest(APITestCase):
@@ -40,3 +47,56 @@ class WaitlistAPITest(APITestCase):
         response = self.client.post(url, self.data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response['content-type'], 'application/json')
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class LocalCacheTierTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+
+    def test_repeat_requests_are_served_from_worker_memory(self):
+        TermsOfUse.objects.create(text="Be nice")
+        self.client.get(reverse('terms_of_use'))
+        hits = local_cache.stats()['hits']
+        with mock.patch('core.views.mixins.get_or_build') as shared_cache:
+            response = self.client.get(reverse('terms_of_use'))
+        shared_cache.assert_not_called()
+        self.assertEqual([terms['text'] for terms in response.json()], ["Be nice"])
+        self.assertEqual(local_cache.stats()['hits'], hits + 1)
+
+    def test_saving_invalidates_worker_memory(self):
+        terms = TermsOfUse.objects.create(text="Be nice")
+        self.client.get(reverse('terms_of_use'))
+        terms.text = "Be kind"
+        with self.captureOnCommitCallbacks(execute=True):
+            terms.save()
+        response = self.client.get(reverse('terms_of_use'))
+        self.assertEqual([terms['text'] for terms in response.json()], ["Be kind"])
+
+
+class LocalCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocalCache(max_size=2, timeout=60, channel='test')
+        self.cache.listener_pid = os.getpid()
+
+    def test_evicts_least_recently_used(self):
+        self.cache.get_or_build('sport', 'a', lambda: 1)
+        self.cache.get_or_build('sport', 'b', lambda: 2)
+        self.cache.get('sport', 'a')
+        self.cache.get_or_build('sport', 'c', lambda: 3)
+        self.assertIsNone(self.cache.get('sport', 'b'))
+        self.assertEqual(self.cache.get('sport', 'a'), 1)
+
+    def test_entries_expire(self):
+        self.cache.get_or_build('sport', 'a', lambda: 1)
+        with mock.patch('core.shared.cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(self.cache.get('sport', 'a'))
+
+    def test_invalidation_racing_a_build_is_not_overwritten(self):
+        def build():
+            self.cache.invalidate('sport')
+            return 'stale'
+        self.assertEqual(self.cache.get_or_build('sport', 'a', build), 'stale')
+        self.assertIsNone(self.cache.get('sport', 'a'))
+        self.assertEqual(self.cache.stats()['size'], 0)
@@ -0,0 +1,46 @@
+from unittest import mock
+from django.test import override_settings
+from django.urls import reverse
+from rave_python import RaveExceptions
+from rest_framework.test import APITestCase
+
+from core.tests.view_test_mixins import create_useraccount
+from core.models.transaction import Transaction
+from core.views.payment import FlutterwavePaymentAPIView
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }})
+class FlutterwavePayoutViewTest(APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.useraccount = create_useraccount("payout_user", balance=10000)
+        self.client.force_authenticate(user=self.useraccount.user)
+        initiate = mock.patch.object(FlutterwavePaymentAPIView.rave.Transfer, "initiate")
+        self.initiate = initiate.start()
+        self.addCleanup(initiate.stop)
+
+    def payout(self, amount):
+        return self.client.post(reverse('initialize_payout'), {
+            "account_bank": "044", "account_number": "0690000031", "amount": amount,
+        }, format='json')
+
+    def test_payout_debits_balance_before_transfer(self):
+        self.initiate.return_value = {"error": False, "id": 1, "data": {}}
+        self.assertEqual(self.payout(60).status_code, 200)
+        withdrawal = Transaction.objects.get(type=Transaction.WITHDRAWAL)
+        self.assertEqual(withdrawal.status, Transaction.PENDING)
+        self.assertEqual(self.initiate.call_args.args[0]["reference"], withdrawal.reference)
+        self.useraccount.wallet.refresh_from_db()
+        self.assertEqual(self.useraccount.wallet.balance, 4000)
+
+        # The same balance cannot pay out twice.
+        self.assertEqual(self.payout(60).status_code, 403)
+        self.assertEqual(self.initiate.call_count, 1)
+
+    def test_refused_payout_is_refunded(self):
+        self.initiate.side_effect = RaveExceptions.InitiateTransferError({"error": True, "data": {}})
+        self.assertEqual(self.payout(60).status_code, 400)
+        self.assertEqual(Transaction.objects.get(type=Transaction.WITHDRAWAL).status, Transaction.FAILED)
+        self.useraccount.wallet.refresh_from_db()
+        self.assertEqual(self.useraccount.wallet.balance, 10000)
@@ -10,9 +10,10 @@ from django.urls import reverse
 # from mock import patch
 # from django_fakeredis import FakeRedis, fakeredis
 
-from core.tests.view_test_mixins import get_mock_request
+from core.tests.view_test_mixins import get_mock_request, create_useraccount, QueryCountMixin
 from core.views.user import UserAPIView
 from core.models.user import UserAccount
+from core.models.subscription import Subscription
 
 
 @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }})
@@ -195,3 +196,49 @@ class UserPricingAPIViewTest(APITestCase):
         response = self.client.post(url, data, format=self.test_format)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
         self.assertEqual(response['content-type'], 'application/json')
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }})
+class UserSubscribersAPIViewTest(QueryCountMixin, APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.capper = create_useraccount("popular_capper")
+        self.subscribe(0, Subscription.FREE)
+
+    def subscribe(self, index, subscription_type):
+        Subscription.objects.create(
+            type=subscription_type,
+            issuer=self.capper,
+            subscriber=create_useraccount(f"follower_{index}"),
+        )
+
+    def test_pages_through_subscribers(self):
+        for index in range(1, 5):
+            self.subscribe(index, Subscription.PREMIUM)
+        url = reverse('users-subscribers', kwargs={'username': self.capper.user.username}) + '?page_size=2'
+        usernames = []
+        while url:
+            response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            usernames += [row['subscriber']['username'] for row in response.json()['results']]
+            url = response.json()['next']
+        self.assertEqual(sorted(usernames), [f"follower_{index}" for index in range(5)])
+
+    def test_filters_by_type(self):
+        self.subscribe(1, Subscription.PREMIUM)
+        url = reverse('users-subscribers', kwargs={'username': self.capper.user.username})
+        response = self.client.get(url, {'type': Subscription.PREMIUM}, format='json')
+        self.assertEqual([row['subscriber']['username'] for row in response.json()['results']], ["follower_1"])
+
+    def test_nested_card_has_counts_not_lists(self):
+        url = reverse('users-subscribers', kwargs={'username': self.capper.user.username})
+        card = self.client.get(url, format='json').json()['results'][0]['subscriber']
+        self.assertEqual(
+            sorted(card),
+            ['display_name', 'free_subscriber_count', 'id', 'image', 'is_punter', 'premium_subscriber_count', 'username'],
+        )
+
+    def test_query_count(self):
+        url = reverse('users-subscribers', kwargs={'username': self.capper.user.username})
+        self.assertConstantQueries(url, lambda: [self.subscribe(index, Subscription.FREE) for index in range(1, 4)])
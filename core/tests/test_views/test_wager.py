@@ -0,0 +1,405 @@
+import pytz
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+from core.shared.cache import local_cache
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APITestCase
+from django.urls import reverse
+
+from core.tests.view_test_mixins import create_useraccount, QueryCountMixin
+from core.exceptions import InsuficientFundError
+from core.models.games import Sport, SportsGame, Competition, Team, Market
+from core.models.transaction import Transaction
+from core.models.user import Wallet
+from core.models.ledger import LedgerEntry
+from core.models.wager import SportsWager, SportsWagerChallenge, WagerFill
+from core.shared.fixtures import reconcile_counters
+from core.shared.orderbook import MatchingEngine
+
+
+def create_wager(backer, game, stake=100, **kwargs):
+    transaction = Transaction.objects.create(
+        type=Transaction.WAGER,
+        amount=stake,
+        status=Transaction.PENDING,
+        user=backer,
+        currency=backer.wallet.currency,
+    )
+    return SportsWager.objects.create(
+        backer=backer,
+        game=game,
+        market="Home win",
+        backer_option=True,
+        stake=stake,
+        transaction=transaction,
+        **kwargs
+    )
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }})
+class SportsWagerQueryCountTest(QueryCountMixin, APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.useraccount = create_useraccount("wager_user")
+        self.opponent = create_useraccount("wager_opponent")
+        self.client.force_authenticate(user=self.useraccount.user)
+        self.game = SportsGame.objects.create(
+            type=Sport.objects.create(name="Soccer"),
+            competition="Premier League",
+            home="Arsenal",
+            away="Chelsea",
+            match_day=datetime.utcnow().replace(tzinfo=pytz.UTC) + timedelta(days=1),
+        )
+
+    def add_wagers(self, count):
+        for _ in range(count):
+            create_wager(self.useraccount, self.game, layer=self.opponent, winner=self.opponent)
+            create_wager(self.opponent, self.game)
+
+    def test_wagers(self):
+        self.add_wagers(1)
+        self.assertConstantQueries(reverse('wagers'), lambda: self.add_wagers(3))
+
+    def test_game_wagers(self):
+        self.add_wagers(1)
+        self.assertConstantQueries(reverse('game-wagers', args=[self.game.id]), lambda: self.add_wagers(3))
+
+    def test_challenges(self):
+        def add_challenges(count):
+            for _ in range(count):
+                wager = create_wager(self.opponent, self.game)
+                SportsWagerChallenge.objects.create(wager=wager, requestor=self.opponent, requestee=self.useraccount)
+        add_challenges(1)
+        self.assertConstantQueries(reverse('wager-challenge'), lambda: add_challenges(3))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ReferenceDataCacheTest(APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.client.force_authenticate(user=create_useraccount("reference_user").user)
+        self.soccer = Sport.objects.create(name="Soccer")
+        self.tennis = Sport.objects.create(name="Tennis")
+        Market.objects.create(name="Draw", sport=self.soccer)
+        Market.objects.create(name="Set winner", sport=self.tennis)
+
+    def get_markets(self, sport):
+        response = self.client.get(reverse('markets') + f'?sport={sport}', format='json')
+        self.assertEqual(response.status_code, 200)
+        return [market['name'] for market in response.json()]
+
+    def test_keys_follow_filter_params(self):
+        self.assertEqual(self.get_markets("Soccer"), ["Draw"])
+        self.assertEqual(self.get_markets("Tennis"), ["Set winner"])
+
+    def test_cached_hit_skips_database(self):
+        self.get_markets("Soccer")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_markets("Soccer"), ["Draw"])
+
+    def test_save_and_delete_invalidate(self):
+        self.get_markets("Soccer")
+        with self.captureOnCommitCallbacks(execute=True):
+            market = Market.objects.create(name="Home win", sport=self.soccer)
+        self.assertEqual(self.get_markets("Soccer"), ["Draw", "Home win"])
+        with self.captureOnCommitCallbacks(execute=True):
+            market.delete()
+        self.assertEqual(self.get_markets("Soccer"), ["Draw"])
+
+    def test_team_competition_changes_invalidate(self):
+        league = Competition.objects.create(name="La Liga", sport=self.soccer)
+        team = Team.objects.create(name="Levante")
+        url = reverse('teams') + '?competition=La Liga'
+        self.assertEqual(self.client.get(url, format='json').json(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            team.competition.add(league)
+        self.assertEqual([team['name'] for team in self.client.get(url, format='json').json()], ["Levante"])
+
+    def test_etag_not_modified(self):
+        response = self.client.get(reverse('sports'), format='json')
+        etag = response['ETag']
+        response = self.client.get(reverse('sports'), format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Sport.objects.create(name="Basketball")
+        response = self.client.get(reverse('sports'), format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_invalidation_waits_for_commit(self):
+        self.get_markets("Soccer")
+        with self.captureOnCommitCallbacks(execute=True):
+            Market.objects.create(name="Home win", sport=self.soccer)
+            # A reader inside the transaction still gets the cached payload.
+            self.assertEqual(self.get_markets("Soccer"), ["Draw"])
+        self.assertEqual(self.get_markets("Soccer"), ["Draw", "Home win"])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }})
+class WagerOrderBookTest(APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.backer = create_useraccount("order_backer", balance=100000)
+        self.layer = create_useraccount("order_layer", balance=100000)
+        Sport.objects.create(name="Soccer")
+        self.match_day = (datetime.utcnow().replace(tzinfo=pytz.UTC) + timedelta(days=1)).isoformat()
+
+    def place(self, useraccount, option, stake):
+        self.client.force_authenticate(user=useraccount.user)
+        response = self.client.post(reverse('wager-orders'), {
+            "backer": useraccount.id,
+            "backer_option": option,
+            "stake": stake,
+            "market": "Home win",
+            "game": {
+                "type": "Soccer",
+                "competition": "Premier League",
+                "home": "Arsenal",
+                "away": "Chelsea",
+                "match_day": self.match_day,
+            },
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return SportsWager.objects.get(id=response.json()['data']['id'])
+
+    def test_partial_fills_move_stakes_to_escrow(self):
+        first = self.place(self.backer, True, 300)
+        second = self.place(self.backer, True, 200)
+        taker = self.place(self.layer, False, 400)
+        self.assertEqual(MatchingEngine().run_pending(), 2)
+
+        fills = list(WagerFill.objects.order_by("id").values_list("maker", "taker", "amount"))
+        self.assertEqual(fills, [(first.id, taker.id, 30000), (second.id, taker.id, 10000)])
+        first.refresh_from_db(); second.refresh_from_db(); taker.refresh_from_db()
+        self.assertEqual((first.unmatched_amount, first.matched), (0, True))
+        self.assertEqual((second.unmatched_amount, second.matched), (10000, False))
+        self.assertEqual((taker.unmatched_amount, taker.matched), (0, True))
+
+        self.backer.wallet.refresh_from_db(); self.layer.wallet.refresh_from_db()
+        self.assertEqual((self.backer.wallet.balance, self.backer.wallet.withheld), (50000, 10000))
+        self.assertEqual((self.layer.wallet.balance, self.layer.wallet.withheld), (60000, 0))
+        self.assertEqual(
+            LedgerEntry.objects.filter(account=LedgerEntry.ESCROW).aggregate(total=Sum("amount"))["total"],
+            80000,
+        )
+
+    def test_counters_follow_placement_and_fills(self):
+        self.place(self.backer, True, 300)
+        self.place(self.backer, True, 200)
+        self.place(self.layer, False, 400)
+        MatchingEngine().run_pending()
+        game = SportsGame.objects.get()
+        self.assertEqual((game.wager_count, game.matched_count, game.total_stake), (3, 2, 90000))
+
+    def test_stale_book_is_reloaded_instead_of_overfilling(self):
+        engine = MatchingEngine()
+        resting = self.place(self.backer, True, 300)
+        engine.run_pending()
+        # Matched elsewhere behind the engine's back.
+        SportsWager.objects.filter(id=resting.id).update(unmatched_amount=0)
+        taker = self.place(self.layer, False, 100)
+        self.assertEqual(engine.run_pending(), 0)
+        self.assertFalse(WagerFill.objects.exists())
+        taker.refresh_from_db()
+        self.assertFalse(taker.booked)
+        engine.run_pending()
+        taker.refresh_from_db()
+        self.assertEqual((taker.booked, taker.unmatched_amount), (True, 10000))
+
+    def test_failed_fill_does_not_hold_up_the_queue(self):
+        engine = MatchingEngine()
+        resting = self.place(self.backer, True, 300)
+        engine.run_pending()
+        failing = self.place(self.layer, False, 100)
+        taker = self.place(self.layer, False, 100)
+        with mock.patch("core.shared.ledger.fill_orders", side_effect=[InsuficientFundError(), None]):
+            with self.assertLogs("core.shared.orderbook", "ERROR"):
+                self.assertEqual(engine.run_pending(), 1)
+        self.assertEqual(list(WagerFill.objects.values_list("maker", "taker", "amount")), [(resting.id, taker.id, 10000)])
+        resting.refresh_from_db(); failing.refresh_from_db(); taker.refresh_from_db()
+        self.assertEqual((failing.booked, failing.unmatched_amount), (True, 10000))
+        self.assertEqual((taker.unmatched_amount, resting.unmatched_amount), (0, 20000))
+        self.assertFalse(SportsWager.objects.filter(booked=False).exists())
+
+    def test_orders_of_the_same_backer_never_match(self):
+        own = self.place(self.backer, True, 300)
+        other = self.place(self.layer, True, 100)
+        taker = self.place(self.backer, False, 200)
+        self.assertEqual(MatchingEngine().run_pending(), 1)
+        self.assertEqual(list(WagerFill.objects.values_list("maker", "taker", "amount")), [(other.id, taker.id, 10000)])
+        own.refresh_from_db(); taker.refresh_from_db()
+        self.assertEqual((own.unmatched_amount, taker.unmatched_amount), (30000, 10000))
+        self.assertEqual(SportsGame.objects.get().matched_count, 1)
+
+    def test_nothing_is_matched_after_kickoff(self):
+        engine = MatchingEngine()
+        resting = self.place(self.backer, True, 300)
+        engine.run_pending()
+        taker = self.place(self.layer, False, 300)
+        SportsGame.objects.update(match_day=datetime.utcnow().replace(tzinfo=pytz.UTC) - timedelta(minutes=1))
+        self.assertEqual(engine.run_pending(), 0)
+        self.assertFalse(WagerFill.objects.exists())
+        resting.refresh_from_db(); taker.refresh_from_db()
+        self.assertEqual((taker.booked, taker.unmatched_amount, resting.unmatched_amount), (True, 30000, 30000))
+
+        self.client.force_authenticate(user=self.layer.user)
+        response = self.client.post(reverse('wager-orders'), {
+            "backer": self.layer.id, "backer_option": False, "stake": 100, "market": "Home win",
+            "game": SportsGame.objects.get().id,
+        }, format='json')
+        self.assertContains(response, "Game has already started", status_code=400)
+        self.assertEqual(SportsWager.objects.count(), 2)
+
+    def test_rejects_non_positive_stake(self):
+        self.client.force_authenticate(user=self.backer.user)
+        response = self.client.post(reverse('wager-orders'), {"backer": self.backer.id, "stake": 0}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }})
+class GameCountersTest(APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.backer = create_useraccount("counter_backer", balance=100000)
+        self.layer = create_useraccount("counter_layer", balance=100000)
+        self.sport = Sport.objects.create(name="Soccer")
+        match_day = datetime.utcnow().replace(tzinfo=pytz.UTC) + timedelta(days=1)
+        self.quiet, self.busy = SportsGame.objects.bulk_create([
+            SportsGame(type=self.sport, competition="Premier League", home=home, away="Chelsea", match_day=match_day)
+            for home in ("Fulham", "Arsenal")
+        ])
+
+    def place(self, game, stake):
+        self.client.force_authenticate(user=self.backer.user)
+        response = self.client.post(reverse('wagers'), {
+            "backer": self.backer.id, "backer_option": True, "stake": stake, "market": "Home win", "game": game.id,
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']['id']
+
+    def test_direct_wagers_are_counted_and_ranked(self):
+        self.place(self.quiet, 10)
+        wager = self.place(self.busy, 12.5)
+        self.place(self.busy, 20)
+        self.client.force_authenticate(user=self.layer.user)
+        self.client.post(reverse('match-wager'), {"wager": wager, "layer_option": False}, format='json')
+
+        self.busy.refresh_from_db()
+        self.assertEqual((self.busy.wager_count, self.busy.matched_count, self.busy.total_stake), (2, 1, 3250))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('games') + '?top=true')
+        self.assertNotIn('COUNT(', queries[-1]['sql'])
+        self.assertEqual([game['home'] for game in response.json()['results']], ["Arsenal", "Fulham"])
+        self.assertEqual(response.json()['results'][0]['wager_count'], 2)
+
+    def test_reconciliation_corrects_drift(self):
+        self.place(self.busy, 12.5)
+        create_wager(self.backer, self.quiet, stake=5, matched=True)
+        SportsGame.objects.filter(id=self.busy.id).update(wager_count=7, total_stake=0)
+
+        self.assertEqual(reconcile_counters(batch_size=1), 2)
+        self.assertEqual(reconcile_counters(), 0)
+        counters = dict(
+            (home, rest) for home, *rest in
+            SportsGame.objects.values_list("home", "wager_count", "matched_count", "total_stake", "is_wager_played")
+        )
+        self.assertEqual(counters, {"Arsenal": [1, 0, 1250, True], "Fulham": [1, 1, 500, True]})
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }})
+class SportsGameListingTest(QueryCountMixin, APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.sport = Sport.objects.create(name="Soccer")
+        self.now = datetime.utcnow().replace(tzinfo=pytz.UTC)
+
+    def add_games(self, days, played=True):
+        return SportsGame.objects.bulk_create([
+            SportsGame(
+                type=self.sport, competition="Premier League", home=f"Home {day}", away="Away",
+                match_day=self.now + timedelta(days=day), is_wager_played=played,
+            )
+            for day in days
+        ])
+
+    def homes(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [game['home'] for game in response.json()['results']], response.json()['next']
+
+    def test_open_games_are_paged_by_match_day(self):
+        self.add_games([3, -1, 1, 2])
+        self.add_games([4], played=False)
+        homes, next_page = self.homes(reverse('games') + '?open=true&page_size=2')
+        self.assertEqual(homes, ["Home 1", "Home 2"])
+        self.assertEqual(self.homes(next_page), (["Home 3"], None))
+        self.assertEqual(self.homes(reverse('games') + '?expired=true')[0], ["Home -1"])
+
+    def test_games_are_always_paginated(self):
+        self.add_games(range(1, 26))
+        homes, next_page = self.homes(reverse('games') + '?fixtures=true')
+        self.assertEqual(len(homes), 20)
+        self.assertIsNotNone(next_page)
+
+    def test_query_count(self):
+        self.add_games([1])
+        self.assertConstantQueries(reverse('games') + '?latest=true', lambda: self.add_games([2, 3, 4]))
+
+
+class ConcurrentMatchTest(TransactionTestCase):
+    fixtures = ['currency.json']
+    workers = 16
+
+    def setUp(self):
+        backer = create_useraccount("race_backer")
+        Wallet.objects.filter(id=backer.wallet_id).update(withheld=10000)
+        game = SportsGame.objects.create(
+            type=Sport.objects.create(name="Soccer"),
+            competition="Premier League",
+            home="Arsenal",
+            away="Chelsea",
+            match_day=datetime.utcnow().replace(tzinfo=pytz.UTC) + timedelta(days=1),
+        )
+        self.wager = create_wager(backer, game, stake=100)
+        self.layers = [create_useraccount(f"race_layer_{index}", balance=10000) for index in range(self.workers)]
+
+    def test_exactly_one_layer_wins(self):
+        barrier = threading.Barrier(self.workers)
+
+        def match(layer):
+            client = APIClient()
+            client.force_authenticate(user=layer.user)
+            try:
+                barrier.wait()
+                response = client.post(reverse('match-wager'), {"wager": self.wager.id, "layer_option": False}, format='json')
+                return response.status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            statuses = list(executor.map(match, self.layers))
+
+        self.assertEqual(sorted(statuses), [200] + [409] * (self.workers - 1))
+        self.wager.refresh_from_db()
+        winner = self.layers[statuses.index(200)]
+        self.assertEqual(self.wager.layer_id, winner.id)
+        balances = dict(Wallet.objects.filter(wallet_owner__in=self.layers).values_list("wallet_owner", "balance"))
+        self.assertEqual(sorted(balances.values()), [0] + [10000] * (self.workers - 1))
+        self.assertEqual(balances[winner.id], 0)
+        self.assertEqual(
+            LedgerEntry.objects.filter(account=LedgerEntry.ESCROW).aggregate(total=Sum("amount"))["total"],
+            20000,
+        )
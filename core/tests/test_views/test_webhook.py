@@ -0,0 +1,233 @@
+import hashlib
+import hmac
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.tests.view_test_mixins import create_useraccount
+from core.models.ledger import LedgerEntry
+from core.models.transaction import Transaction
+from core.models.webhook import WebhookEvent
+from core.shared import ledger, webhooks
+
+
+PAYSTACK_IP = "52.31.139.75"
+
+
+def signed(secret, payload, digestmod=hashlib.sha512):
+    body = json.dumps(payload).encode()
+    return body, hmac.new(secret.encode(), body, digestmod).hexdigest()
+
+
+def charge_success(useraccount, reference="ref-1", amount=50000):
+    return {
+        "event": "charge.success",
+        "data": {
+            "reference": reference,
+            "amount": amount,
+            "currency": "NGN",
+            "customer": {"email": useraccount.user.email},
+            "authorization": {"authorization_code": "AUTH_1"},
+        },
+    }
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache" }},
+    PAYSTACK_SECRET_KEY="sk_test_secret",
+    FLUTTERWAVE_WEBHOOK_HASH="flw-hash",
+    WHATSAPP_APP_SECRET="wa-secret",
+)
+class WebhookInboxViewTest(APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.useraccount = create_useraccount("webhook_user")
+
+    def post_paystack(self, payload, signature=None, ip=PAYSTACK_IP):
+        body, expected = signed("sk_test_secret", payload)
+        return self.client.post(
+            reverse('paystack-webhook'), body, content_type='application/json',
+            HTTP_X_PAYSTACK_SIGNATURE=expected if signature is None else signature,
+            HTTP_X_FORWARDED_FOR=f"10.0.0.1, {ip}",
+        )
+
+    def test_paystack_delivery_is_stored_not_applied(self):
+        response = self.post_paystack(charge_success(self.useraccount))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.event, event.reference), ("charge.success", "charge.success:ref-1"))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_redeliveries_are_dropped(self):
+        for _ in range(3):
+            self.post_paystack(charge_success(self.useraccount))
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+
+    def test_flutterwave_and_whatsapp_share_the_inbox(self):
+        self.client.post(
+            reverse('flutterwave-webhook'), {"event": "charge.completed", "data": {"id": 77}}, format='json',
+            HTTP_VERIF_HASH="flw-hash",
+        )
+        body, signature = signed("wa-secret", {"object": "whatsapp_business_account", "entry": [{"id": "1", "changes": []}]}, hashlib.sha256)
+        for _ in range(2):
+            self.client.post(
+                reverse('whatsapp-webhook'), body, content_type='application/json',
+                HTTP_X_HUB_SIGNATURE_256=f"sha256={signature}",
+            )
+        self.assertEqual(
+            sorted(WebhookEvent.objects.values_list("provider", "event")),
+            [(WebhookEvent.FLUTTERWAVE, "charge.completed"), (WebhookEvent.WHATSAPP, "whatsapp_business_account")],
+        )
+
+    def test_forged_paystack_deliveries_are_rejected(self):
+        payload = charge_success(self.useraccount)
+        self.assertEqual(self.post_paystack(payload, signature="0" * 128).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.post_paystack(payload, ip="203.0.113.9").status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post(
+            reverse('paystack-webhook'), payload, format='json', HTTP_X_FORWARDED_FOR=f"{PAYSTACK_IP}, 203.0.113.9",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_signature_covers_raw_body_bytes(self):
+        body, signature = signed("sk_test_secret", charge_success(self.useraccount))
+        reformatted = json.dumps(json.loads(body), indent=2).encode()
+        response = self.client.post(
+            reverse('paystack-webhook'), reformatted, content_type='application/json',
+            HTTP_X_PAYSTACK_SIGNATURE=signature, HTTP_X_FORWARDED_FOR=PAYSTACK_IP,
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_other_providers_require_their_secrets(self):
+        response = self.client.post(reverse('flutterwave-webhook'), {}, format='json', HTTP_VERIF_HASH="wrong")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post(reverse('whatsapp-webhook'), {}, format='json', HTTP_X_HUB_SIGNATURE_256="sha256=00")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        with self.settings(FLUTTERWAVE_WEBHOOK_HASH=None):
+            response = self.client.post(reverse('flutterwave-webhook'), {}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_whatsapp_verification_challenge_is_not_signed(self):
+        with self.settings(WHATSAPP_WEBHOOK_VERIFY_TOKEN="token"):
+            response = self.client.get(reverse('whatsapp-webhook') + '?hub.verify_token=token&hub.challenge=42')
+        self.assertEqual(response.json(), 42)
+
+
+class WebhookProcessingTest(APITestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.useraccount = create_useraccount("webhook_depositor")
+
+    def balance(self):
+        self.useraccount.wallet.refresh_from_db()
+        return self.useraccount.wallet.balance
+
+    def test_deposit_is_applied_once(self):
+        webhooks.receive(WebhookEvent.PAYSTACK, charge_success(self.useraccount))
+        self.assertEqual(webhooks.process_pending(), 1)
+        self.assertEqual(webhooks.process_pending(), 0)
+        self.assertEqual(self.balance(), 50000)
+        self.assertEqual(Transaction.objects.get(type=Transaction.DEPOSIT).amount, 500)
+        self.assertIsNotNone(WebhookEvent.objects.get().processed_time)
+
+    def test_replay_is_idempotent(self):
+        webhooks.receive(WebhookEvent.PAYSTACK, charge_success(self.useraccount))
+        webhooks.process_pending()
+        call_command("replay_webhooks", "--provider", "paystack", stdout=mock.Mock())
+        self.assertEqual(webhooks.process_pending(), 1)
+        self.assertEqual(self.balance(), 50000)
+        self.assertEqual(Transaction.objects.filter(type=Transaction.DEPOSIT).count(), 1)
+
+    def test_failed_event_is_retried_then_parked(self):
+        payload = charge_success(self.useraccount)
+        payload["data"]["customer"]["email"] = "nobody@test.com"
+        webhooks.receive(WebhookEvent.PAYSTACK, payload)
+        with self.settings(WEBHOOK_MAX_ATTEMPTS=2), self.assertLogs("core.shared.queue", "ERROR"):
+            self.assertEqual(webhooks.process_pending(), 1)
+            self.assertEqual(webhooks.process_pending(), 1)
+            self.assertEqual(webhooks.process_pending(), 0)
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.attempts, 2)
+        self.assertIn("DoesNotExist", event.last_error)
+
+    def test_failed_transfer_refunds_withdrawal_once(self):
+        withdrawer = create_useraccount("webhook_withdrawer", balance=10000)
+        wallet = withdrawer.wallet
+        withdrawal = Transaction.objects.create(
+            type=Transaction.WITHDRAWAL, status=Transaction.PENDING, amount=40, reference="wd-1",
+            user=withdrawer, currency=wallet.currency,
+        )
+        ledger.withdraw(wallet.id, 4000, transaction=withdrawal, reference="wd-1")
+        webhooks.receive(WebhookEvent.PAYSTACK, {"event": "transfer.failed", "data": {"reference": "wd-1"}})
+        webhooks.receive(WebhookEvent.PAYSTACK, {"event": "transfer.reversed", "data": {"reference": "wd-1"}})
+        webhooks.process_pending()
+        wallet.refresh_from_db()
+        withdrawal.refresh_from_db()
+        self.assertEqual((wallet.balance, withdrawal.status), (10000, Transaction.FAILED))
+
+    def test_late_success_does_not_revive_refunded_withdrawal(self):
+        withdrawer = create_useraccount("webhook_late", balance=10000)
+        wallet = withdrawer.wallet
+        withdrawal = Transaction.objects.create(
+            type=Transaction.WITHDRAWAL, status=Transaction.PENDING, amount=40, reference="wd-2",
+            user=withdrawer, currency=wallet.currency,
+        )
+        ledger.withdraw(wallet.id, 4000, transaction=withdrawal, reference="wd-2")
+        webhooks.receive(WebhookEvent.PAYSTACK, {"event": "transfer.reversed", "data": {"reference": "wd-2"}})
+        webhooks.receive(WebhookEvent.PAYSTACK, {"event": "transfer.success", "data": {"reference": "wd-2"}})
+        self.assertEqual(webhooks.process_pending(), 2)
+        wallet.refresh_from_db()
+        withdrawal.refresh_from_db()
+        self.assertEqual((wallet.balance, withdrawal.status), (10000, Transaction.FAILED))
+
+    def test_failed_flutterwave_payout_is_refunded(self):
+        withdrawer = create_useraccount("webhook_payout", balance=10000)
+        wallet = withdrawer.wallet
+        withdrawal = Transaction.objects.create(
+            type=Transaction.WITHDRAWAL, status=Transaction.PENDING, amount=40, reference="po-1",
+            user=withdrawer, currency=wallet.currency,
+        )
+        ledger.withdraw(wallet.id, 4000, transaction=withdrawal, reference="po-1")
+        webhooks.receive(WebhookEvent.FLUTTERWAVE, {
+            "event": "transfer.completed", "data": {"id": 7, "reference": "po-1", "status": "FAILED"},
+        })
+        webhooks.process_pending()
+        wallet.refresh_from_db()
+        withdrawal.refresh_from_db()
+        self.assertEqual((wallet.balance, withdrawal.status), (10000, Transaction.FAILED))
+
+
+class WebhookWorkerConcurrencyTest(TransactionTestCase):
+    fixtures = ['currency.json']
+
+    def test_parallel_workers_apply_each_event_once(self):
+        useraccount = create_useraccount("webhook_parallel")
+        for index in range(40):
+            webhooks.receive(WebhookEvent.PAYSTACK, charge_success(useraccount, reference=f"ref-{index}", amount=100))
+
+        def work(_):
+            try:
+                processed = 0
+                while True:
+                    batch = webhooks.process_pending(batch_size=3)
+                    if not batch:
+                        return processed
+                    processed += batch
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            processed = sum(executor.map(work, range(8)))
+
+        useraccount.wallet.refresh_from_db()
+        self.assertEqual(processed, 40)
+        self.assertEqual(useraccount.wallet.balance, 4000)
+        self.assertEqual(LedgerEntry.objects.filter(wallet=useraccount.wallet).count(), 40)
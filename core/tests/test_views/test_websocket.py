@@ -0,0 +1,129 @@
+import pytz
+from datetime import datetime, timedelta
+from unittest import mock
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from predishun.asgi import application
+from core.models.games import Sport, SportsGame
+from core.models.wager import SportsWagerChallenge
+from core.shared import realtime
+from core.shared.helper import sync_records
+from core.shared.notifications import WebSocketChannel
+from core.tests.test_models.test_settlement import create_wager
+from core.tests.view_test_mixins import create_useraccount
+
+
+ORIGIN = (b"origin", b"https://predishun.com")
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class UserUpdatesConsumerTest(TransactionTestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.useraccount = create_useraccount("socket_user")
+        self.token = str(AccessToken.for_user(self.useraccount.user))
+
+    async def connect(self, path="/ws/updates", headers=None):
+        communicator = WebsocketCommunicator(
+            application, path, headers=headers or [ORIGIN, (b"cookie", f"predishun-auth={self.token}".encode())],
+        )
+        connected, code = await communicator.connect()
+        return communicator, connected, code
+
+    async def test_user_events_reach_cookie_authenticated_socket(self):
+        communicator, connected, _ = await self.connect()
+        self.assertTrue(connected)
+        await sync_to_async(realtime.publish)(
+            [realtime.user_group(self.useraccount.id)], "challenge.received", {"wager": 7},
+        )
+        self.assertEqual(await communicator.receive_json_from(), {"type": "challenge.received", "data": {"wager": 7}})
+        await communicator.disconnect()
+
+    async def test_game_subscriptions(self):
+        communicator, connected, _ = await self.connect(f"/ws/updates?token={self.token}", [ORIGIN])
+        self.assertTrue(connected)
+        await communicator.send_json_to({"action": "subscribe", "game": 3})
+        self.assertEqual(await communicator.receive_json_from(), {"type": "subscribed", "data": {"game": 3}})
+        layer = get_channel_layer()
+        await layer.group_send(realtime.game_group(3), {"type": "event.push", "event": "wager.matched", "data": {"game": 3}})
+        self.assertEqual((await communicator.receive_json_from())["type"], "wager.matched")
+
+        await communicator.send_json_to({"action": "unsubscribe", "game": 3})
+        await communicator.receive_json_from()
+        await layer.group_send(realtime.game_group(3), {"type": "event.push", "event": "wager.matched", "data": {}})
+        self.assertTrue(await communicator.receive_nothing())
+
+        await communicator.send_json_to({"action": "subscribe", "game": "3"})
+        self.assertEqual((await communicator.receive_json_from())["type"], "error")
+        await communicator.disconnect()
+
+    async def test_game_subscriptions_are_capped(self):
+        communicator, _, _ = await self.connect()
+        with self.settings(WEBSOCKET_MAX_GAME_SUBSCRIPTIONS=2):
+            for game in (1, 2, 3):
+                await communicator.send_json_to({"action": "subscribe", "game": game})
+            replies = [(await communicator.receive_json_from())["type"] for _ in range(3)]
+        self.assertEqual(replies, ["subscribed", "subscribed", "error"])
+        await communicator.disconnect()
+
+    async def test_unauthenticated_and_cross_origin_sockets_are_refused(self):
+        _, connected, code = await self.connect(headers=[ORIGIN])
+        self.assertEqual((connected, code), (False, 4401))
+        _, connected, _ = await self.connect(f"/ws/updates?token={self.token}x", [ORIGIN])
+        self.assertFalse(connected)
+        _, connected, _ = await self.connect(f"/ws/updates?token={self.token}", [(b"origin", b"https://evil.test")])
+        self.assertFalse(connected)
+
+
+class RealtimeEventTest(TestCase):
+    fixtures = ['currency.json']
+
+    def setUp(self):
+        self.backer = create_useraccount("socket_backer", balance=10000)
+        self.layer = create_useraccount("socket_layer", balance=10000)
+        self.game = SportsGame.objects.create(
+            type=Sport.objects.create(name="Soccer"),
+            competition="Premier League",
+            home="Arsenal",
+            away="Chelsea",
+            match_day=datetime.utcnow().replace(tzinfo=pytz.UTC) + timedelta(days=1),
+        )
+        publish = mock.patch("core.shared.realtime.publish")
+        self.publish = publish.start()
+        self.addCleanup(publish.stop)
+
+    def test_matched_wager_is_pushed_after_commit(self):
+        wager = create_wager(self.backer, self.game, 25)
+        with self.captureOnCommitCallbacks() as callbacks:
+            sync_records(wager, self.layer, layer_option=False)
+            self.publish.assert_not_called()
+        for callback in callbacks:
+            callback()
+        groups, event, data = self.publish.call_args.args
+        self.assertEqual(event, "wager.matched")
+        self.assertCountEqual(groups, [
+            f"game.{self.game.id}", f"user.{self.backer.id}", f"user.{self.layer.id}",
+        ])
+        self.assertEqual(data, {"wagers": [wager.id], "game": self.game.id})
+
+    def test_challenge_is_pushed_to_requestee(self):
+        challenge = SportsWagerChallenge.objects.create(
+            wager=create_wager(self.backer, self.game, 25), requestor=self.backer, requestee=self.layer,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            realtime.challenge_received(challenge)
+        self.publish.assert_called_once_with(
+            [f"user.{self.layer.id}"], "challenge.received",
+            {"challenge": challenge.id, "wager": challenge.wager_id, "requestor": "socket_backer"},
+        )
+
+    def test_new_slips_are_pushed_to_subscribers(self):
+        WebSocketChannel("websocket", rate=100, batch_size=2).deliver([4, 5, 6], {"slip": 1})
+        self.assertEqual(
+            [call.args[0] for call in self.publish.call_args_list], [["user.4", "user.5"], ["user.6"]],
+        )
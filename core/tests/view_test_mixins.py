@@ -1,7 +1,11 @@
 from django.contrib.auth.models import AnonymousUser, User
 from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.request import Request
 from mock import MagicMock
+from core.models.user import UserAccount, Wallet, Pricing
+from core.models.transaction import Currency
 
 
 def get_mock_request(user):
@@ -12,4 +16,34 @@ def get_mock_request(user):
         encoding='utf-8'
     )
 
-mock_request = get_mock_request(AnonymousUser())
\ No newline at end of file
+mock_request = get_mock_request(AnonymousUser())
+
+
+def create_useraccount(username, balance=0, currency="NGN", country="NG"):
+    currency = Currency.objects.get_or_create(code=currency, country=country)[0]
+    user = User.objects.create(username=username, email=f'{username}@test.com')
+    wallet = Wallet.objects.create(currency=currency, balance=balance)
+    pricing = Pricing.objects.create()
+    return UserAccount.objects.create(
+        user=user,
+        wallet=wallet,
+        pricing=pricing,
+        display_name=username,
+        country=country,
+    )
+
+
+class QueryCountMixin:
+    def assertConstantQueries(self, url, add_rows):
+        """
+        Request `url`, add more rows with `add_rows` and request it again;
+        both requests must run the same number of queries.
+        """
+        with CaptureQueriesContext(connection) as before:
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, 200)
+        add_rows()
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(before), len(after), [query['sql'] for query in after.captured_queries])
@@ -1,9 +1,10 @@
 from django.urls import path
-from core.views.misc import FeedbackAPIView, WaitlistAPIView, TermsOfUseAPIView, PrivacyPolicyAPIView
+from core.views.misc import FeedbackAPIView, WaitlistAPIView, TermsOfUseAPIView, PrivacyPolicyAPIView, CacheStatsAPIView
 
 urlpatterns = [
     path('feedback', FeedbackAPIView.as_view(), name='feedback'),
     path('waitlist', WaitlistAPIView.as_view(), name='waitlist'),
     path('docs/terms', TermsOfUseAPIView.as_view(), name='terms_of_use'),
     path('docs/privacy-policy', PrivacyPolicyAPIView.as_view(), name='privacy_policy'),
+    path('cache-stats', CacheStatsAPIView.as_view(), name='cache-stats'),
 ]
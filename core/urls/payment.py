@@ -1,7 +1,7 @@
 from django.urls import path
 from core.views.user import UserAPIView, UserAccountOwnerAPIView
 from core.views.payment import (
-    PaymentTransactionAPIView, PaystackPaymentAPIView, FlutterwavePaymentAPIView
+    PaymentTransactionAPIView, TransactionExportAPIView, PaystackPaymentAPIView, FlutterwavePaymentAPIView
 )
 
 list_banks = FlutterwavePaymentAPIView.as_view({
@@ -34,6 +34,7 @@ initialize_payment = FlutterwavePaymentAPIView.as_view({
 
 urlpatterns = [
     path('transactions', PaymentTransactionAPIView.as_view(), name='transactions'),
+    path('transactions/export', TransactionExportAPIView.as_view(), name='transactions-export'),
     path('paystack/bank/list', PaystackPaymentAPIView.as_view({"get": "list_banks"}), name='list-bank'),
     path('paystack/bank/resolve', PaystackPaymentAPIView.as_view({"post": "resolve_bank_details"}), name='resolve-bank-details'),
     path('paystack/deposit/initialize', PaystackPaymentAPIView.as_view({"post": "initialize_deposit"}), name='initialize-deposit'),
@@ -10,9 +10,14 @@ get_user = UserAPIView.as_view({
     'get': 'get_user',
 })
 
+get_subscribers = UserAPIView.as_view({
+    'get': 'get_subscribers',
+})
+
 urlpatterns = [
     path('account', account_owner, name='account-owner'),
     path('pricing', UserPricingAPIView.as_view(), name='user-pricing'),
     path('payment', UserPaymentDetailsAPIView.as_view(), name='user-payment'),
+    path('<username>/subscribers', get_subscribers, name='users-subscribers'),
     path('<username>', get_user, name='users-action'),
 ]
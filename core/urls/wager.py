@@ -13,14 +13,28 @@ game_wagers = SportsWagerAPIView.as_view({
     'get': 'get_game_wagers'
 })
 
+place_order = SportsWagerAPIView.as_view({
+    'post': 'place_order'
+})
+
 match_wager = SportsWagerAPIView.as_view({
     'post': 'match_wager'
 })
 
+sports = SportAPIView.as_view({'get': 'list'})
+teams = TeamAPIView.as_view({'get': 'list'})
+competitions = CompetitionAPIView.as_view({'get': 'list'})
+markets = MarketAPIView.as_view({'get': 'list'})
+
 urlpatterns = [
     path('list', wagers, name='wagers'),
     path('challenges', SportsWagerChallengeAPIView.as_view(), name='wager-challenge'),
     path('games', P2PSportsGameAPIView.as_view(), name='games'),
     path('match', match_wager, name='match-wager'),
+    path('orders', place_order, name='wager-orders'),
     path('game/<pk>/list', game_wagers, name='game-wagers'),
+    path('sports', sports, name='sports'),
+    path('teams', teams, name='teams'),
+    path('competitions', competitions, name='competitions'),
+    path('markets', markets, name='markets'),
 ]
@@ -6,26 +6,38 @@ from django.core.cache.backends.base import DEFAULT_TIMEOUT
 from rest_framework.decorators import permission_classes
 from rest_framework import permissions
 from rest_framework.views import APIView
+from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 from core.models.misc import TermsOfUse, PrivacyPolicy, Feedback, Waitlist
 from core.serializers import TermsOfUseSerializer, PrivacyPolicySerializer, WaitlistSerializer, FeedbackSerializer
+from core.shared.cache import local_cache
+from core.views.mixins import CachedListMixin
 
-@method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'), name='get')
 @permission_classes((permissions.AllowAny,))
-class TermsOfUseAPIView(APIView):
+class TermsOfUseAPIView(CachedListMixin, GenericAPIView):
+    queryset = TermsOfUse.objects.all()
+    serializer_class = TermsOfUseSerializer
+    cache_namespace = 'terms_of_use'
+
     def get(self, request):
-        terms_of_use = TermsOfUse.objects.all()
-        serializer = TermsOfUseSerializer(terms_of_use, many=True)
-        return Response(serializer.data)
+        return self.list(request)
 
 
-@method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'), name='get')
 @permission_classes((permissions.AllowAny,))
-class PrivacyPolicyAPIView(APIView):
+class PrivacyPolicyAPIView(CachedListMixin, GenericAPIView):
+    queryset = PrivacyPolicy.objects.all()
+    serializer_class = PrivacyPolicySerializer
+    cache_namespace = 'privacy_policy'
+
     def get(self, request):
-        privacy_policy = PrivacyPolicy.objects.all()
-        serializer = PrivacyPolicySerializer(privacy_policy, many=True)
-        return Response(serializer.data)
+        return self.list(request)
+
+
+@permission_classes((permissions.IsAdminUser,))
+class CacheStatsAPIView(APIView):
+    """Hit/miss counters of this worker's local cache."""
+    def get(self, request):
+        return Response(local_cache.stats())
 
 
 @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='POST'), name='post')
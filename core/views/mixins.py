@@ -0,0 +1,51 @@
+from django.conf import settings
+from django_ratelimit.decorators import ratelimit
+from django.utils.decorators import method_decorator
+from django.utils.http import urlencode
+from rest_framework import status
+from rest_framework.response import Response
+from core.shared import webhooks
+from core.shared.cache import get_or_build, versioned_key, get_etag, local_cache
+
+
+class CachedListMixin:
+    """
+    Serve `list` from the cache as a serialized payload keyed by the
+    `cache_params` present in the query string and by the version of
+    `cache_namespace`, which signal handlers bump whenever the underlying
+    models change. Responses carry an ETag and honour If-None-Match.
+    Each worker also keeps payloads in `local_cache`, so hot lists skip
+    the shared cache round-trip entirely.
+    """
+    cache_namespace = None
+    cache_params = ()
+
+    def get_cache_params(self, request):
+        return {name: request.query_params[name] for name in self.cache_params if name in request.query_params}
+
+    def build_payload(self):
+        data = self.get_serializer(self.get_queryset(), many=True).data
+        return {'data': data, 'etag': get_etag(data)}
+
+    @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
+    def list(self, request, *args, **kwargs):
+        params = self.get_cache_params(request)
+        payload = local_cache.get_or_build(
+            self.cache_namespace,
+            urlencode(sorted(params.items())),
+            lambda: get_or_build(versioned_key(self.cache_namespace, params), self.build_payload),
+        )
+        headers = {'ETag': payload['etag']}
+        if request.headers.get('If-None-Match') == payload['etag']:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(payload['data'], headers=headers)
+
+
+class WebhookInboxMixin:
+    """Store the delivery in the webhook inbox and acknowledge it; the webhook worker handles it."""
+    provider = None
+
+    @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='POST'))
+    def post(self, request):
+        webhooks.receive(self.provider, request.data)
+        return Response(status=status.HTTP_200_OK)
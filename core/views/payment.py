@@ -1,5 +1,7 @@
-import requests
 from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.db import transaction as db_transaction
 from django_ratelimit.decorators import ratelimit
 from django.utils.decorators import method_decorator
 from rest_framework.decorators import permission_classes
@@ -8,23 +10,24 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import viewsets
 from rest_framework.views import APIView
-from paystackapi.transaction import Transaction as PaystackTransaction
-from paystackapi.verification import Verification
-from paystackapi.misc import Misc as PaystackMisc
-from paystackapi.trecipient import TransferRecipient
-from paystackapi.transfer import Transfer
 from rave_python import Rave, RaveExceptions, Misc
 from core.permissions import IsOwnerOrReadOnly
 from core.models.user import UserAccount
 from core.models.transaction import Transaction
 from core.serializers import TransactionSerializer
-from core.exceptions import InsuficientFundError, NotFoundError
+from core.exceptions import BadRequestError, InsuficientFundError, NotFoundError, ProviderUnavailableError
+from core.filters import TransactionFilterSet
+from core.pagination import TransactionPagination
+from core.shared import banks, export, ledger
+from core.shared.http import paystack, flutterwave
 from core.shared.model_utils import generate_reference_code
 
 
 @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'), name='get')
 @permission_classes((permissions.IsAuthenticated, IsOwnerOrReadOnly))
 class PaymentTransactionAPIView(APIView):
+    pagination_class = TransactionPagination
+
     def get_object(self, pk):
         try:
             return UserAccount.objects.get(pk=pk, user__is_active=True)
@@ -34,27 +37,76 @@ class PaymentTransactionAPIView(APIView):
     def get(self, request):
         self.check_object_permissions(request, request.user.useraccount.id)
         useraccount = request.user.useraccount
-        transactions = useraccount.user_transactions.all()
+        transactions = TransactionSerializer.setup_eager_loading(filter_transactions(request, useraccount))
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(transactions, request, view=self)
+        if page is not None:
+            serializer = TransactionSerializer(instance=page, many=True)
+            return paginator.get_paginated_response(serializer.data)
         serializer = TransactionSerializer(instance=transactions, many=True)
         return Response(serializer.data)
 
 
+def filter_transactions(request, useraccount):
+    filterset = TransactionFilterSet(data=request.query_params, queryset=Transaction.objects.filter(user=useraccount))
+    if not filterset.is_valid():
+        raise BadRequestError(detail=filterset.errors)
+    return filterset.qs
+
+
+@method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'), name='get')
+@permission_classes((permissions.IsAuthenticated,))
+class TransactionExportAPIView(APIView):
+    """
+    Stream the user's whole transaction history as NDJSON (default) or CSV
+    (`?output=csv`), newest first, optionally limited with `time__gte` and
+    `time__lt`. Rows are read through a server-side cursor in chunks of
+    `chunk_size` and written as they arrive, so memory stays flat however
+    long the history is; every column comes from the
+    `transaction_export_idx` covering index.
+    """
+    fields = ('id', 'time', 'type', 'status', 'amount', 'currency', 'reference')
+    chunk_size = 2000
+    renderers = {
+        'ndjson': (export.iter_ndjson, 'application/x-ndjson'),
+        'csv': (export.iter_csv, 'text/csv'),
+    }
+
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in self.renderers:
+            raise BadRequestError(detail="Invalid output format")
+        render, content_type = self.renderers[output]
+        transactions = filter_transactions(request, request.user.useraccount)
+        rows = transactions.order_by('-time', '-id').values_list(*self.fields).iterator(chunk_size=self.chunk_size)
+        response = StreamingHttpResponse(render(self.fields, self.label_rows(rows)), content_type=content_type)
+        filename = f'transactions-{timezone.now():%Y%m%d}.{output}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def label_rows(self, rows):
+        types = dict(Transaction.TRANSACTION_TYPE)
+        statuses = dict(Transaction.TRANSACTION_STATUS)
+        for pk, time, kind, status, amount, currency, reference in rows:
+            yield pk, time.isoformat(), types[kind], statuses[status], amount, currency, reference
+
+
 @permission_classes((permissions.IsAuthenticated,))
 class PaystackPaymentAPIView(viewsets.ModelViewSet):
     #TODO: Handle all errors from payment processor
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='POST'))
     def initialize_deposit(self, request):
         if request.data.get("authorization_code"):
-            response = PaystackTransaction.charge(
-                amount=int(request.data.get("amount")) * 100,
-                email=request.user.email,
-                authorization_code=request.data.get("authorization_code")
-            )
+            response = paystack.post("transaction/charge_authorization", json={
+                "amount": int(request.data.get("amount")) * 100,
+                "email": request.user.email,
+                "authorization_code": request.data.get("authorization_code"),
+            })
             return Response(response)
-        response = PaystackTransaction.initialize(
-            amount=int(request.data.get("amount")) * 100,
-            email=request.user.email
-        )
+        response = paystack.post("transaction/initialize", json={
+            "amount": int(request.data.get("amount")) * 100,
+            "email": request.user.email,
+        })
         return Response(response)
 
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='POST'))
@@ -62,42 +114,54 @@ class PaystackPaymentAPIView(viewsets.ModelViewSet):
         user = request.user.useraccount
         userwallet = user.wallet
         amount = request.data.get("amount")
-        if userwallet.balance < int(amount):
+        if userwallet.balance < ledger.to_minor_units(amount):
             raise InsuficientFundError(detail="You don't have sufficient fund to withdraw")
         type = "nuban" if user.country.name == "Nigeria" else "mobile_money"
         name = request.data.get("name")
-        tr_response = TransferRecipient.create(
-            type=type,
-            name=name,
-            account_number=request.data.get("account_number"),
-            bank_code=request.data.get("bank_code"),
-            currency=userwallet.currency.code,
-        )
+        tr_response = paystack.post("transferrecipient", json={
+            "type": type,
+            "name": name,
+            "account_number": request.data.get("account_number"),
+            "bank_code": request.data.get("bank_code"),
+            "currency": userwallet.currency.code,
+        })
 
         if tr_response.get("status") == True:
             recipient_code = tr_response.get("data")["recipient_code"]
-            userwallet.recipent_code = recipient_code
+            userwallet.receipent_code = recipient_code
             reference = generate_reference_code()
-            userwallet.save()
-            response = Transfer.initiate(
-                source="balance",
-                recipient=recipient_code,
-                amount=amount,
-                reason="Predishun Withdrawal",
-                reference=reference
-            )
-            if response.get("status") == True:
-                userwallet.balance = userwallet.balance - int(amount)
-                userwallet.save()
-                Transaction.objects.create(
+            userwallet.save(update_fields=["receipent_code"])
+            # Debit before initiating the transfer so concurrent withdrawals
+            # cannot both spend the same balance; refund if it is refused.
+            with db_transaction.atomic():
+                transaction = Transaction.objects.create(
                     type=Transaction.WITHDRAWAL,
                     status=Transaction.PENDING,
                     amount=amount,
                     currency=userwallet.currency,
                     reference=reference,
-                    balance=userwallet.balance,
                     user=user
                 )
+                ledger.withdraw(userwallet.id, ledger.to_minor_units(amount), transaction=transaction, reference=reference)
+            try:
+                response = paystack.post("transfer", json={
+                    "source": "balance",
+                    "recipient": recipient_code,
+                    "amount": amount,
+                    "reason": "Predishun Withdrawal",
+                    "reference": reference,
+                })
+            except ProviderUnavailableError as error:
+                # The transfer may still have gone out: leave the withdrawal
+                # pending for the transfer webhook instead of refunding.
+                if error.sent:
+                    raise
+                response = {"status": False}
+            if response.get("status") != True:
+                with db_transaction.atomic():
+                    ledger.deposit(userwallet.id, ledger.to_minor_units(amount), transaction=transaction, reference=reference)
+                    Transaction.objects.filter(id=transaction.id).update(status=Transaction.FAILED)
+            else:
                 splited_name = name.split(' ')
                 if len(splited_name) > 1:
                     first_name = splited_name[0]
@@ -114,14 +178,19 @@ class PaystackPaymentAPIView(viewsets.ModelViewSet):
 
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
     def list_banks(self, request):
-        response = PaystackMisc.list_banks(country=request.user.useraccount.country.name)
+        country = request.user.useraccount.country.name
+        response = banks.list_banks("paystack", country, lambda: paystack.get("bank", params={"country": country}))
         return Response(response)
 
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='POST'))
     def resolve_bank_details(self, request):
-        response = Verification.verify_account(
-            account_number=request.data.get("account_number"),
-            bank_code=request.data.get("bank_code")
+        params = {
+            "account_number": request.data.get("account_number"),
+            "bank_code": request.data.get("bank_code"),
+        }
+        response = banks.resolve_account(
+            "paystack", params["bank_code"], params["account_number"],
+            lambda: paystack.get("bank/resolve", params=params),
         )
         return Response(response)
 
@@ -132,26 +201,25 @@ class FlutterwavePaymentAPIView(viewsets.ModelViewSet):
 
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
     def list_banks(self, request):
-        headers = {'Authorization': settings.RAVE_SECRET_KEY}
-        url = f'https://api.flutterwave.com/v3/banks/{request.user.useraccount.country.code}'
-        response = requests.get(url, headers=headers)
+        country = request.user.useraccount.country.code
+        response = banks.list_banks("flutterwave", country, lambda: flutterwave.get(f'banks/{country}'))
         return Response(response)
 
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='POST'))
     def resolve_bank_account(self, request):
-        headers = {'Authorization': settings.RAVE_SECRET_KEY}
         data = {
             "account_number": request.data.get("account_number"),
             "account_bank": request.data.get("bank_code")
         }
-        url = 'https://api.flutterwave.com/v3/accounts/resolve'
-        response = requests.get(url, headers=headers, json=data)
+        response = banks.resolve_account(
+            "flutterwave", data["account_bank"], data["account_number"],
+            lambda: flutterwave.post('accounts/resolve', json=data),
+        )
         return Response(response)
 
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='POST'))
     def initialize_payment(self, request):
         useraccount = request.user.useraccount
-        headers = {'Authorization': settings.RAVE_SECRET_KEY}
         url = 'https://api.ravepay.co/flwv3-pug/getpaidx/api/v2/hosted/pay'
         payload = {
             "amount": str(request.data.get('amount')),
@@ -165,8 +233,7 @@ class FlutterwavePaymentAPIView(viewsets.ModelViewSet):
             "custom_title": "Predishun Systems Ltd.",
             "custom_logo": "https://predishun.com/_ipx/static/icons/icon.png",
         }
-        res = requests.post(url, data=payload, headers=headers)
-        json = res.json()
+        json = flutterwave.post(url, data=payload)
         if json.get("status") != "success":
             return Response({"detail": "Error initiating payment"}, status=status.HTTP_403_FORBIDDEN)
         return Response({"message": "Payment initiated", "data": json.get("data")})
@@ -221,8 +288,21 @@ class FlutterwavePaymentAPIView(viewsets.ModelViewSet):
         user = request.user.useraccount
         userwallet = user.wallet
         amount = request.data.get("amount")
-        if userwallet.balance < int(amount):
+        if userwallet.balance < ledger.to_minor_units(amount):
             raise InsuficientFundError(detail="You don't have sufficient fund to withdraw")
+        reference = generate_reference_code()
+        # Debit before initiating the transfer so concurrent payouts cannot
+        # both spend the same balance; refund if it is refused.
+        with db_transaction.atomic():
+            transaction = Transaction.objects.create(
+                type=Transaction.WITHDRAWAL,
+                status=Transaction.PENDING,
+                amount=amount,
+                currency=userwallet.currency,
+                reference=reference,
+                user=user
+            )
+            ledger.withdraw(userwallet.id, ledger.to_minor_units(amount), transaction=transaction, reference=reference)
         try:
             res = self.rave.Transfer.initiate({
                 "account_bank": request.data.get("account_bank"),
@@ -230,8 +310,17 @@ class FlutterwavePaymentAPIView(viewsets.ModelViewSet):
                 "amount": amount,
                 "narration": "Predishun Systems Ltd. Payout",
                 "currency": userwallet.currency.code,
-                "beneficiary_name": request.user.useraccount.full_name
+                "beneficiary_name": request.user.useraccount.full_name,
+                "reference": reference,
             })
             return Response(res)
         except RaveExceptions.IncompletePaymentDetailsError as e:
-            return Response({"detail": e})
+            detail = str(e)
+        except RaveExceptions.InitiateTransferError as e:
+            detail = e.err
+        # Refused before anything was sent; a transfer that may have gone out
+        # stays pending for the transfer webhook.
+        with db_transaction.atomic():
+            ledger.deposit(userwallet.id, ledger.to_minor_units(amount), transaction=transaction, reference=reference)
+            Transaction.objects.filter(id=transaction.id).update(status=Transaction.FAILED)
+        return Response({"detail": detail}, status=status.HTTP_400_BAD_REQUEST)
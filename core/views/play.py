@@ -1,8 +1,9 @@
 import pytz
 from datetime import datetime, timedelta
 from django.conf import settings
+from django.db import transaction as db_transaction
 from django.db.models import Q
-from django.core.cache import cache
+from django.utils.http import urlencode
 from django_ratelimit.decorators import ratelimit
 from django.utils.decorators import method_decorator
 from rest_framework.decorators import permission_classes
@@ -13,15 +14,19 @@ from rest_framework.response import Response
 from rave_python import Rave, RaveExceptions, Misc
 from core.permissions import IsOwnerOrReadOnly
 from core.serializers import (
-    PlaySerializer, UserAccountSerializer, SubscriptionSerializer, PlaySlipSerializer
+    CapperSerializer, SubscriptionSerializer, PlaySlipSerializer, NewPlaySlipSerializer
 )
 from core.models.user import UserAccount
 from core.models.transaction import Transaction
-from core.models.play import Play, PlaySlip, Match
+from core.models.play import Play, PlaySlip
+from core.models.games import SportsGame
 from core.models.subscription import Subscription
 from core.filters import PlayFilterSet, UserAccountFilterSet, SubscriptionFilterSet
+from core.pagination import PlaySlipPagination, CapperPagination
 from core.exceptions import SubscriptionError, ForbiddenError, NotFoundError
-from core.shared.helper import sync_subscriptions, notify_subscribers
+from core.shared import ledger, notifications
+from core.shared.helper import get_subscriber_feed
+from core.shared.cache import get_or_build
 
 
 class CsrfExemptSessionAuthentication(authentication.SessionAuthentication):
@@ -44,8 +49,8 @@ class SubscriptionView(ModelViewSet):
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
     def subscriptions(self, request):
         useraccount = self.request.user.useraccount
-        sync_subscriptions(subscriber=useraccount.id)
-        subscriptions = Subscription.objects.filter(subscriber=useraccount.id, is_active=True).order_by("-subscription_date")
+        subscriptions = Subscription.objects.active().filter(subscriber=useraccount.id).order_by("-subscription_date")
+        subscriptions = self.serializer_class.setup_eager_loading(subscriptions)
         subscriptions_serializer = self.serializer_class(subscriptions, many=True)
         data = subscriptions_serializer.data
         return Response(data)
@@ -53,8 +58,8 @@ class SubscriptionView(ModelViewSet):
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
     def subscribers(self, request):
         useraccount = self.request.user.useraccount
-        sync_subscriptions(issuer=useraccount.id)
-        subscribers = Subscription.objects.filter(issuer=useraccount.id, is_active=True).order_by("-subscription_date")
+        subscribers = Subscription.objects.active().filter(issuer=useraccount.id).order_by("-subscription_date")
+        subscribers = self.serializer_class.setup_eager_loading(subscribers)
         subscribers_serializer = self.serializer_class(subscribers, many=True)
 
         return Response(subscribers_serializer.data)
@@ -104,15 +109,13 @@ class SubscriptionView(ModelViewSet):
 
     def sync_wallet_records(self, amount, **kwargs):
         charge_fee = settings.PERCENTAGE_CHARGE * amount
-        amount_after_charge = amount - charge_fee
-
-        tipster_wallet = kwargs.get("tipster_wallet")
-        tipster_wallet.balance = tipster_wallet.balance + amount_after_charge
-        tipster_wallet.save()
-
-        subscriber_wallet = kwargs.get("subscriber_wallet")
-        subscriber_wallet.balance = kwargs.get("subscriber_balance")
-        subscriber_wallet.save()
+        ledger.pay_subscription(
+            kwargs.get("subscriber_wallet"),
+            kwargs.get("tipster_wallet"),
+            ledger.to_minor_units(amount),
+            ledger.to_minor_units(charge_fee),
+            transaction=kwargs.get("transaction"),
+        )
 
     def verify_transaction(self, tx_ref):
         try:
@@ -165,14 +168,14 @@ class SubscriptionView(ModelViewSet):
             previous_subscription.save()
 
         if subscription_type == Subscription.PREMIUM:
-            subscriber_balance = subscriber.wallet.balance - amount
-            self.sync_wallet_records(amount, tipster_wallet=tipster.wallet, subscriber_wallet=subscriber.wallet, subscriber_balance=subscriber_balance)
-            self.record_transaction(
-                subscriber,
-                status=Transaction.SUCCEED,
-                amount=amount,
-                currency=tipster.wallet.currency
-            )
+            with db_transaction.atomic():
+                transaction = self.record_transaction(
+                    subscriber,
+                    status=Transaction.SUCCEED,
+                    amount=amount,
+                    currency=tipster.wallet.currency
+                )
+                self.sync_wallet_records(amount, tipster_wallet=tipster.wallet_id, subscriber_wallet=subscriber.wallet_id, transaction=transaction)
 
         data = self.serializer_class(instance=subscription[0]).data
 
@@ -217,66 +220,60 @@ class SubscriptionView(ModelViewSet):
 @permission_classes((permissions.AllowAny,))
 class CappersAPIView(APIView):
     filter_class = UserAccountFilterSet
+    pagination_class = CapperPagination
+
+    def get_queryset(self):
+        return CapperSerializer.setup_eager_loading(UserAccount.objects.filter(
+            user__is_active=True,
+            stats__last_slip_date__gt=datetime.utcnow().replace(tzinfo=pytz.UTC)-timedelta(days=14)
+        ).exclude(
+            user__first_name=None,
+            user__last_name=None,
+            wallet=None,
+            phone_number=None,
+            ip_address=None
+        ))
+
+    def get_cache_key(self, request):
+        return 'punters:' + urlencode(sorted(request.query_params.items()))
+
+    def get_data(self, request):
+        paginator = self.pagination_class()
+        filterset = self.filter_class(data=request.query_params, queryset=self.get_queryset())
+        page = paginator.paginate_queryset(filterset.qs, request, view=self)
+        if page is not None:
+            serializer = CapperSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data).data
+
+        queryset = filterset.qs.order_by(*paginator.get_ordering(request))
+        return CapperSerializer(queryset, many=True).data
 
     def get(self, request, username=None):
-        cache_key = 'punters'
-        if cache_key in cache:
-            data = cache.get(cache_key)
-        else:
-            filterset = self.filter_class(
-                data=request.query_params,
-                queryset=UserAccount.objects.filter(
-                    user__is_active=True,
-                    playslip__date_added__gt=datetime.utcnow().replace(tzinfo=pytz.UTC)-timedelta(days=14)
-                ).distinct().exclude(
-                    user__first_name=None,
-                    user__last_name=None,
-                    wallet=None,
-                    phone_number=None,
-                    ip_address=None
-                )
-            )
-            serializer = UserAccountSerializer(filterset.qs, many=True)
-            data = serializer.data
-            cache.set(cache_key, data, timeout=settings.CACHE_TTL)
-
+        data = get_or_build(self.get_cache_key(request), lambda: self.get_data(request))
         return Response(data)
 
 
 @permission_classes((permissions.IsAuthenticated, IsOwnerOrReadOnly))
 class PlayAPIView(ModelViewSet):
     filter_class = PlayFilterSet
+    pagination_class = PlaySlipPagination
 
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
     def get_plays(self, request):
-        free_subscriptions = Subscription.objects.filter(
-            subscriber=request.user.useraccount.id,
-            type=0,
-            is_active=True
-        )
-        premium_subscriptions = Subscription.objects.filter(
-            subscriber=request.user.useraccount.id,
-            type=1,
-            is_active=True
+        plays = PlaySlipSerializer.setup_eager_loading(
+            get_subscriber_feed(request.user.useraccount.id)
         )
 
-        free_sub_date = free_subscriptions.values_list("subscription_date", flat=True)
-        pre_sub_date = premium_subscriptions.values_list("subscription_date", flat=True)
-        filters = Q(issuer=request.user.useraccount.id)
-
-        for date in free_sub_date:
-            filters = filters | Q(date_added__gte=date, is_premium=False)
-
-        for date in pre_sub_date:
-            filters = filters | Q(date_added__gte=date, is_premium=True)
-
-        plays = PlaySlip.objects.filter(filters).order_by("-date_added")
-
         query_params = request.query_params
         filterset = self.filter_class(
             data=query_params,
             queryset=plays
         )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(filterset.qs, request, view=self)
+        if page is not None:
+            play_serializer = PlaySlipSerializer(page, many=True)
+            return paginator.get_paginated_response(play_serializer.data)
         play_serializer = PlaySlipSerializer(filterset.qs, many=True)
 
         return Response(play_serializer.data)
@@ -284,26 +281,30 @@ class PlayAPIView(ModelViewSet):
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='POST'))
     def create_plays(self, request):
         #TODO: Confirm the match is valid from probably an API before saving to the DB
-        data = request.data.copy()
         self.check_object_permissions(request, request.user.useraccount.id)
-        sync_subscriptions(issuer=request.user.useraccount.id)
-        #TODO: Redesign this process
-        play_slip = PlaySlip.objects.create(
-            issuer=request.user.useraccount,
-            is_premium=data.get("is_premium"),
-            title=data.get("title"),
-        )
-        data['slip'] = play_slip
-        PlaySerializer(data=data.get("plays"), many=True)
-        plays = []
-        for play in data.get("plays"):
-            match = Match.objects.create(**play.pop("match"))
-            plays.append(Play(slip=play_slip, match=match, **play))
-        Play.objects.bulk_create(plays)
-        play_slip_serializer = PlaySlipSerializer(PlaySlip.objects.get(id=play_slip.id))
-        data = play_slip_serializer.data
-        notify_subscribers(data)
+        serializer = NewPlaySlipSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        with db_transaction.atomic():
+            play_slip = PlaySlip.objects.create(
+                issuer=request.user.useraccount,
+                is_premium=data.get("is_premium", False),
+                title=data.get("title", ""),
+            )
+            games = SportsGame.objects.select_related('type').get_or_create_fixtures(
+                [play["match"] for play in data["plays"]]
+            )
+            if any(game.result for game in games):
+                raise ForbiddenError(detail="Game no longer available for play")
+            plays = Play.objects.bulk_create([
+                Play(slip=play_slip, game=game, prediction=play["prediction"])
+                for play, game in zip(data["plays"], games)
+            ])
+            notifications.enqueue_slip(play_slip)
+        # Serialize what was just written instead of reading it back.
+        play_slip.issuer = UserAccount.objects.with_card().get(id=play_slip.issuer_id)
+        play_slip._prefetched_objects_cache = {'play_set': plays}
         return Response({
             'message': 'Play Created Successfully',
-            'data': data
+            'data': PlaySlipSerializer(play_slip).data
         })
@@ -14,9 +14,11 @@ from rave_python import Rave, RaveExceptions
 from core.permissions import IsOwnerOrReadOnly
 from core.serializers import (
     UserAccountSerializer, UserPricingSerializer, OwnerUserAccountSerializer,
-    OwnerUserSerializer, OwnerUserWalletSerializer
+    OwnerUserSerializer, OwnerUserWalletSerializer, SubscriberSerializer
 )
 from core.models.user import UserAccount
+from core.models.subscription import Subscription
+from core.pagination import SubscriberPagination
 from core.filters import UserAccountFilterSet
 from core.exceptions import PricingError, NotFoundError
 
@@ -76,7 +78,7 @@ class UserAPIView(viewsets.ModelViewSet):
 
     def get_object(self, username):
         try:
-            return UserAccount.objects.select_related('user').get(user__username=username, user__is_active=True)
+            return UserAccount.objects.with_profile().get(user__username=username, user__is_active=True)
         except UserAccount.DoesNotExist:
             raise NotFoundError(detail="User not found")
 
@@ -86,6 +88,20 @@ class UserAPIView(viewsets.ModelViewSet):
         serializer = UserAccountSerializer(data)
         return Response(serializer.data)
 
+    @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
+    def get_subscribers(self, request, username=None):
+        subscribers = Subscription.objects.active().filter(
+            issuer__user__username=username,
+            issuer__user__is_active=True,
+        )
+        subscription_type = request.query_params.get('type')
+        if subscription_type in (str(Subscription.FREE), str(Subscription.PREMIUM)):
+            subscribers = subscribers.filter(type=subscription_type)
+        paginator = SubscriberPagination()
+        page = paginator.paginate_queryset(SubscriberSerializer.setup_eager_loading(subscribers), request, view=self)
+        serializer = SubscriberSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
 
 @permission_classes((permissions.IsAuthenticated,))
 class UserPricingAPIView(APIView):
@@ -134,7 +150,7 @@ class UserPaymentDetailsAPIView(APIView):
             })
             if not res.get('error'):
                 user_account.wallet.meta['fw_subaccount_id'] = res['data']['subaccount_id']
-                user_account.wallet.save()
+                user_account.wallet.save(update_fields=['meta'])
         except RaveExceptions.SubaccountCreationError as e:
             return e.err["errMsg"]
 
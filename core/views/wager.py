@@ -1,8 +1,8 @@
 import pytz
 from datetime import datetime, timedelta
 from django.conf import settings
-from django.db.models import Count, Q
-from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.db.models import Q
 from django.core.cache.backends.base import DEFAULT_TIMEOUT
 from django_ratelimit.decorators import ratelimit
 from django.utils.decorators import method_decorator
@@ -24,8 +24,11 @@ from core.models.wager import SportsWager, SportsWagerChallenge
 from core.models.games import SportsGame, Sport, Competition, Team, Market
 from core.models.subscription import Subscription
 from core.filters import PlayFilterSet, UserAccountFilterSet, SubscriptionFilterSet, SportsWagerFilterSet, SportsGameFilterSet
-from core.exceptions import SubscriptionError, InsuficientFundError, NotFoundError, ForbiddenError, PermissionDeniedError
-from core.shared.helper import sync_records, sync_subscriptions, notify_subscribers
+from core.pagination import SportsGamePagination, SportsWagerPagination
+from core.exceptions import BadRequestError, ConflictError, SubscriptionError, InsuficientFundError, NotFoundError, ForbiddenError, PermissionDeniedError
+from core.shared import ledger, realtime
+from core.shared.helper import sync_records
+from core.views.mixins import CachedListMixin
 
 
 class CsrfExemptSessionAuthentication(authentication.SessionAuthentication):
@@ -36,14 +39,22 @@ class CsrfExemptSessionAuthentication(authentication.SessionAuthentication):
 @permission_classes((permissions.IsAuthenticated, IsOwnerOrReadOnly))
 class SportsWagerAPIView(ModelViewSet):
     filter_class = SportsWagerFilterSet
+    pagination_class = SportsWagerPagination
 
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
     def get_wagers(self, request):
         filters = Q(backer=request.user.useraccount.id) | Q(layer=request.user.useraccount.id)
         filterset = self.filter_class(
             data=request.query_params,
-            queryset=SportsWager.objects.filter(filters).order_by("-placed_time")
+            queryset=SportsWagerSerializer.setup_eager_loading(
+                SportsWager.objects.filter(filters).order_by("-placed_time")
+            )
         )
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(filterset.qs, request, view=self)
+        if page is not None:
+            serializer = SportsWagerSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
         serializer = SportsWagerSerializer(filterset.qs, many=True)
 
         return Response(serializer.data)
@@ -54,7 +65,7 @@ class SportsWagerAPIView(ModelViewSet):
             games = SportsGame.objects.get(pk=pk)
         except SportsGame.DoesNotExist:
             raise NotFoundError(detail="Game not found")
-        queryset = games.wagers.all()
+        queryset = SportsWagerSerializer.setup_eager_loading(games.wagers.all())
         serializer = SportsWagerSerializer(queryset, many=True)
 
         return Response(serializer.data)
@@ -63,39 +74,69 @@ class SportsWagerAPIView(ModelViewSet):
     def place_wager(self, request):
         data = request.data
         self.check_object_permissions(request, data.get('backer'))
-        if request.user.useraccount.wallet.balance < int(data.get("stake")):
+        stake = ledger.to_minor_units(data.get("stake"))
+        if request.user.useraccount.wallet.balance < stake:
             raise InsuficientFundError(detail="You don't have sufficient fund to stake")
         serializer = SportsWagerSerializer(data=data, partial=True)
         serializer.is_valid(raise_exception=True)
-        sports_wager = serializer.save()
-        game_serializer = SportsGameSerializer(sports_wager.game)
-        useraccount_wallet = request.user.useraccount.wallet
-        useraccount_wallet.withheld = useraccount_wallet.withheld + int(data.get("stake"))
-        useraccount_wallet.balance = useraccount_wallet.balance - int(data.get("stake"))
-        useraccount_wallet.save()
-        if data.get("opponent"):
-            self.handle_wager_invitation(sports_wager, requestee=data.get("opponent"), requestor=request.user.useraccount)
+        with db_transaction.atomic():
+            sports_wager = serializer.save()
+            ledger.hold_stake(
+                request.user.useraccount.wallet_id,
+                stake,
+                transaction=sports_wager.transaction,
+                reference=sports_wager.id,
+            )
+            if data.get("opponent"):
+                self.handle_wager_invitation(sports_wager, requestee=data.get("opponent"), requestor=request.user.useraccount)
         return Response({
             'message': 'Wager Challenge Created Successfully',
             'data': serializer.data
         })
 
+    @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='POST'))
+    def place_order(self, request):
+        """
+        Place a wager on the order book. The matching engine fills it,
+        possibly in parts, against opposing orders on the same game and market.
+        """
+        data = request.data
+        self.check_object_permissions(request, data.get('backer'))
+        stake = ledger.to_minor_units(data.get("stake"))
+        if stake <= 0:
+            raise BadRequestError(detail="Stake must be positive")
+        if request.user.useraccount.wallet.balance < stake:
+            raise InsuficientFundError(detail="You don't have sufficient fund to stake")
+        serializer = SportsWagerSerializer(data=data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with db_transaction.atomic():
+            sports_wager = serializer.save(unmatched_amount=stake)
+            ledger.hold_stake(
+                request.user.useraccount.wallet_id,
+                stake,
+                transaction=sports_wager.transaction,
+                reference=sports_wager.id,
+            )
+        return Response({
+            'message': 'Wager Order Placed Successfully',
+            'data': serializer.data
+        })
+
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
     def match_wager(self, request):
-        # TODO: Send websocket notifications
         try:
             sports_wager = SportsWager.objects.select_related("backer", "game", "transaction").get(pk=request.data.get("wager"))
         except SportsWager.DoesNotExist:
             raise NotFoundError(detail="Wager not found")
 
-        if request.user.useraccount.wallet.balance < sports_wager.stake:
+        if request.user.useraccount.wallet.balance < ledger.to_minor_units(sports_wager.stake):
             raise InsuficientFundError(detail="You don't have sufficient fund to stake")
 
         if sports_wager.game.result:
             raise ForbiddenError(detail="Game no longer available for wager")
         
-        if sports_wager.matched:
-            raise ForbiddenError(detail="Wager no longer available to play")
+        if sports_wager.matched or sports_wager.unmatched_amount is not None:
+            raise ConflictError(detail="Wager no longer available to play")
 
         if sports_wager.backer.id == request.user.useraccount.id:
             raise PermissionDeniedError(detail="Action not permitted")
@@ -113,31 +154,33 @@ class SportsWagerAPIView(ModelViewSet):
     def handle_wager_invitation(self, wager, requestee=None, requestor=None):
         # TODO: send SMS invitation with a generated link to signup, fund account
         # and accept invitation.
-        # Send web socket notification after inviting a registered user
         user = UserAccount.objects.get(user__username=requestee)
         if requestor.id == user.id:
             raise PermissionDeniedError(detail="Action not permitted")
-        SportsWagerChallenge.objects.create(
+        challenge = SportsWagerChallenge.objects.create(
             wager=wager,
             requestor=requestor,
             requestee=user
         )
+        realtime.challenge_received(challenge)
 
 
 @permission_classes((permissions.AllowAny,))
 class P2PSportsGameAPIView(APIView):
     filter_class = SportsGameFilterSet
+    pagination_class = SportsGamePagination
 
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
     def get(self, request):
         filterset = self.filter_class(
             data=request.query_params,
-            queryset=SportsGame.objects.all()
-            .annotate(wager_count=Count("wagers"))
+            queryset=SportsGame.objects.select_related('type')
         )
-        serializer = SportsGameSerializer(filterset.qs, many=True)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(filterset.qs, request, view=self)
+        serializer = SportsGameSerializer(page, many=True)
 
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
 
 
 @permission_classes((permissions.IsAuthenticated, IsOwnerOrReadOnly))
@@ -151,7 +194,9 @@ class SportsWagerChallengeAPIView(APIView):
             requestee=request.user.useraccount.id,
             accepted=False
         ).select_related("wager").order_by("-date_initialized")]
-        queryset = SportsWager.objects.filter(id__in=wager_list)
+        queryset = SportsWagerSerializer.setup_eager_loading(
+            SportsWager.objects.filter(id__in=wager_list)
+        )
         serializer = SportsWagerSerializer(
             queryset, many=True
         )
@@ -161,7 +206,6 @@ class SportsWagerChallengeAPIView(APIView):
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='POST'))    
     def post(self, request):
         """Accept wager challenges"""
-        # TODO: Send websocket notifications
         try:
             queryset = SportsWager.objects.select_related("backer").get(
                 id=request.data.get("wager")
@@ -169,7 +213,7 @@ class SportsWagerChallengeAPIView(APIView):
         except SportsWager.DoesNotExist:
             raise NotFoundError(detail="Wager not found")
 
-        if request.user.useraccount.wallet.balance < queryset.stake:
+        if request.user.useraccount.wallet.balance < ledger.to_minor_units(queryset.stake):
             raise InsuficientFundError(detail="You don't have sufficient fund to stake")
 
         try:
@@ -181,16 +225,17 @@ class SportsWagerChallengeAPIView(APIView):
             raise PermissionDeniedError(detail="Action not permitted")
 
         if queryset.matched:
-            raise ForbiddenError(detail="Wager no longer available to play")
+            raise ConflictError(detail="Wager no longer available to play")
 
-        invitation.accepted = True
-        invitation.save()
+        with db_transaction.atomic():
+            invitation.accepted = True
+            invitation.save()
 
-        serializer = sync_records(
-            queryset,
-            request.user.useraccount,
-            layer_option=request.data.get("layer_option")
-        )
+            serializer = sync_records(
+                queryset,
+                request.user.useraccount,
+                layer_option=request.data.get("layer_option")
+            )
 
         return Response({
             "message": "Challenge accepted",
@@ -199,70 +244,51 @@ class SportsWagerChallengeAPIView(APIView):
 
 
 @permission_classes((permissions.IsAuthenticated,))
-class TeamAPIView(ModelViewSet):
+class TeamAPIView(CachedListMixin, ModelViewSet):
     serializer_class = TeamSerializer
+    cache_namespace = 'team'
+    cache_params = ('competition',)
 
-    @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
     def get_queryset(self):
-        cache_key = 'team'
-        if cache_key in cache:
-            data = cache.get(cache_key)
-        else:
-            queryset = Team.objects.filter(
-                competition__name=self.request.query_params.get('competition')
-            )
-            data = queryset
-            cache.set(cache_key, data, timeout=settings.CACHE_TTL)
-        return data
+        queryset = Team.objects.all()
+        competition = self.request.query_params.get('competition')
+        if competition is not None:
+            queryset = queryset.filter(competition__name=competition).distinct()
+        return queryset
 
 
 @permission_classes((permissions.IsAuthenticated,))
-class SportAPIView(ModelViewSet):
+class SportAPIView(CachedListMixin, ModelViewSet):
     serializer_class = SportSerializer
+    cache_namespace = 'sport'
 
-    @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
     def get_queryset(self):
-        cache_key = 'sport'
-        if cache_key in cache:
-            data = cache.get(cache_key)
-        else:
-            queryset = Sport.objects.filter()
-            data = queryset
-            cache.set(cache_key, data, timeout=settings.CACHE_TTL)
-        return data
+        return Sport.objects.all()
 
 
 @permission_classes((permissions.IsAuthenticated,))
-class CompetitionAPIView(ModelViewSet):
+class CompetitionAPIView(CachedListMixin, ModelViewSet):
     serializer_class = CompetitionSerializer
+    cache_namespace = 'competition'
+    cache_params = ('sport',)
 
-    @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
     def get_queryset(self):
-        cache_key = 'competition'
-        if cache_key in cache:
-            data = cache.get(cache_key)
-        else:
-            queryset = Competition.objects.filter(
-                sport__name=self.request.query_params.get('sport')
-            )
-            data = queryset
-            cache.set(cache_key, data, timeout=settings.CACHE_TTL)
-        return data
+        queryset = Competition.objects.all()
+        sport = self.request.query_params.get('sport')
+        if sport is not None:
+            queryset = queryset.filter(sport__name=sport)
+        return queryset
 
 
 @permission_classes((permissions.IsAuthenticated,))
-class MarketAPIView(ModelViewSet):
+class MarketAPIView(CachedListMixin, ModelViewSet):
     serializer_class = MarketSerializer
+    cache_namespace = 'market'
+    cache_params = ('sport',)
 
-    @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
     def get_queryset(self):
-        cache_key = 'market'
-        if cache_key in cache:
-            data = cache.get(cache_key)
-        else:
-            queryset = Market.objects.filter(
-                sport__name=self.request.query_params.get('sport')
-            )
-            data = queryset
-            cache.set(cache_key, data, timeout=settings.CACHE_TTL)
-            return data
+        queryset = Market.objects.all()
+        sport = self.request.query_params.get('sport')
+        if sport is not None:
+            queryset = queryset.filter(sport__name=sport)
+        return queryset
@@ -1,5 +1,3 @@
-import json
-import hashlib
 from django.conf import settings
 from django_ratelimit.decorators import ratelimit
 from django.utils.decorators import method_decorator
@@ -8,79 +6,31 @@ from rest_framework import permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from core.models.user import UserAccount
-from core.models.transaction import Transaction
+from core.models.webhook import WebhookEvent
 from core.permissions import PaystackWebhookPermission
+from core.views.mixins import WebhookInboxMixin
 
 
 @permission_classes((permissions.AllowAny, PaystackWebhookPermission))
-class PaystackWebhookAPIView(APIView):
-    def record_successful_deposit_transaction(request):
-        data = request.data.get("data")
-        user = UserAccount.objects.select_related("wallet").get(user__email=data["customer"]["email"])
-        wallet = user.wallet
-        wallet.balance = wallet.balance + data.get("amount")
-        wallet.authorizations = [data.get("authorization")] + wallet.authorizations
-        wallet.save()
-        Transaction.objects.create(
-            type=Transaction.DEPOSIT,
-            status=Transaction.SUCCEED,
-            amount=data.get("amount"),
-            channel=data.get("channel"),
-            currency=data.get("currency"),
-            time=data.get("paid_at"),
-            reference=data.get("reference"),
-            payment_issuer=Transaction.PAYSTACK,
-            balance=wallet.balance,
-            user=user
-        )
-
-    def record_successful_withdrawal_transaction(request):
-        data = request.data.get("data")
-        transaction = Transaction.objects.select_related("user").get(reference=data.get("reference"))
-        transaction.status = Transaction.SUCCEED
-        transaction.updated_at = data.get("updated_at")
-        transaction.save()
-
-    def verify_origin(self, request):
-        xps_header = request.headers.get("x-paystack-signature")
-        secret = settings.PAYSTACK_SECRET_KEY
-        body_bytes = json.dumps(request.data).encode("utf-8")
-        hash = hashlib.new("sha512", secret.encode('utf-8'))
-        hash.update(body_bytes)
-        hash_digest = hash.hexdigest()
-        return hash_digest == xps_header
-
-    @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='POST'))
-    def post(self, request):
-        event = request.data.get("event")
-        #TODO: Handle more events
-        if event == "charge.success":
-            self.record_successful_deposit_transaction(request)
-        elif event == "transfer.success":
-            self.record_successful_withdrawal_transaction(request)
-        return Response(status=status.HTTP_200_OK)
+class PaystackWebhookAPIView(WebhookInboxMixin, APIView):
+    provider = WebhookEvent.PAYSTACK
 
 
 @permission_classes((permissions.AllowAny,))
-class WhatsappWebhookAPIView(APIView):
+class WhatsappWebhookAPIView(WebhookInboxMixin, APIView):
+    provider = WebhookEvent.WHATSAPP
+
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
     def get(self, request):
         if request.query_params.get('hub.verify_token') == settings.WHATSAPP_WEBHOOK_VERIFY_TOKEN:
             return Response(int(request.query_params.get('hub.challenge')))
         return Response(status=status.HTTP_403_FORBIDDEN)
 
-    @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='POST'))
-    def post(self, request):
-        return Response(status=status.HTTP_200_OK)
-
 
 @permission_classes((permissions.AllowAny,))
-class FlutterwaveWebhookAPIView(APIView):
+class FlutterwaveWebhookAPIView(WebhookInboxMixin, APIView):
+    provider = WebhookEvent.FLUTTERWAVE
+
     @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='GET'))
     def get(self, request):
         return Response(status=status.HTTP_200_OK)
-
-    @method_decorator(ratelimit(key='ip', rate=f'{settings.DEFAULT_RATE_LIMIT}/m', method='POST'))
-    def post(self, request):
-        return Response(status=status.HTTP_200_OK)
@@ -46,6 +46,7 @@ REDIS_URL = (os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -62,6 +63,7 @@ INSTALLED_APPS = [
     'allauth.socialaccount',
     'corsheaders',
     'django_redis',
+    'channels',
     'debug_toolbar',
     'storages',
     'core',
@@ -81,6 +83,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middlewares.WebhookVerificationMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
@@ -224,8 +227,38 @@ WSGI_APPLICATION = 'predishun.wsgi.application'
 
 ASGI_APPLICATION = 'predishun.asgi.application'
 
+# WebSocket events fan out over Redis pub/sub: each ASGI process holds one
+# subscription per group that has a local socket, and idle sockets keep no
+# other state in Redis.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+        'CONFIG': {'hosts': [REDIS_URL]},
+    },
+}
+
+WEBSOCKET_MAX_GAME_SUBSCRIPTIONS = 50
+
+# Games nothing was wagered or played on are moved to the archive by the
+# archive_games worker once their match day is this many days past.
+GAME_ARCHIVE_DAYS = int(os.environ.get("GAME_ARCHIVE_DAYS", 30))
+
+# Uploaded avatars are rendered by the process_avatars worker as square WebP
+# and JPEG variants of each of these sizes, in pixels; the JPEG of
+# AVATAR_DEFAULT_SIZE is served as the account's image. A failing upload is
+# retried AVATAR_MAX_ATTEMPTS times.
+AVATAR_SIZES = (512, 256, 64)
+AVATAR_DEFAULT_SIZE = 256
+AVATAR_MAX_ATTEMPTS = 3
+
 CACHE_TTL = 15 * 60
 
+# Per-worker LRU in front of the shared cache for rarely changing data,
+# invalidated over the LOCAL_CACHE_CHANNEL Redis pub/sub channel.
+LOCAL_CACHE_MAX_SIZE = 1024
+LOCAL_CACHE_TTL = 5 * 60
+LOCAL_CACHE_CHANNEL = 'local-cache-invalidation'
+
 ACCOUNT_ADAPTER = 'core.adapter.CustomDefaultAccountAdapter'
 
 ACCOUNT_AUTHENTICATION_METHOD = 'email'
@@ -248,8 +281,39 @@ RAVE_PUBLIC_KEY = os.environ.get("RAVE_PUBLIC_KEY")
 
 RAVE_SECRET_KEY = os.environ.get("RAVE_SECRET_KEY")
 
+# Outbound calls to payment providers share a keep-alive pool per provider.
+# Timeouts are (connect, read) seconds; failed idempotent calls are retried
+# with jittered backoff, and a provider that keeps failing is skipped for
+# PROVIDER_CIRCUIT_RESET seconds after PROVIDER_CIRCUIT_FAILURES failures.
+PROVIDER_HTTP_TIMEOUT = (3.05, 20)
+PROVIDER_HTTP_RETRIES = 2
+PROVIDER_HTTP_BACKOFF = 0.5
+PROVIDER_HTTP_POOL_SIZE = 20
+PROVIDER_CIRCUIT_FAILURES = 5
+PROVIDER_CIRCUIT_RESET = 30
+
+# Bank lists are refreshed in the background after BANK_LIST_CACHE_TTL;
+# account resolutions are remembered briefly, failed ones for less.
+BANK_LIST_CACHE_TTL = 12 * 60 * 60
+ACCOUNT_RESOLUTION_CACHE_TTL = 10 * 60
+ACCOUNT_RESOLUTION_NEGATIVE_TTL = 60
+
+# Webhook deliveries are stored and acknowledged at once, then handled by the
+# process_webhooks worker; a failing event is retried this many times.
+WEBHOOK_MAX_ATTEMPTS = 5
+
 WHATSAPP_WEBHOOK_VERIFY_TOKEN = os.environ.get("WHATSAPP_WEBHOOK_VERIFY_TOKEN")
 
+# Webhook POSTs are authenticated by WebhookVerificationMiddleware before
+# they reach a view: Paystack by source IP and an HMAC-SHA512 of the body,
+# Flutterwave by its verif-hash secret and WhatsApp by an HMAC-SHA256 of
+# the body keyed with the app secret.
+PAYSTACK_WEBHOOK_IPS = ['52.31.139.75', '52.49.173.169', '52.214.14.220']
+
+FLUTTERWAVE_WEBHOOK_HASH = os.environ.get("FLUTTERWAVE_WEBHOOK_HASH")
+
+WHATSAPP_APP_SECRET = os.environ.get("WHATSAPP_APP_SECRET")
+
 WHATSAPP_API_ID = os.environ.get("WHATSAPP_API_ID")
 
 WHATSAPP_API_SECRET = os.environ.get("WHATSAPP_API_SECRET")
@@ -282,6 +346,30 @@ EMAIL_PORT = os.environ.get("EMAIL_PORT")
 
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+WEBPUSH_VAPID_PRIVATE_KEY = os.environ.get("WEBPUSH_VAPID_PRIVATE_KEY")
+
+WEBPUSH_VAPID_SUBJECT = os.environ.get("WEBPUSH_VAPID_SUBJECT", "mailto:support@predishun.com")
+
+# New slips are fanned out to subscribers by the send_notifications worker.
+# Each channel sends at most RATE messages per second across all workers, in
+# batches of BATCH_SIZE; channels without credentials are left out.
+NOTIFICATION_CHANNELS = {
+    'email': {'BACKEND': 'core.shared.notifications.EmailChannel', 'RATE': 50, 'BATCH_SIZE': 50},
+    'websocket': {'BACKEND': 'core.shared.notifications.WebSocketChannel', 'RATE': 5000, 'BATCH_SIZE': 500},
+}
+if WHATSAPP_ACCESS_TOKEN and WHATSAPP_PHONE_NUMBER_ID:
+    NOTIFICATION_CHANNELS['whatsapp'] = {'BACKEND': 'core.shared.notifications.WhatsAppChannel', 'RATE': 40, 'BATCH_SIZE': 40}
+if TELEGRAM_BOT_TOKEN:
+    NOTIFICATION_CHANNELS['telegram'] = {'BACKEND': 'core.shared.notifications.TelegramChannel', 'RATE': 30, 'BATCH_SIZE': 30}
+if WEBPUSH_VAPID_PRIVATE_KEY:
+    NOTIFICATION_CHANNELS['webpush'] = {'BACKEND': 'core.shared.notifications.WebPushChannel', 'RATE': 100, 'BATCH_SIZE': 100}
+
+# A notification worker leases a job for NOTIFICATION_LEASE_SECONDS while it
+# delivers a batch outside any transaction; a channel that fails is retried
+# with backoff and its batch skipped after NOTIFICATION_MAX_ATTEMPTS tries.
+NOTIFICATION_LEASE_SECONDS = 300
+NOTIFICATION_MAX_ATTEMPTS = 5
+
 RATELIMIT_EXCEPTION_CLASS = "core.exceptions.RateLimited"
 
 DEFAULT_RATE_LIMIT = "10"
@@ -304,6 +392,10 @@ DATABASES = {
         "PASSWORD": os.environ.get("RDS_PASSWORD", "postgres"),
         "HOST": os.environ.get("RDS_HOST", "localhost"),
         "PORT": os.environ.get("RDS_PORT", "5432"),
+        # Long-lived processes such as the WebSocket server keep their
+        # connections instead of opening one per lookup.
+        "CONN_MAX_AGE": int(os.environ.get("RDS_CONN_MAX_AGE", 0)),
+        "CONN_HEALTH_CHECKS": True,
     }
 }
 
@@ -10,4 +10,11 @@ class StaticStorage(S3Boto3Storage):
 class PublicMediaStorage(S3Boto3Storage):
     location = 'media'
     default_acl = 'public-read'
-    file_overwrite = False
\ No newline at end of file
+    file_overwrite = False
+
+    def get_object_parameters(self, name):
+        params = super().get_object_parameters(name)
+        # Avatar variants are named after their content and never change.
+        if name.startswith(f'{self.location}/avatars/'):
+            params['CacheControl'] = 'max-age=31536000, immutable'
+        return params